@@ -0,0 +1,234 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from agents.intent_classifier import TOKEN_PATTERN, extract_features
+
+MAGIC = b"TUTORFAQ"
+FORMAT_VERSION = 1
+# magic, version, num_buckets, then the counts and offsets of each section
+HEADER = struct.Struct("<8sII4I8Q")
+DEFAULT_BUCKETS = 1 << 18
+
+# Numbers, operators and (in maths questions) variable names must match exactly:
+# "Solve 2x + 5 = 13" is not a near-match for "Solve 2x + 5 = 11"
+LITERAL_SYMBOLS = set("+-*/=^×÷·²³√π<>")
+DIGITS = re.compile(r"\d")
+# Words that only frame a question; every other word must match, so "What is
+# elastic potential energy?" does not get the answer to "What is potential energy?"
+FRAMING_WORDS = {
+    "a", "about", "an", "and", "are", "can", "could", "define", "definition", "describe", "do", "does",
+    "explain", "for", "give", "hello", "hey", "hi", "how", "in", "is", "me", "mean", "meaning", "of",
+    "please", "tell", "the", "to", "what", "whats", "with", "would", "you",
+}
+
+
+def _stem(word: str) -> str:
+    if word.endswith("ing") and len(word) > 5:
+        return word[:-3]
+    if word.endswith("ed") and len(word) > 4:
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def question_signature(text: str) -> Tuple[FrozenSet[str], Tuple[str, ...]]:
+    """The parts of a question that change its answer if they change.
+
+    Returns its content words (stemmed, framing words dropped) and its
+    literal tokens in order: numbers, operators, "=" and, in maths,
+    variable names.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    is_math = any(DIGITS.search(token) or token in LITERAL_SYMBOLS for token in tokens)
+    # In order, so "2x + 11 = 5" and "2x = 11 + 5" differ from "2x + 5 = 11"
+    literals = tuple(
+        token for token in tokens
+        if DIGITS.search(token) or token in LITERAL_SYMBOLS or (is_math and len(token) == 1 and token.isalpha())
+    )
+    words = frozenset(
+        _stem(token) for token in tokens
+        if token.isalpha() and len(token) > 2 and _stem(token) not in FRAMING_WORDS
+    )
+    return words, literals
+
+
+def answer_fingerprint(question: Dict[str, Any], generator: str) -> str:
+    """Identify what an entry's answer was made from, so rebuilds only redo changed entries.
+
+    Reviewed answers are keyed by their text; generated ones by the
+    question, route and the model and prompt version that wrote them.
+    """
+    source = question["answer"] if question.get("answer") else generator
+    payload = json.dumps([question["question"], question["route"], source], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class FaqMatch(NamedTuple):
+    question: str
+    route: str
+    answer: str
+    source: str
+    score: float
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_faq_index(path: str, records: Sequence[Dict[str, Any]], num_buckets: int = DEFAULT_BUCKETS) -> None:
+    """Write records to an index file, replacing any previous one atomically.
+
+    Each record needs question, route and answer; its question and any
+    aliases become lookup keys. The file is an inverted index from
+    hashed n-gram buckets to (key, weight) postings plus the records as
+    JSON, laid out so that FaqIndex can use it straight from a mmap.
+    """
+    keys: List[Tuple[str, int]] = []
+    for number, record in enumerate(records):
+        for text in [record["question"], *record.get("aliases", [])]:
+            keys.append((text, number))
+
+    postings: Dict[int, List[Tuple[int, float]]] = {}
+    for key_number, (text, _) in enumerate(keys):
+        for bucket, weight in extract_features(text, num_buckets).items():
+            postings.setdefault(bucket, []).append((key_number, weight))
+    terms = sorted(postings)
+
+    term_starts, posting_keys, posting_weights = [0], [], []
+    for bucket in terms:
+        for key_number, weight in postings[bucket]:
+            posting_keys.append(key_number)
+            posting_weights.append(weight)
+        term_starts.append(len(posting_keys))
+
+    blob = bytearray()
+    key_offsets = [0]
+    for text, _ in keys:
+        blob += text.encode("utf-8")
+        key_offsets.append(len(blob))
+    record_offsets = [len(blob)]
+    for record in records:
+        blob += json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        record_offsets.append(len(blob))
+
+    sections = [
+        struct.pack(f"<{len(terms)}I", *terms),
+        struct.pack(f"<{len(term_starts)}I", *term_starts),
+        struct.pack(f"<{len(posting_keys)}I", *posting_keys),
+        struct.pack(f"<{len(posting_weights)}f", *posting_weights),
+        struct.pack(f"<{len(keys)}I", *(number for _, number in keys)),
+        struct.pack(f"<{len(key_offsets)}Q", *key_offsets),
+        struct.pack(f"<{len(record_offsets)}Q", *record_offsets),
+        bytes(blob),
+    ]
+    offsets, position = [], _aligned(HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _aligned(position + len(section))
+
+    temporary = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, num_buckets,
+                            len(terms), len(posting_keys), len(keys), len(records), *offsets))
+        for offset, section in zip(offsets, sections):
+            f.seek(offset)
+            f.write(section)
+    os.replace(temporary, path)
+
+
+class FaqIndex:
+    """Looks up curated answers for questions close to one in the question bank.
+
+    Similarity is the cosine between the hashed n-gram vectors the intent
+    classifier uses, computed from the memory-mapped postings of the
+    query's buckets only, so a lookup takes well under a millisecond and
+    workers share the file through the page cache. Built by
+    scripts/build_faq_index.py.
+    """
+
+    def __init__(self, path: str, threshold: float):
+        self.path = path
+        self.threshold = threshold
+        self.lookups = 0
+        self.hits = 0
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+
+        magic, version, self.num_buckets, num_terms, num_postings, num_keys, num_records, *offsets = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} FAQ index")
+        lengths = [num_terms * 4, (num_terms + 1) * 4, num_postings * 4, num_postings * 4,
+                   num_keys * 4, (num_keys + 1) * 8, (num_records + 1) * 8]
+        formats = ["I", "I", "I", "f", "I", "Q", "Q"]
+        (self._terms, self._term_starts, self._posting_keys, self._posting_weights,
+         self._key_records, self._key_offsets, self._record_offsets) = [
+            view[offset:offset + length].cast(fmt) for offset, length, fmt in zip(offsets, lengths, formats)
+        ]
+        self._blob = view[offsets[7]:]
+        self.num_records = num_records
+
+    def __len__(self) -> int:
+        return self.num_records
+
+    def _key_text(self, key: int) -> str:
+        return bytes(self._blob[self._key_offsets[key]:self._key_offsets[key + 1]]).decode("utf-8")
+
+    def record(self, number: int) -> Dict[str, Any]:
+        start, end = self._record_offsets[number], self._record_offsets[number + 1]
+        return json.loads(bytes(self._blob[start:end]))
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for number in range(self.num_records):
+            yield self.record(number)
+
+    def _scores(self, query: str) -> Dict[int, float]:
+        terms, starts = self._terms, self._term_starts
+        scores: Dict[int, float] = {}
+        for bucket, value in extract_features(query, self.num_buckets).items():
+            i = bisect.bisect_left(terms, bucket)
+            if i < len(terms) and terms[i] == bucket:
+                for posting in range(starts[i], starts[i + 1]):
+                    key = self._posting_keys[posting]
+                    scores[key] = scores.get(key, 0.0) + value * self._posting_weights[posting]
+        return scores
+
+    def match(self, query: str) -> Optional[FaqMatch]:
+        """Return the best entry at least threshold-similar to the query, or None.
+
+        Only entries asking about the same things count: see question_signature.
+        """
+        self.lookups += 1
+        signature = None
+        for key, score in sorted(self._scores(query).items(), key=lambda item: -item[1]):
+            if score < self.threshold:
+                break
+            if signature is None:
+                signature = question_signature(query)
+            if question_signature(self._key_text(key)) != signature:
+                continue
+            record = self.record(self._key_records[key])
+            self.hits += 1
+            return FaqMatch(record["question"], record["route"], record["answer"],
+                            record.get("source", "reviewed"), round(score, 3))
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": self.num_records, "lookups": self.lookups, "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0}
+
+
+def load_faq_index(path: str, threshold: float) -> Optional[FaqIndex]:
+    """Open the FAQ index, returning None if the file is missing or invalid."""
+    try:
+        return FaqIndex(path, threshold)
+    except (OSError, ValueError, struct.error):
+        return None
@@ -0,0 +1,137 @@
+import json
+import math
+import random
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^\sa-z0-9]")
+
+
+def extract_features(text: str, num_buckets: int) -> Dict[int, float]:
+    """Hash word unigrams, bigrams and character trigrams into feature buckets.
+
+    crc32 is used instead of hash() so bucket ids are stable across processes.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    grams = [f"w:{token}" for token in tokens]
+    grams.extend(f"b:{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    for token in tokens:
+        if token.isalpha() and len(token) > 2:
+            padded = f"<{token}>"
+            grams.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+
+    features: Dict[int, float] = {}
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode("utf-8")) % num_buckets
+        features[bucket] = features.get(bucket, 0.0) + 1.0
+
+    # L2-normalize so long queries don't produce overconfident scores
+    norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+    return {bucket: value / norm for bucket, value in features.items()}
+
+
+class IntentClassifier:
+    """Multinomial logistic regression over hashed n-gram features.
+
+    Small enough to train in seconds and score a query in tens of
+    microseconds in pure Python, so routing does not need an LLM call
+    unless the model is unsure.
+    """
+
+    def __init__(self, labels: Sequence[str], num_buckets: int = 1 << 14):
+        self.labels = list(labels)
+        self.num_buckets = num_buckets
+        self.weights: List[Dict[int, float]] = [{} for _ in self.labels]
+        self.biases: List[float] = [0.0 for _ in self.labels]
+
+    def _scores(self, features: Dict[int, float]) -> List[float]:
+        scores = []
+        for weights, bias in zip(self.weights, self.biases):
+            score = bias
+            for bucket, value in features.items():
+                weight = weights.get(bucket)
+                if weight is not None:
+                    score += weight * value
+            scores.append(score)
+        return scores
+
+    @staticmethod
+    def _softmax(scores: List[float]) -> List[float]:
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Return the probability of each label for a query."""
+        probabilities = self._softmax(self._scores(extract_features(text, self.num_buckets)))
+        return dict(zip(self.labels, probabilities))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely label and its probability."""
+        probabilities = self._softmax(self._scores(extract_features(text, self.num_buckets)))
+        best = max(range(len(self.labels)), key=probabilities.__getitem__)
+        return self.labels[best], probabilities[best]
+
+    def train(self, examples: Sequence[Tuple[str, str]], epochs: int = 40,
+              learning_rate: float = 0.5, l2: float = 1e-4, seed: int = 0) -> None:
+        """Fit the model with SGD on (text, label) pairs."""
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        data = [(extract_features(text, self.num_buckets), label_index[label])
+                for text, label in examples]
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1.0 + 0.1 * epoch)
+            for features, target in data:
+                probabilities = self._softmax(self._scores(features))
+                for i, probability in enumerate(probabilities):
+                    gradient = probability - (1.0 if i == target else 0.0)
+                    weights = self.weights[i]
+                    for bucket, value in features.items():
+                        weight = weights.get(bucket, 0.0)
+                        weights[bucket] = weight - rate * (gradient * value + l2 * weight)
+                    self.biases[i] -= rate * gradient
+
+    def evaluate(self, examples: Sequence[Tuple[str, str]]) -> float:
+        """Return accuracy on (text, label) pairs."""
+        if not examples:
+            return 0.0
+        correct = sum(1 for text, label in examples if self.predict(text)[0] == label)
+        return correct / len(examples)
+
+    def save(self, path: str) -> None:
+        """Serialize the model to a JSON file, keeping only non-negligible weights."""
+        model = {
+            "labels": self.labels,
+            "num_buckets": self.num_buckets,
+            "biases": [round(bias, 6) for bias in self.biases],
+            "weights": [
+                {str(bucket): round(weight, 6) for bucket, weight in weights.items() if abs(weight) >= 1e-6}
+                for weights in self.weights
+            ],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(model, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """Load a model written by save()."""
+        with open(path, encoding="utf-8") as f:
+            model = json.load(f)
+        classifier = cls(model["labels"], model["num_buckets"])
+        classifier.biases = model["biases"]
+        classifier.weights = [
+            {int(bucket): weight for bucket, weight in weights.items()} for weights in model["weights"]
+        ]
+        return classifier
+
+
+def load_intent_classifier(path: str) -> Optional[IntentClassifier]:
+    """Load the intent model, returning None if the file is missing or invalid."""
+    try:
+        return IntentClassifier.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
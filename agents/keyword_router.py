@@ -0,0 +1,136 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from config import PHYSICS_CONSTANTS
+
+MATH_TERMS = [
+    'calculate', 'solve', 'equation', 'algebra', 'geometry', 'trigonometry',
+    'calculus', 'derivative', 'integral', 'math', 'mathematics', 'number',
+    'addition', 'subtraction', 'multiplication', 'division', 'fraction',
+    'percentage', 'ratio', 'proportion', 'polynomial', 'quadratic',
+    'linear', 'graph', 'function', 'variable', 'coefficient'
+]
+
+PHYSICS_TERMS = [
+    'physics', 'force', 'energy', 'motion', 'velocity', 'acceleration',
+    'newton', 'gravity', 'electromagnetic', 'quantum', 'thermodynamics',
+    'mechanics', 'optics', 'waves', 'electricity', 'magnetism',
+    'momentum', 'kinetic', 'potential', 'work', 'power', 'pressure',
+    'temperature', 'heat', 'light', 'radiation', 'atomic', 'nuclear',
+    'relativity', 'particle', 'field', 'circuit', 'resistance',
+    'current', 'voltage', 'frequency', 'wavelength', 'mass', 'weight'
+]
+
+# Everyday phrases naming a common physical constant, matched
+# case-insensitively. Full CODATA names are matched by the constants store.
+CONSTANT_ALIASES = {
+    alias.lower(): name for name, entry in PHYSICS_CONSTANTS.items() for alias in entry["aliases"]
+}
+
+# Bare symbols, matched case-sensitively as whole words so 'c' and 'G'
+# don't fire on every word containing those letters
+CONSTANT_SYMBOLS = {
+    'c': 'speed_of_light',
+    'G': 'gravitational_constant',
+}
+
+
+class RouteMatch(NamedTuple):
+    """Result of a single scan over a query."""
+    terms: Dict[str, Tuple[str, ...]]
+    scores: Dict[str, float]
+    constants: Tuple[str, ...]
+
+    def best_category(self, categories: Iterable[str] = ("MATH", "PHYSICS")) -> Optional[str]:
+        """Return the highest-scoring category, preferring earlier ones on ties."""
+        best, best_score = None, 0.0
+        for category in categories:
+            score = self.scores.get(category, 0.0)
+            if score > best_score:
+                best, best_score = category, score
+        return best
+
+
+class KeywordRouter:
+    """Matches every routing keyword and constant alias in one regex pass.
+
+    All vocabularies are compiled into a single word-boundary pattern at
+    construction time. Keywords also match their plural forms, so "forces"
+    and "equations" route the same way as "force" and "equation".
+    """
+
+    def __init__(self, vocabularies: Dict[str, Iterable[str]], constant_aliases: Dict[str, str],
+                 constant_symbols: Dict[str, str]):
+        self._folded: Dict[str, List[Tuple[str, str]]] = {}
+        self._exact: Dict[str, List[Tuple[str, str]]] = {}
+
+        for category, terms in vocabularies.items():
+            for term in terms:
+                self._folded.setdefault(term.lower(), []).append((category, term))
+        for alias, name in constant_aliases.items():
+            # A named constant is also evidence for a physics question
+            self._folded.setdefault(alias.lower(), []).extend([("CONSTANT", name), ("PHYSICS", alias)])
+        for symbol, name in constant_symbols.items():
+            self._exact.setdefault(symbol, []).append(("CONSTANT", name))
+
+        # Longest first so multi-word phrases win over their component words
+        folded = sorted(self._folded, key=len, reverse=True)
+        alternatives = [f"(?i:{re.escape(term)})(?:e?s)?" for term in folded]
+        alternatives.extend(re.escape(symbol) for symbol in sorted(self._exact, key=len, reverse=True))
+        self._pattern = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b")
+
+    def _lookup(self, text: str) -> List[Tuple[str, str]]:
+        exact = self._exact.get(text)
+        if exact is not None:
+            return exact
+        folded = text.lower()
+        for candidate in (folded, folded[:-1], folded[:-2]):
+            entries = self._folded.get(candidate)
+            if entries is not None:
+                return entries
+        return []
+
+    def scan(self, query: str) -> RouteMatch:
+        """Return the matched terms, per-category scores and constants for a query."""
+        terms: Dict[str, List[str]] = {}
+        constants: List[str] = []
+        for match in self._pattern.finditer(query):
+            for category, value in self._lookup(match.group()):
+                if category == "CONSTANT":
+                    if value not in constants:
+                        constants.append(value)
+                else:
+                    matched = terms.setdefault(category, [])
+                    if value not in matched:
+                        matched.append(value)
+
+        # Multi-word terms are more specific, so they count for more
+        scores = {
+            category: float(sum(len(term.split()) for term in matched))
+            for category, matched in terms.items()
+        }
+        return RouteMatch(
+            terms={category: tuple(matched) for category, matched in terms.items()},
+            scores=scores,
+            constants=tuple(constants),
+        )
+
+
+_router: Optional[KeywordRouter] = None
+
+
+def get_keyword_router() -> KeywordRouter:
+    """Return the process-wide router built from the default vocabularies."""
+    global _router
+    if _router is None:
+        _router = KeywordRouter(
+            {"MATH": MATH_TERMS, "PHYSICS": PHYSICS_TERMS}, CONSTANT_ALIASES, CONSTANT_SYMBOLS
+        )
+    return _router
+
+
+@lru_cache(maxsize=4096)
+def scan_query(query: str) -> RouteMatch:
+    """Scan a query with the shared router, memoized so routing and constant
+    lookup for the same request share one pass."""
+    return get_keyword_router().scan(query)
@@ -1,37 +1,48 @@
-from langchain_ollama import OllamaLLM
-from langchain.prompts import PromptTemplate
-from langchain.schema import BaseOutputParser
 from tools.calculator import Calculator
+from tools.expression_engine import format_result
+from tools.math_solver import MathSolver, Solution
+from agents.keyword_router import scan_query
+from core.generation import get_generation_policy
+from core.prompts import PromptSpec
+from langchain_core.runnables import Runnable
+from core.streaming import afilter_think_stream, filter_think_stream, strip_think
+from core.tracing import span
+import logging
 import re
-from typing import Dict, Any
-from config import OLLAMA_BASE_URL, MODEL_NAME
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+
+# "f(x) = x^2 + 1 for x = 1, 2, 3" / "g(t) = 2t at t from 0 to 10"
+FUNCTION_TABLE_PATTERN = re.compile(
+    r'\b[a-zA-Z]\((?P<var>[a-zA-Z])\)\s*=\s*(?P<expr>[^=?]+?)\s+(?:for|at|when)\s+(?P=var)\s*'
+    r'(?:=|in|from)\s*(?P<values>-?\d+(?:\.\d+)?(?:\s*,\s*-?\d+(?:\.\d+)?)*'
+    r'(?:\s*,?\s*(?:to|and)\s*-?\d+(?:\.\d+)?(?![\d.]|\s*[+\-*/^×÷]))?)'
+)
+NUMBER_RANGE_PATTERN = re.compile(r'(-?\d+(?:\.\d+)?)\s*to\s*(-?\d+(?:\.\d+)?)')
+MAX_TABLE_POINTS = 10000
+MAX_TABLE_ROWS = 20
 
 class MathAgent:
     """Specialist agent for mathematics-related queries."""
 
     def __init__(self):
-        self.llm = OllamaLLM(
-            base_url=OLLAMA_BASE_URL,
-            model=MODEL_NAME,
-            temperature=0.1
-        )
+        self.generation = get_generation_policy()
         self.calculator = Calculator()
+        self.solver = MathSolver(self.calculator)
 
-        self.prompt_template = PromptTemplate(
-            input_variables=["query"],
-            template="""You are a mathematics tutor. Answer the following math question clearly and step-by-step.
+        self.prompt_template = PromptSpec(
+            "math",
+            system="""You are a mathematics tutor. Answer the student's math question clearly and step-by-step.
 If the question involves calculations, show your work.
-
-Question: {query}
-
-Provide a clear, educational response that helps the student understand the concept and solution process."""
+Provide a clear, educational response that helps the student understand the concept and solution process.""",
+            template="""{history}Question: {query}
+{verified_result}"""
         )
 
     def _extract_calculations(self, text: str) -> list:
         """Extract mathematical expressions that can be calculated."""
         # Look for expressions with numbers and operators
         patterns = [
-            r'\b\d+(?:\.\d+)?\s*[+\-*/^]\s*\d+(?:\.\d+)?\b',
+            r'\b\d+(?:\.\d+)?\s*[+\-*/^×÷]\s*\d+(?:\.\d+)?\b',
             r'\b\d+(?:\.\d+)?\s*\^\s*\d+(?:\.\d+)?\b',
             r'√\d+(?:\.\d+)?',
         ]
@@ -43,57 +54,174 @@ Provide a clear, educational response that helps the student understand the conc
 
         return calculations
 
-    def _perform_calculations(self, calculations: list) -> Dict[str, float]:
+    def _perform_calculations(self, calculations: list) -> Dict[str, str]:
         """Perform the extracted calculations using the calculator tool."""
         results = {}
 
-        for calc in calculations:
-            try:
-                result = self.calculator.evaluate_expression(calc)
-                results[calc] = result
-            except Exception as e:
-                results[calc] = f"Error: {str(e)}"
+        # Evaluated together; failures come back per expression
+        for calc, outcome in zip(calculations, self.calculator.evaluate_many(calculations)):
+            results[calc] = format_result(outcome.value) if outcome.error is None else f"Error: {outcome.error}"
 
         return results
 
-    def process_query(self, query: str) -> str:
+    def _extract_function_table(self, text: str) -> Optional[Tuple[str, str, List[float]]]:
+        """Find "f(x) = <expr> for x = 1, 2, 3" or "... for x from 0 to 5" requests.
+
+        Returns (variable, expression, values), or None if there isn't one.
+        """
+        match = FUNCTION_TABLE_PATTERN.search(text)
+        if not match:
+            return None
+
+        variable, expression, values_text = match.group("var"), match.group("expr"), match.group("values")
+        number_range = NUMBER_RANGE_PATTERN.fullmatch(values_text.strip())
+        if number_range:
+            start, stop = float(number_range.group(1)), float(number_range.group(2))
+            count = int(abs(stop - start)) + 1
+            if count > MAX_TABLE_POINTS:
+                return None
+            step = 1.0 if stop >= start else -1.0
+            values = [start + i * step for i in range(count)]
+        else:
+            values = [float(number) for number in re.findall(r'-?\d+(?:\.\d+)?', values_text)]
+        if not values or len(values) > MAX_TABLE_POINTS:
+            return None
+        return variable, expression, values
+
+    def _format_function_table(self, query: str) -> str:
+        """Tabulate f(x) over the requested values in one vectorized evaluation."""
+        table = self._extract_function_table(query)
+        if table is None:
+            return ""
+
+        variable, expression, values = table
+        try:
+            result = self.calculator.evaluate_over(expression, {variable: values})
+        except ValueError:
+            return ""
+
+        formatted = f"\n\n**Function Values:**\n| {variable} | {expression} |\n|---|---|\n"
+        for value, output, error in list(zip(values, result.values.tolist(), result.errors))[:MAX_TABLE_ROWS]:
+            formatted += f"| {value:g} | {'undefined' if error else f'{output:g}'} |\n"
+        if len(values) > MAX_TABLE_ROWS:
+            formatted += f"\n_Showing {MAX_TABLE_ROWS} of {len(values)} values._\n"
+        return formatted
+
+    def _format_calculations(self, query: str) -> str:
+        """Run the calculator on expressions in the query and format the results."""
+        with span("calculator"):
+            formatted = self._format_function_table(query)
+
+            # Don't also report fragments of a tabulated function as calculations
+            calculations = self._extract_calculations(FUNCTION_TABLE_PATTERN.sub(" ", query))
+            if not calculations:
+                return formatted
+
+            calc_results = self._perform_calculations(calculations)
+        if not calc_results:
+            return formatted
+
+        formatted += "\n\n**Calculations:**\n"
+        for expr, result in calc_results.items():
+            formatted += f"• {expr} = {result}\n"
+        return formatted
+
+    def _solve(self, query: str) -> Optional[Solution]:
+        """Run the deterministic solver, logging when it can answer on its own."""
+        with span("math_solver") as stage:
+            solution = self.solver.solve(query)
+            stage.attributes["solved"] = solution is not None and solution.confident
+        if solution is not None and solution.confident:
+            logging.debug(f"MathAgent: Solved {solution.kind} without the LLM")
+        return solution
+
+    def _prompt_inputs(self, query: str, history: str, solution: Optional[Solution]) -> Dict[str, str]:
+        """Build the prompt variables, passing along any solver result for the LLM to explain."""
+        verified_result = ""
+        if solution is not None:
+            verified_result = (f"\nVerified result (computed exactly, use it rather than recomputing): "
+                               f"{solution.answer}\n")
+        return {"history": history, "query": query, "verified_result": verified_result}
+
+    def _chain(self, query: str) -> Runnable:
+        """The prompt chain, on the model and token budget the generation policy picks for this query."""
+        return self.prompt_template.chain(self.generation.llm("math", query, temperature=0.1))
+
+    def generate_response(self, query: str, history: str = "") -> str:
+        """Generate a response to a math query, raising on failure."""
+        solution = self._solve(query)
+        if solution is not None and solution.confident:
+            return solution.format()
+
+        # Generate initial response
+        chain = self._chain(query)
+        response = strip_think(chain.invoke(self._prompt_inputs(query, history, solution)))
+
+        # Append calculator results for expressions in the query, unless the
+        # solver already verified them (they'd only be fragments of its problem)
+        return response + ("" if solution else self._format_calculations(query))
+
+    def stream_query(self, query: str, history: str = "") -> Iterator[str]:
+        """Stream a response to a math query chunk by chunk, raising on failure."""
+        solution = self._solve(query)
+        if solution is not None and solution.confident:
+            yield solution.format()
+            return
+
+        chain = self._chain(query)
+        yield from filter_think_stream(chain.stream(self._prompt_inputs(query, history, solution)))
+
+        calculations = "" if solution else self._format_calculations(query)
+        if calculations:
+            yield calculations
+
+    async def agenerate_response(self, query: str, history: str = "") -> str:
+        """Async counterpart of generate_response."""
+        solution = self._solve(query)
+        if solution is not None and solution.confident:
+            return solution.format()
+
+        chain = self._chain(query)
+        response = strip_think(await chain.ainvoke(self._prompt_inputs(query, history, solution)))
+
+        return response + ("" if solution else self._format_calculations(query))
+
+    async def astream_query(self, query: str, history: str = "") -> AsyncIterator[str]:
+        """Async counterpart of stream_query."""
+        solution = self._solve(query)
+        if solution is not None and solution.confident:
+            yield solution.format()
+            return
+
+        chain = self._chain(query)
+        async for chunk in afilter_think_stream(chain.astream(self._prompt_inputs(query, history, solution))):
+            yield chunk
+
+        calculations = "" if solution else self._format_calculations(query)
+        if calculations:
+            yield calculations
+
+    def fallback_answer(self, query: str) -> str:
+        """What the solver and calculator can say on their own, for when no LLM is reachable."""
+        solution = self._solve(query)
+        if solution is not None:
+            return solution.format()
+        return self._format_calculations(query).strip()
+
+    def process_query(self, query: str, history: str = "") -> str:
         """Process a math query and return a comprehensive response."""
         try:
-            # Generate initial response
-            chain = self.prompt_template | self.llm
-            response = chain.invoke({"query": query})
-
-            # Clean up the response - remove any <think> sections
-            if "<think>" in response and "</think>" in response:
-                think_start = response.find("<think>")
-                think_end = response.find("</think>") + len("</think>")
-                response = response[:think_start] + response[think_end:]
-
-            # Extract and perform calculations
-            calculations = self._extract_calculations(query)
-            if calculations:
-                calc_results = self._perform_calculations(calculations)
-
-                # Append calculation results
-                if calc_results:
-                    response += "\n\n**Calculations:**\n"
-                    for expr, result in calc_results.items():
-                        response += f"• {expr} = {result}\n"
-
-            return response
+            return self.generate_response(query, history)
+        except Exception as e:
+            return f"I apologize, but I encountered an error while processing your math question: {str(e)}"
 
+    async def aprocess_query(self, query: str, history: str = "") -> str:
+        """Async counterpart of process_query."""
+        try:
+            return await self.agenerate_response(query, history)
         except Exception as e:
             return f"I apologize, but I encountered an error while processing your math question: {str(e)}"
 
     def can_handle_query(self, query: str) -> bool:
         """Determine if this agent can handle the given query."""
-        math_keywords = [
-            'calculate', 'solve', 'equation', 'algebra', 'geometry', 'trigonometry',
-            'calculus', 'derivative', 'integral', 'math', 'mathematics', 'number',
-            'addition', 'subtraction', 'multiplication', 'division', 'fraction',
-            'percentage', 'ratio', 'proportion', 'polynomial', 'quadratic',
-            'linear', 'graph', 'function', 'variable', 'coefficient'
-        ]
-
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in math_keywords)
+        return "MATH" in scan_query(query).terms
@@ -1,102 +1,167 @@
-from langchain_ollama import OllamaLLM
-from langchain.prompts import PromptTemplate
 from tools.physics_constants import PhysicsConstantsLookup
+from tools.physics_calculator import PhysicsCalculation, PhysicsCalculator
+from agents.keyword_router import CONSTANT_SYMBOLS, scan_query
+from core.generation import get_generation_policy
+from core.prompts import PromptSpec
+from langchain_core.runnables import Runnable
+from core.streaming import afilter_think_stream, filter_think_stream, strip_think
+from core.tracing import span
+import logging
 import re
-from typing import Dict, Any
-from config import OLLAMA_BASE_URL, MODEL_NAME
+from typing import Dict, Any, AsyncIterator, Iterator, Optional
 
 class PhysicsAgent:
     """Specialist agent for physics-related queries."""
 
     def __init__(self):
-        self.llm = OllamaLLM(
-            base_url=OLLAMA_BASE_URL,
-            model=MODEL_NAME,
-            temperature=0.1
-        )
+        self.generation = get_generation_policy()
         self.constants_lookup = PhysicsConstantsLookup()
+        self.calculator = PhysicsCalculator(self.constants_lookup.store)
 
-        self.prompt_template = PromptTemplate(
-            input_variables=["query", "constants_info"],
-            template="""You are a physics tutor. Answer the following physics question clearly and step-by-step.
+        self.prompt_template = PromptSpec(
+            "physics",
+            system="""You are a physics tutor. Answer the student's physics question clearly and step-by-step.
 Use fundamental physics principles and provide educational explanations.
-
-{constants_info}
-
-Question: {query}
-
-Provide a clear, educational response that helps the student understand the physics concepts involved."""
+Provide a clear, educational response that helps the student understand the physics concepts involved.""",
+            template="""{history}{constants_info}Question: {query}
+{verified_result}"""
         )
 
     def _find_relevant_constants(self, query: str) -> str:
         """Find and format relevant physics constants mentioned in the query."""
-        query_lower = query.lower()
+        with span("constants_lookup"):
+            return self._format_relevant_constants(query)
+
+    def _format_relevant_constants(self, query: str) -> str:
         constants_info = ""
 
-        # Check for specific constant names or related keywords
-        constant_keywords = {
-            'speed of light': 'speed_of_light',
-            'light speed': 'speed_of_light',
-            'c': 'speed_of_light',
-            'gravitational constant': 'gravitational_constant',
-            'gravity constant': 'gravitational_constant',
-            'g': 'gravitational_constant',
-            'planck': 'planck_constant',
-            'avogadro': 'avogadro_number',
-            'boltzmann': 'boltzmann_constant',
-            'elementary charge': 'elementary_charge',
-            'electron mass': 'electron_mass',
-            'proton mass': 'proton_mass',
-        }
+        # Names come from the constants index (longest match wins, so "reduced
+        # Planck constant" isn't also read as "Planck"); bare symbols like c
+        # and G come from the same scan used for routing
+        const_names = self.constants_lookup.find_in_text(query)
+        for const_name in scan_query(query).constants:
+            if const_name in CONSTANT_SYMBOLS.values() and const_name not in const_names:
+                const_names.append(const_name)
 
         found_constants = []
-        for keyword, const_name in constant_keywords.items():
-            if keyword in query_lower:
-                constant_data = self.constants_lookup.get_constant(const_name)
-                if constant_data:
-                    formatted = self.constants_lookup.format_constant(const_name, constant_data)
-                    found_constants.append(formatted)
+        for const_name in const_names:
+            constant_data = self.constants_lookup.get_constant(const_name)
+            if constant_data:
+                formatted = self.constants_lookup.format_constant(const_name, constant_data)
+                found_constants.append(formatted)
 
         if found_constants:
             constants_info = "Relevant Physical Constants:\n" + "\n".join(f"• {const}" for const in found_constants) + "\n"
 
         return constants_info
 
-    def process_query(self, query: str) -> str:
+    def _calculate(self, query: str) -> Optional[PhysicsCalculation]:
+        """Run the unit-aware calculator, logging when it can answer on its own."""
+        with span("physics_calculator") as stage:
+            calculation = self.calculator.calculate(query)
+            stage.attributes["solved"] = calculation is not None and calculation.confident
+        if calculation is not None and calculation.confident:
+            logging.debug(f"PhysicsAgent: Calculated {calculation.formula.target} without the LLM")
+        return calculation
+
+    def _prompt_inputs(self, query: str, history: str, calculation: Optional[PhysicsCalculation]) -> Dict[str, str]:
+        """Build the prompt variables, passing along any verified calculation for the LLM to explain."""
+        verified_result = ""
+        if calculation is not None:
+            verified_result = (f"Verified result (computed with {calculation.formula.equation}, "
+                               f"use it rather than recomputing): {calculation.answer}\n")
+        return {
+            "history": history,
+            "query": query,
+            "constants_info": self._find_relevant_constants(query),
+            "verified_result": verified_result,
+        }
+
+    @staticmethod
+    def _format_calculation(calculation: Optional[PhysicsCalculation]) -> str:
+        """Format a verified calculation to append after the LLM's explanation."""
+        if calculation is None:
+            return ""
+        return f"\n\n**Calculations:**\n• {calculation.worked}\n"
+
+    def _chain(self, query: str) -> Runnable:
+        """The prompt chain, on the model and token budget the generation policy picks for this query."""
+        return self.prompt_template.chain(self.generation.llm("physics", query, temperature=0.1))
+
+    def generate_response(self, query: str, history: str = "") -> str:
+        """Generate a response to a physics query, raising on failure."""
+        calculation = self._calculate(query)
+        if calculation is not None and calculation.confident:
+            return calculation.format()
+
+        # Generate response
+        chain = self._chain(query)
+        response = chain.invoke(self._prompt_inputs(query, history, calculation))
+
+        # Clean up the response - remove any <think> sections
+        return strip_think(response) + self._format_calculation(calculation)
+
+    def stream_query(self, query: str, history: str = "") -> Iterator[str]:
+        """Stream a response to a physics query chunk by chunk, raising on failure."""
+        calculation = self._calculate(query)
+        if calculation is not None and calculation.confident:
+            yield calculation.format()
+            return
+
+        chain = self._chain(query)
+        yield from filter_think_stream(chain.stream(self._prompt_inputs(query, history, calculation)))
+
+        calculations = self._format_calculation(calculation)
+        if calculations:
+            yield calculations
+
+    async def agenerate_response(self, query: str, history: str = "") -> str:
+        """Async counterpart of generate_response."""
+        calculation = self._calculate(query)
+        if calculation is not None and calculation.confident:
+            return calculation.format()
+
+        chain = self._chain(query)
+        response = await chain.ainvoke(self._prompt_inputs(query, history, calculation))
+
+        return strip_think(response) + self._format_calculation(calculation)
+
+    async def astream_query(self, query: str, history: str = "") -> AsyncIterator[str]:
+        """Async counterpart of stream_query."""
+        calculation = self._calculate(query)
+        if calculation is not None and calculation.confident:
+            yield calculation.format()
+            return
+
+        chain = self._chain(query)
+        async for chunk in afilter_think_stream(chain.astream(self._prompt_inputs(query, history, calculation))):
+            yield chunk
+
+        calculations = self._format_calculation(calculation)
+        if calculations:
+            yield calculations
+
+    def fallback_answer(self, query: str) -> str:
+        """What the calculator and constants table can say on their own, for when no LLM is reachable."""
+        calculation = self._calculate(query)
+        if calculation is not None:
+            return calculation.format()
+        return self._find_relevant_constants(query).strip()
+
+    def process_query(self, query: str, history: str = "") -> str:
         """Process a physics query and return a comprehensive response."""
         try:
-            # Find relevant constants
-            constants_info = self._find_relevant_constants(query)
-
-            # Generate response
-            chain = self.prompt_template | self.llm
-            response = chain.invoke({
-                "query": query,
-                "constants_info": constants_info
-            })
-
-            # Clean up the response - remove any <think> sections
-            if "<think>" in response and "</think>" in response:
-                think_start = response.find("<think>")
-                think_end = response.find("</think>") + len("</think>")
-                response = response[:think_start] + response[think_end:]
-
-            return response
+            return self.generate_response(query, history)
+        except Exception as e:
+            return f"I apologize, but I encountered an error while processing your physics question: {str(e)}"
 
+    async def aprocess_query(self, query: str, history: str = "") -> str:
+        """Async counterpart of process_query."""
+        try:
+            return await self.agenerate_response(query, history)
         except Exception as e:
             return f"I apologize, but I encountered an error while processing your physics question: {str(e)}"
 
     def can_handle_query(self, query: str) -> bool:
         """Determine if this agent can handle the given query."""
-        physics_keywords = [
-            'physics', 'force', 'energy', 'motion', 'velocity', 'acceleration',
-            'newton', 'gravity', 'electromagnetic', 'quantum', 'thermodynamics',
-            'mechanics', 'optics', 'waves', 'electricity', 'magnetism',
-            'momentum', 'kinetic', 'potential', 'work', 'power', 'pressure',
-            'temperature', 'heat', 'light', 'radiation', 'atomic', 'nuclear',
-            'relativity', 'particle', 'field', 'circuit', 'resistance',
-            'current', 'voltage', 'frequency', 'wavelength', 'mass', 'weight'
-        ]
-
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in physics_keywords)
+        return "PHYSICS" in scan_query(query).terms
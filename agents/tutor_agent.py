@@ -1,54 +1,122 @@
-from langchain_ollama import OllamaLLM
-from langchain.prompts import PromptTemplate
-from agents.math_agent import MathAgent
-from agents.physics_agent import PhysicsAgent
-from typing import Optional
-from config import OLLAMA_BASE_URL, MODEL_NAME
+from agents.intent_classifier import load_intent_classifier
+from agents.keyword_router import scan_query
+from agents.faq_index import FaqIndex, load_faq_index
+from core.response_cache import create_response_cache
+from core.coalescing import SingleFlight, coalescing_key
+from core.conversation_memory import create_conversation_memory
+from core.generation import get_generation_policy
+from core.llm_pool import get_llm_pool
+from core.resilience import BackendUnavailableError, is_llm_unavailable
+from core.prompts import PromptSpec, get_prompt_metrics
+from langchain_core.runnables import Runnable
+from core.startup import get_startup_profile
+from core.scheduler import QueueTimeoutError, SchedulerSaturatedError, get_scheduler, iterate_with_deadline
+from core.streaming import afilter_think_stream, filter_think_stream, strip_think
+from core.tracing import annotate, get_metrics, span, trace_request
+from typing import Any, Dict, List, Optional, AsyncIterator, Iterator
+from config import (
+    OLLAMA_BASE_URLS,
+    MODEL_NAME,
+    LLM_REQUEST_TIMEOUT,
+    INTENT_MODEL_PATH,
+    INTENT_CONFIDENCE_THRESHOLD,
+    MULTI_DOMAIN_POLICY,
+    MULTI_DOMAIN_MAX_WORKERS,
+    COALESCE_REQUESTS,
+    FAQ_INDEX_PATH,
+    FAQ_MATCH_THRESHOLD,
+    WARM_UP_TIMEOUT,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import logging
+import threading
+import time
 import traceback
 
+EMPTY_QUERY_RESPONSE = "Please ask me a question about mathematics or physics, and I'll be happy to help!"
+
+RESPONSE_HEADERS = {
+    "MATH": "**Mathematics Help:**\n\n",
+    "PHYSICS": "**Physics Help:**\n\n",
+    "GENERAL": "**General Response:**\n\n",
+    # Fan-out answers carry the header of each specialist that contributed
+    "MULTI": "",
+}
+
+FALLBACK_NOTE = "_The tutor's language model can't be reached right now, so this answer comes from its built-in tools only._\n\n"
+
 class TutorAgent:
     """Main agent that orchestrates interactions and delegates to specialist agents."""
 
     def __init__(self):
-        logging.info(f"TutorAgent: Initializing with model {MODEL_NAME} at {OLLAMA_BASE_URL}")
+        logging.info(f"TutorAgent: Initializing with model {MODEL_NAME} at {', '.join(OLLAMA_BASE_URLS)}")
         try:
-            self.llm = OllamaLLM(
-                base_url=OLLAMA_BASE_URL,
-                model=MODEL_NAME,
-                temperature=0.3
-            )
+            # Picks the model tier and token budget for every LLM call
+            self.generation = get_generation_policy()
             logging.info("TutorAgent: LLM initialized successfully")
 
-            # Initialize specialist agents
-            logging.info("TutorAgent: Initializing Math Agent")
-            self.math_agent = MathAgent()
-            logging.info("TutorAgent: Initializing Physics Agent")
-            self.physics_agent = PhysicsAgent()
-            logging.info("TutorAgent: Specialist agents initialized")
+            # Specialist agents are built on first use (or by warm_up)
+            self._math_agent = None
+            self._physics_agent = None
+            self._agents_lock = threading.Lock()
+            self.warm_up_state = "off"  # off, running or done
+
+            # Local intent model so most routing decisions skip the LLM round-trip
+            self.intent_classifier = load_intent_classifier(INTENT_MODEL_PATH)
+            if self.intent_classifier is None:
+                logging.warning(f"TutorAgent: Intent model not found at {INTENT_MODEL_PATH}, using LLM classification only")
+
+            # Worker threads for running both specialists at once on the sync path
+            self._fan_out_executor = None
+            if MULTI_DOMAIN_POLICY != "off":
+                self._fan_out_executor = ThreadPoolExecutor(
+                    max_workers=MULTI_DOMAIN_MAX_WORKERS, thread_name_prefix="tutor-fan-out"
+                )
+
+            # Curated answers to common questions, opened on first lookup; set
+            # faq_enabled to False to always generate
+            self._faq_index = None
+            self._faq_loaded = False
+            self.faq_enabled = True
+
+            # Cache of final responses so repeat questions skip the LLM entirely
+            self.response_cache = create_response_cache()
+
+            # Identical questions in flight at the same time share one generation
+            self.coalescer = SingleFlight() if COALESCE_REQUESTS else None
+
+            # Bounded per-session history so follow-up questions keep their context
+            self.memory = create_conversation_memory()
+
+            # Whether the session store or response cache do I/O (SQLite, the KV
+            # server); if so the async paths call them from a worker thread
+            self._blocking_stores = any(
+                getattr(store, "blocking", False) for store in (
+                    self.memory.store if self.memory is not None else None,
+                    self.response_cache.backend if self.response_cache is not None else None,
+                )
+            )
 
             # Classification prompt for intent recognition
-            self.classification_prompt = PromptTemplate(
-                input_variables=["query"],
-                template="""Classify the following student query into one of these categories:
+            self.classification_prompt = PromptSpec(
+                "classification",
+                system="""Classify the student query into one of these categories:
 - MATH: Mathematics, algebra, calculus, geometry, arithmetic, equations, numbers
 - PHYSICS: Physics, forces, energy, motion, thermodynamics, electricity, mechanics
 - GENERAL: General questions, greetings, or unclear topics
 
-Query: {query}
-
-Respond with only one word: MATH, PHYSICS, or GENERAL"""
+Respond with only one word: MATH, PHYSICS, or GENERAL""",
+                template="Query: {query}"
             )
 
             # General response prompt
-            self.general_prompt = PromptTemplate(
-                input_variables=["query"],
-                template="""You are a friendly tutor. Respond to the student's query helpfully.
+            self.general_prompt = PromptSpec(
+                "general",
+                system="""You are a friendly tutor. Respond to the student's query helpfully.
 If they're asking about topics you can help with, mention that you specialize in mathematics and physics.
-
-Student: {query}
-
-Provide a helpful and encouraging response."""
+Provide a helpful and encouraging response.""",
+                template="{history}Student: {query}"
             )
             logging.info("TutorAgent: Prompts initialized")
         except Exception as e:
@@ -57,76 +125,646 @@ Provide a helpful and encouraging response."""
             logging.error(f"TutorAgent: Traceback: {error_details}")
             raise
 
+    @property
+    def math_agent(self):
+        if self._math_agent is None:
+            with self._agents_lock:
+                if self._math_agent is None:
+                    from agents.math_agent import MathAgent  # deferred: not needed until the first math query
+                    logging.info("TutorAgent: Initializing Math Agent")
+                    self._math_agent = MathAgent()
+        return self._math_agent
+
+    @property
+    def physics_agent(self):
+        if self._physics_agent is None:
+            with self._agents_lock:
+                if self._physics_agent is None:
+                    from agents.physics_agent import PhysicsAgent  # deferred: not needed until the first physics query
+                    logging.info("TutorAgent: Initializing Physics Agent")
+                    self._physics_agent = PhysicsAgent()
+        return self._physics_agent
+
+    @property
+    def faq_index(self) -> Optional[FaqIndex]:
+        if not self._faq_loaded:
+            with self._agents_lock:
+                if not self._faq_loaded:
+                    self._faq_index = load_faq_index(FAQ_INDEX_PATH, FAQ_MATCH_THRESHOLD)
+                    if self._faq_index is None:
+                        logging.warning(f"TutorAgent: FAQ index not found at {FAQ_INDEX_PATH}, answering every query live")
+                    else:
+                        logging.info(f"TutorAgent: Loaded {len(self._faq_index)} FAQ answers")
+                    self._faq_loaded = True
+        return self._faq_index
+
+    def warm_up(self) -> None:
+        """Do the work the first request would otherwise pay for, timing each step.
+
+        Builds the specialists, parses the constants table and has Ollama
+        load the model. Failures are logged, not raised: the worker can
+        still serve, just more slowly at first.
+        """
+        profile = get_startup_profile()
+        self.warm_up_state = "running"
+        try:
+            with profile.phase("warm_up.agents"):
+                # The properties build each agent on first access
+                self.math_agent
+                self.physics_agent
+            with profile.phase("warm_up.constants"):
+                len(self.physics_agent.constants_lookup.store)
+                self.physics_agent.calculator.formulas
+            with profile.phase("warm_up.faq_index"):
+                self.faq_index
+            with profile.phase("warm_up.model_load"):
+                get_llm_pool().warm_up(WARM_UP_TIMEOUT, self.generation.tier_models())
+        except Exception as e:
+            logging.error(f"TutorAgent: Warm-up failed: {str(e)}")
+        finally:
+            self.warm_up_state = "done"
+            profile.log()
+
+    def start_warm_up(self) -> threading.Thread:
+        """Run warm_up in a background thread so the server can start meanwhile."""
+        self.warm_up_state = "running"
+        thread = threading.Thread(target=self.warm_up, name="tutor-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _classify_by_keywords(self, query: str) -> Optional[str]:
+        """Classify the query from specialist keywords, or return None if unclear."""
+        with span("keyword_routing") as stage:
+            match = scan_query(query)
+            if MULTI_DOMAIN_POLICY != "off" and "MATH" in match.terms and "PHYSICS" in match.terms:
+                logging.debug(f"TutorAgent: Query matches both specialists: {match.scores}")
+                classification = "MULTI"
+            else:
+                # Ties go to MATH, matching the order the specialists were checked in before
+                classification = match.best_category(("MATH", "PHYSICS"))
+                if classification is not None:
+                    logging.debug(f"TutorAgent: Keyword match for {classification}: {match.scores}")
+            stage.attributes["result"] = classification
+        return classification
+
+    def _classify_with_model(self, query: str) -> Optional[str]:
+        """Classify the query with the local intent model, or return None if unsure."""
+        if self.intent_classifier is None:
+            return None
+
+        with span("intent_model") as stage:
+            classification, confidence = self.intent_classifier.predict(query)
+            stage.attributes.update(result=classification, confidence=round(confidence, 2))
+        if confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            logging.debug(f"TutorAgent: Intent model classified query as {classification} ({confidence:.2f})")
+            return classification
+
+        logging.debug(f"TutorAgent: Intent model unsure ({classification}, {confidence:.2f})")
+        return None
+
+    def _classification_chain(self, query: str) -> Runnable:
+        return self.classification_prompt.chain(self.generation.llm("classification", query, temperature=0.3))
+
+    def _general_chain(self, query: str) -> Runnable:
+        return self.general_prompt.chain(self.generation.llm("general", query, temperature=0.3))
+
+    def _parse_classification(self, llm_output: str) -> str:
+        """Validate the LLM's one-word classification."""
+        classification = strip_think(llm_output).strip().upper()
+        logging.debug(f"TutorAgent: LLM classification result: {classification}")
+
+        if classification in ["MATH", "PHYSICS", "GENERAL"]:
+            return classification
+        else:
+            logging.warning(f"TutorAgent: Invalid classification '{classification}', defaulting to GENERAL")
+            return "GENERAL"
+
     def _classify_query(self, query: str) -> str:
         """Classify the query to determine which agent should handle it."""
         try:
-            # First, check if specialist agents can handle it directly
-            logging.info("TutorAgent: Checking if Math Agent can handle query")
-            if self.math_agent.can_handle_query(query):
-                logging.info("TutorAgent: Math Agent can handle query")
-                return "MATH"
-
-            logging.info("TutorAgent: Checking if Physics Agent can handle query")
-            if self.physics_agent.can_handle_query(query):
-                logging.info("TutorAgent: Physics Agent can handle query")
-                return "PHYSICS"
-
-            # Use LLM for classification if keyword matching is unclear
-            logging.info("TutorAgent: Using LLM for classification")
-            chain = self.classification_prompt | self.llm
-            classification = chain.invoke({"query": query}).strip().upper()
-            logging.info(f"TutorAgent: LLM classification result: {classification}")
-
-            # Validate classification result
-            if classification in ["MATH", "PHYSICS", "GENERAL"]:
+            # First, check if specialist agents can handle it directly,
+            # then ask the local intent model
+            classification = self._classify_by_keywords(query) or self._classify_with_model(query)
+            if classification is not None:
                 return classification
-            else:
-                logging.info(f"TutorAgent: Invalid classification '{classification}', defaulting to GENERAL")
-                return "GENERAL"
 
+            # Use LLM for classification only when both are unclear
+            with span("llm_classification"):
+                chain = self._classification_chain(query)
+                return self._parse_classification(chain.invoke({"query": query}))
+
+        except BackendUnavailableError as e:
+            logging.warning(f"TutorAgent: Classifying without the LLM: {str(e)}")
+            return "GENERAL"
         except Exception as e:
             error_details = traceback.format_exc()
             logging.error(f"TutorAgent: Error during classification: {str(e)}")
             logging.error(f"TutorAgent: Traceback: {error_details}")
             return "GENERAL"
 
-    def process_query(self, query: str) -> str:
-        """Process a student query by delegating to the appropriate agent."""
-        if not query or not query.strip():
-            return "Please ask me a question about mathematics or physics, and I'll be happy to help!"
+    async def _aclassify_query(self, query: str) -> str:
+        """Async counterpart of _classify_query."""
+        try:
+            classification = self._classify_by_keywords(query) or self._classify_with_model(query)
+            if classification is not None:
+                return classification
+
+            with span("llm_classification"):
+                chain = self._classification_chain(query)
+                llm_output = await chain.ainvoke({"query": query})
+                return self._parse_classification(llm_output)
+
+        except (SchedulerSaturatedError, QueueTimeoutError):
+            raise
+        except BackendUnavailableError as e:
+            logging.warning(f"TutorAgent: Classifying without the LLM: {str(e)}")
+            return "GENERAL"
+        except Exception as e:
+            error_details = traceback.format_exc()
+            logging.error(f"TutorAgent: Error during classification: {str(e)}")
+            logging.error(f"TutorAgent: Traceback: {error_details}")
+            return "GENERAL"
 
+    def _combine_answers(self, answers: Dict[str, str], errors: List[Exception]) -> str:
+        """Join specialist answers under their headers, raising if none succeeded."""
+        if not answers:
+            raise errors[0]
+        return "\n\n".join(
+            RESPONSE_HEADERS[name] + answers[name] for name in ("MATH", "PHYSICS") if name in answers
+        )
+
+    def _fan_out(self, query: str, history: str = "") -> str:
+        """Run both specialists concurrently for a query spanning math and physics.
+
+        With the "first" policy the first non-empty answer is returned and the
+        other call is abandoned; with "merge" both answers are combined.
+        Either way wall-clock time is that of the slower agent at most. A
+        running call can't be stopped from another thread, so an abandoned
+        call still finishes in the background, using its worker thread and
+        LLM slot; only _afan_out saves that work.
+        """
+        futures = {
+            self._fan_out_executor.submit(self.math_agent.generate_response, query, history): "MATH",
+            self._fan_out_executor.submit(self.physics_agent.generate_response, query, history): "PHYSICS",
+        }
+        answers: Dict[str, str] = {}
+        errors: List[Exception] = []
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                answer = future.result()
+            except Exception as e:
+                logging.warning(f"TutorAgent: {name} agent failed during fan-out: {str(e)}")
+                errors.append(e)
+                continue
+
+            if MULTI_DOMAIN_POLICY == "first" and answer.strip():
+                logging.debug(f"TutorAgent: {name} agent answered first")
+                for other in futures:
+                    if not other.done() and not other.cancel():
+                        logging.debug(f"TutorAgent: {futures[other]} agent keeps running in the background")
+                return RESPONSE_HEADERS[name] + answer
+            answers[name] = answer
+
+        return self._combine_answers(answers, errors)
+
+    async def _afan_out(self, query: str, history: str = "") -> str:
+        """Async counterpart of _fan_out; the losing call is cancelled outright."""
+        tasks = {
+            asyncio.ensure_future(self.math_agent.agenerate_response(query, history)): "MATH",
+            asyncio.ensure_future(self.physics_agent.agenerate_response(query, history)): "PHYSICS",
+        }
+        answers: Dict[str, str] = {}
+        errors: List[Exception] = []
+        pending = set(tasks)
         try:
-            logging.info(f"TutorAgent: Processing query: '{query}'")
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: tasks[t] != "MATH"):
+                    name = tasks[task]
+                    if task.exception() is not None:
+                        logging.warning(f"TutorAgent: {name} agent failed during fan-out: {task.exception()}")
+                        errors.append(task.exception())
+                        continue
+
+                    answer = task.result()
+                    if MULTI_DOMAIN_POLICY == "first" and answer.strip():
+                        logging.debug(f"TutorAgent: {name} agent answered first")
+                        return RESPONSE_HEADERS[name] + answer
+                    answers[name] = answer
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return self._combine_answers(answers, errors)
+
+    async def _astream_fan_out(self, query: str, history: str) -> AsyncIterator[str]:
+        yield await self._afan_out(query, history)
+
+    def _history(self, session_id: Optional[str]) -> str:
+        """Return the session's conversation context for the prompt ("" without a session)."""
+        if self.memory is None or session_id is None:
+            return ""
+        with span("memory_load"):
+            return self.memory.context(session_id)
+
+    def _remember(self, session_id: Optional[str], query: str, response: str) -> None:
+        if self.memory is not None and session_id is not None:
+            with span("memory_save"):
+                self.memory.add_turn(session_id, query, response)
+
+    async def _off_loop(self, function, *args):
+        """Call a session store or response cache function without blocking the event loop.
+
+        A slow SQLite lock or KV round trip would otherwise stall every
+        request this worker is serving.
+        """
+        if self._blocking_stores:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    def _faq_response(self, query: str) -> Optional[str]:
+        if not self.faq_enabled or self.faq_index is None:
+            return None
+        with span("faq_lookup") as stage:
+            match = self.faq_index.match(query)
+            stage.attributes["hit"] = match is not None
+        if match is None:
+            return None
+        annotate(route="FAQ", faq_score=match.score)
+        return RESPONSE_HEADERS[match.route] + match.answer
+
+    def _cached_response(self, query: str, history: str) -> Optional[str]:
+        """Look up a curated FAQ answer, then a cached one.
+
+        FAQ answers stand on their own, so they are served whatever the
+        history; cached answers given with conversation context are never shared.
+        """
+        faq = self._faq_response(query)
+        if faq is not None:
+            return faq
+        if self.response_cache is None or history:
+            return None
+        with span("cache_lookup") as stage:
+            cached = self.response_cache.get(query)
+            stage.attributes["hit"] = cached is not None
+        if cached is not None:
+            annotate(route="CACHED")
+        return cached
+
+    def _cache_response(self, query: str, history: str, response: str) -> None:
+        if self.response_cache is not None and not history:
+            self.response_cache.set(query, response)
 
-            # Classify the query
-            logging.info("TutorAgent: Classifying query...")
-            classification = self._classify_query(query)
-            logging.info(f"TutorAgent: Query classified as: {classification}")
+    def _fallback_response(self, query: str, error: Exception) -> str:
+        """Answer without the LLM after it failed or while no backend is available, or re-raise the error.
 
-            # Delegate to appropriate agent
+        Tries the response cache (whatever the history), then the
+        specialists' deterministic tools. Fallback answers are neither
+        cached nor remembered.
+        """
+        with span("fallback") as stage:
+            response = self.response_cache.get(query) if self.response_cache is not None else None
+            if response is None:
+                agents = [self.math_agent, self.physics_agent]
+                if self._classify_by_keywords(query) == "PHYSICS":
+                    agents.reverse()
+                answer = next((answer for answer in (agent.fallback_answer(query) for agent in agents) if answer), "")
+                response = FALLBACK_NOTE + answer if answer else None
+            stage.attributes["served"] = response is not None
+        if response is None:
+            raise error
+        annotate(route="FALLBACK")
+        get_metrics().increment("tutor_fallback_responses_total")
+        return response
+
+    def _error_response(self, error: Exception) -> str:
+        return f"I apologize, but I encountered an error while processing your question. Please try rephrasing your query or ask about a specific mathematics or physics topic. Error: {str(error)}"
+
+    def _coalesces(self, history: str) -> bool:
+        # With history the answer depends on the conversation, not just the question
+        return self.coalescer is not None and not history
+
+    def _generate_response(self, query: str, classification: str, history: str) -> str:
+        # Delegate to appropriate agent
+        with span("generate", agent=classification.lower()):
             if classification == "MATH":
-                logging.info("TutorAgent: Delegating to Math Agent")
-                response = self.math_agent.process_query(query)
-                return f"**Mathematics Help:**\n\n{response}"
+                response = self.math_agent.generate_response(query, history)
 
             elif classification == "PHYSICS":
-                logging.info("TutorAgent: Delegating to Physics Agent")
-                response = self.physics_agent.process_query(query)
-                return f"**Physics Help:**\n\n{response}"
+                response = self.physics_agent.generate_response(query, history)
+
+            elif classification == "MULTI":
+                response = self._fan_out(query, history)
+
+            else:  # GENERAL
+                chain = self._general_chain(query)
+                response = strip_think(chain.invoke({"history": history, "query": query}))
+
+        return RESPONSE_HEADERS[classification] + response
+
+    def process_query(self, query: str, session_id: Optional[str] = None) -> str:
+        """Process a student query by delegating to the appropriate agent.
+
+        With a session_id, earlier turns of that conversation are passed to
+        the agents as context and this exchange is added to it.
+        """
+        if not query or not query.strip():
+            return EMPTY_QUERY_RESPONSE
+
+        with trace_request("query") as trace:
+            try:
+                logging.debug(f"TutorAgent: Processing query: '{query}'")
+
+                history = self._history(session_id)
+                cached = self._cached_response(query, history)
+                if cached is not None:
+                    self._remember(session_id, query, cached)
+                    return cached
+
+                # Classify the query
+                classification = self._classify_query(query)
+                annotate(route=classification)
+
+                try:
+                    if self._coalesces(history):
+                        response = self.coalescer.call(
+                            coalescing_key(classification, query),
+                            lambda: self._generate_response(query, classification, history),
+                        )
+                    else:
+                        response = self._generate_response(query, classification, history)
+                except Exception as e:
+                    if not is_llm_unavailable(e):
+                        raise
+                    return self._fallback_response(query, e)
+
+                # Only successful responses reach this point, so errors are never cached
+                # or remembered
+                self._cache_response(query, history, response)
+                self._remember(session_id, query, response)
+                return response
+
+            except Exception as e:
+                trace.attributes["outcome"] = "error"
+                error_details = traceback.format_exc()
+                logging.error(f"TutorAgent: Error processing query: {str(e)}")
+                logging.error(f"TutorAgent: Traceback: {error_details}")
+                return self._error_response(e)
+
+    def stream_query(self, query: str, session_id: Optional[str] = None) -> Iterator[str]:
+        """Stream the response to a student query as incremental text chunks."""
+        if not query or not query.strip():
+            yield EMPTY_QUERY_RESPONSE
+            return
+
+        with trace_request("stream") as trace:
+            try:
+                logging.debug(f"TutorAgent: Streaming query: '{query}'")
+
+                history = self._history(session_id)
+                cached = self._cached_response(query, history)
+                if cached is not None:
+                    self._remember(session_id, query, cached)
+                    yield cached
+                    return
+
+                classification = self._classify_query(query)
+                annotate(route=classification)
+
+                if classification == "MATH":
+                    chunks = self.math_agent.stream_query(query, history)
+                elif classification == "PHYSICS":
+                    chunks = self.physics_agent.stream_query(query, history)
+                elif classification == "MULTI":
+                    # Both agents run at once, so the combined answer arrives in one piece
+                    chunks = iter([self._fan_out(query, history)])
+                else:  # GENERAL
+                    chain = self._general_chain(query)
+                    chunks = filter_think_stream(chain.stream({"history": history, "query": query}))
+
+                parts = [RESPONSE_HEADERS[classification]]
+                if parts[0]:
+                    yield parts[0]
+                with span("generate", agent=classification.lower(), streamed=True) as stage:
+                    try:
+                        for chunk in chunks:
+                            if len(parts) == 1:
+                                stage.attributes["first_chunk_ms"] = round((time.perf_counter() - stage.start) * 1000, 1)
+                            parts.append(chunk)
+                            yield chunk
+                    except Exception as e:
+                        # Part of an answer can't be taken back, so only fall back before the first chunk
+                        if len(parts) > 1 or not is_llm_unavailable(e):
+                            raise
+                        fallback = self._fallback_response(query, e)
+                        yield fallback[len(parts[0]):] if fallback.startswith(parts[0]) else fallback
+                        return
+
+                response = "".join(parts)
+                self._cache_response(query, history, response)
+                self._remember(session_id, query, response)
+
+            except Exception as e:
+                trace.attributes["outcome"] = "error"
+                error_details = traceback.format_exc()
+                logging.error(f"TutorAgent: Error streaming query: {str(e)}")
+                logging.error(f"TutorAgent: Traceback: {error_details}")
+                yield "\n\n" + self._error_response(e)
+
+    async def aclassify_query(self, query: str) -> str:
+        """Classify a query without answering it, e.g. to group queries in bulk."""
+        return await self._aclassify_query(query)
+
+    async def agenerate_routed_response(self, query: str, classification: str,
+                                        session_id: Optional[str] = None) -> str:
+        """Answer a query that has already been classified, raising on failure.
+
+        Successful responses are cached and remembered exactly as in aprocess_query.
+        """
+        with trace_request("routed"):
+            history = await self._off_loop(self._history, session_id)
+            cached = await self._off_loop(self._cached_response, query, history)
+            if cached is not None:
+                await self._off_loop(self._remember, session_id, query, cached)
+                return cached
+
+            return await self._agenerate_routed_response(query, classification, history, session_id)
+
+    async def _agenerate_routed_response(self, query: str, classification: str, history: str,
+                                         session_id: Optional[str]) -> str:
+        annotate(route=classification)
+        try:
+            if self._coalesces(history):
+                response = await self.coalescer.run(
+                    coalescing_key(classification, query),
+                    lambda: self._agenerate_response(query, classification, history),
+                )
+            else:
+                response = await self._agenerate_response(query, classification, history)
+        except Exception as e:
+            if not is_llm_unavailable(e):
+                raise
+            return await self._off_loop(self._fallback_response, query, e)
+
+        await self._off_loop(self._cache_response, query, history, response)
+        await self._off_loop(self._remember, session_id, query, response)
+        return response
 
+    async def _agenerate_response(self, query: str, classification: str, history: str) -> str:
+        with span("generate", agent=classification.lower()):
+            if classification == "MATH":
+                response = await self.math_agent.agenerate_response(query, history)
+            elif classification == "PHYSICS":
+                response = await self.physics_agent.agenerate_response(query, history)
+            elif classification == "MULTI":
+                response = await self._afan_out(query, history)
             else:  # GENERAL
-                logging.info("TutorAgent: Handling as general query")
-                chain = self.general_prompt | self.llm
-                logging.info("TutorAgent: Invoking LLM for general response")
-                response = chain.invoke({"query": query})
-                logging.info("TutorAgent: LLM response received")
-                return f"**General Response:**\n\n{response}"
+                chain = self._general_chain(query)
+                response = strip_think(await chain.ainvoke({"history": history, "query": query}))
+
+        return RESPONSE_HEADERS[classification] + response
+
+    async def _aprocess_query(self, query: str, session_id: Optional[str]) -> str:
+        history = await self._off_loop(self._history, session_id)
+        cached = await self._off_loop(self._cached_response, query, history)
+        if cached is not None:
+            await self._off_loop(self._remember, session_id, query, cached)
+            return cached
+
+        classification = await self._aclassify_query(query)
+        return await self._agenerate_routed_response(query, classification, history, session_id)
+
+    async def aanswer(self, query: str, session_id: Optional[str] = None,
+                      timeout: float = LLM_REQUEST_TIMEOUT) -> str:
+        """Answer a query within timeout seconds, raising on failure instead of apologizing.
 
+        For callers such as the JSON API that report errors themselves;
+        raises asyncio.TimeoutError, SchedulerSaturatedError or
+        QueueTimeoutError when the LLM can't keep up.
+        """
+        with trace_request("query"):
+            return await asyncio.wait_for(self._aprocess_query(query, session_id), timeout)
+
+    async def aprocess_query(self, query: str, session_id: Optional[str] = None) -> str:
+        """Async counterpart of process_query, bounded by LLM_REQUEST_TIMEOUT."""
+        if not query or not query.strip():
+            return EMPTY_QUERY_RESPONSE
+
+        try:
+            logging.debug(f"TutorAgent: Processing query asynchronously: '{query}'")
+            return await self.aanswer(query, session_id)
+
+        except asyncio.TimeoutError:
+            logging.error(f"TutorAgent: Query timed out after {LLM_REQUEST_TIMEOUT}s")
+            return self._error_response(TimeoutError("the tutor took too long to respond"))
         except Exception as e:
             error_details = traceback.format_exc()
             logging.error(f"TutorAgent: Error processing query: {str(e)}")
             logging.error(f"TutorAgent: Traceback: {error_details}")
-            return f"I apologize, but I encountered an error while processing your question. Please try rephrasing your query or ask about a specific mathematics or physics topic. Error: {str(e)}"
+            return self._error_response(e)
+
+    async def astream_answer(self, query: str, session_id: Optional[str] = None,
+                             timeout: float = LLM_REQUEST_TIMEOUT) -> AsyncIterator[str]:
+        """Stream an answer within timeout seconds, raising on failure like aanswer."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        with trace_request("stream"):
+            history = await self._off_loop(self._history, session_id)
+            cached = await self._off_loop(self._cached_response, query, history)
+            if cached is not None:
+                await self._off_loop(self._remember, session_id, query, cached)
+                yield cached
+                return
+
+            classification = await asyncio.wait_for(
+                self._aclassify_query(query), deadline - loop.time()
+            )
+            annotate(route=classification)
+
+            if self._coalesces(history):
+                # Each request still gets every chunk, replayed from the start if it joins late
+                chunks = self.coalescer.stream(
+                    coalescing_key(classification, query),
+                    lambda: self._astream_route(query, classification, history),
+                )
+            else:
+                chunks = self._astream_route(query, classification, history)
+
+            parts = [RESPONSE_HEADERS[classification]]
+            if parts[0]:
+                yield parts[0]
+            with span("generate", agent=classification.lower(), streamed=True) as stage:
+                try:
+                    async for chunk in iterate_with_deadline(chunks, deadline):
+                        if len(parts) == 1:
+                            stage.attributes["first_chunk_ms"] = round((time.perf_counter() - stage.start) * 1000, 1)
+                        parts.append(chunk)
+                        yield chunk
+                except Exception as e:
+                    # Part of an answer can't be taken back, so only fall back before the first chunk
+                    if len(parts) > 1 or not is_llm_unavailable(e):
+                        raise
+                    fallback = await self._off_loop(self._fallback_response, query, e)
+                    yield fallback[len(parts[0]):] if fallback.startswith(parts[0]) else fallback
+                    return
+
+            response = "".join(parts)
+            await self._off_loop(self._cache_response, query, history, response)
+            await self._off_loop(self._remember, session_id, query, response)
+
+    async def astream_query(self, query: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Async counterpart of stream_query, bounded by LLM_REQUEST_TIMEOUT."""
+        if not query or not query.strip():
+            yield EMPTY_QUERY_RESPONSE
+            return
+
+        try:
+            logging.debug(f"TutorAgent: Streaming query asynchronously: '{query}'")
+            async for chunk in self.astream_answer(query, session_id):
+                yield chunk
+
+        except asyncio.TimeoutError:
+            logging.error(f"TutorAgent: Stream timed out after {LLM_REQUEST_TIMEOUT}s")
+            yield "\n\n" + self._error_response(TimeoutError("the tutor took too long to respond"))
+        except Exception as e:
+            error_details = traceback.format_exc()
+            logging.error(f"TutorAgent: Error streaming query: {str(e)}")
+            logging.error(f"TutorAgent: Traceback: {error_details}")
+            yield "\n\n" + self._error_response(e)
+
+    def _astream_route(self, query: str, classification: str, history: str) -> AsyncIterator[str]:
+        if classification == "MATH":
+            return self.math_agent.astream_query(query, history)
+        if classification == "PHYSICS":
+            return self.physics_agent.astream_query(query, history)
+        if classification == "MULTI":
+            return self._astream_fan_out(query, history)
+        return self._astream_general(query, history)  # GENERAL
+
+    async def _astream_general(self, query: str, history: str) -> AsyncIterator[str]:
+        chain = self._general_chain(query)
+        async for chunk in afilter_think_stream(chain.astream({"history": history, "query": query})):
+            yield chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return this process's latency and token histograms and component counters."""
+        stats = {
+            "metrics": get_metrics().stats(),
+            "prompts": get_prompt_metrics().stats(),
+            "llm_backends": get_scheduler().stats(),
+            "llm_circuits": get_llm_pool().circuit_stats(),
+        }
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        if self.memory is not None:
+            stats["memory"] = self.memory.stats()
+        if self._faq_index is not None:
+            stats["faq_index"] = self._faq_index.stats()
+        if self.coalescer is not None:
+            stats["coalescing"] = self.coalescer.stats()
+        return stats
 
     def get_capabilities(self) -> str:
         """Return information about the tutor's capabilities."""
@@ -0,0 +1,327 @@
+"""Headless JSON API for the tutoring bot; runs without Gradio.
+
+Usage:
+    python api.py    # listens on SERVER_NAME:SERVER_PORT like app.py
+
+Endpoints:
+    POST /v1/ask          {"query": ..., "session_id": ..., "timeout": ...}
+    POST /v1/ask/stream   same body, answered as server-sent events
+    POST /v1/batch        {"items": [{"id": ..., "query": ...}], "concurrency": ..., "timeout": ...}
+    GET  /v1/stats        latency, token and component statistics as JSON
+    GET  /metrics         the same histograms in the Prometheus text format
+    GET  /healthz, /readyz
+
+Every response carries an X-Request-ID (the caller's, if sent). Requests
+beyond API_MAX_CONCURRENT_REQUESTS get 429, and an overloaded LLM queue
+(or, with no fallback answer, Ollama backends that are unreachable, stall
+or fail, whether or not their circuits have opened yet) gets 503; both
+include Retry-After.
+"""
+from core.startup import get_startup_profile  # first, so the boot clock covers every import
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+import uvicorn
+from agents.tutor_agent import TutorAgent
+from core.batch import BatchItem, BatchRunner
+from core.health import liveness, readiness
+from core.llm_pool import get_llm_pool
+from core.logging_setup import configure_logging
+from core.resilience import BackendUnavailableError, LLMDeadlineError, is_llm_unavailable
+from core.scheduler import QueueTimeoutError, SchedulerSaturatedError, get_scheduler
+from core.tracing import get_metrics, set_request_id
+from config import (
+    API_BATCH_TIMEOUT,
+    API_MAX_BATCH_ITEMS,
+    API_MAX_CONCURRENT_REQUESTS,
+    API_RETRY_AFTER,
+    BATCH_CONCURRENCY,
+    LLM_REQUEST_TIMEOUT,
+    WARM_UP_ON_START,
+    WORKER_ID,
+)
+
+
+class AskRequest(BaseModel):
+    query: str = Field(min_length=1)
+    session_id: Optional[str] = None
+    timeout: Optional[float] = Field(default=None, gt=0)
+
+
+class BatchItemRequest(BaseModel):
+    id: Optional[str] = None
+    query: str
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItemRequest]
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    timeout: Optional[float] = Field(default=None, gt=0)
+
+
+class APIError(Exception):
+    """An error reported to the client as a JSON body with this status code."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class AdmissionControl:
+    """Caps the requests a worker works on at once, rejecting the rest immediately.
+
+    Failing fast with 429 lets a load balancer or client retry elsewhere
+    instead of piling requests onto an LLM that is already saturated.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    def acquire(self) -> Callable[[], None]:
+        """Take a slot and return an idempotent function that releases it."""
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise APIError(429, "Too many requests in progress; please retry shortly")
+        self.in_flight += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+
+        return release
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        release = self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+
+def error_status(error: Exception) -> Tuple[int, str]:
+    """Map a failure from the tutor to an HTTP status and message."""
+    if isinstance(error, (SchedulerSaturatedError, QueueTimeoutError, BackendUnavailableError)):
+        return 503, str(error)
+    if isinstance(error, asyncio.TimeoutError) and not isinstance(error, LLMDeadlineError):
+        return 504, "The tutor took too long to respond"
+    if is_llm_unavailable(error):
+        # Connection errors, stalls and 5xx responses that outlasted the retries,
+        # before enough of them have opened the circuit breakers
+        return 503, f"The language model is unavailable: {str(error) or type(error).__name__}"
+    if isinstance(error, APIError):
+        return error.status_code, error.message
+    return 500, f"Internal error: {str(error)}"
+
+
+def _request_id(request: Request) -> str:
+    request_id = getattr(request.state, "request_id", None)
+    if request_id is None:
+        request_id = request.state.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        set_request_id(request_id)
+    return request_id
+
+
+def _headers(request_id: str, status_code: int = 200) -> Dict[str, str]:
+    headers = {"X-Request-ID": request_id}
+    if status_code in (429, 503):
+        headers["Retry-After"] = str(API_RETRY_AFTER)
+    return headers
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def register_gauges(tutor_agent, admission: AdmissionControl) -> None:
+    """Expose current queue depths and store sizes alongside the histograms in /metrics."""
+    metrics = get_metrics()
+    scheduler = get_scheduler()
+    metrics.add_gauge("tutor_api_in_flight", "Requests this worker is working on",
+                      lambda: [({}, admission.in_flight)])
+    metrics.add_gauge("tutor_llm_in_flight", "LLM calls in progress per Ollama backend",
+                      lambda: [({"backend": backend}, state["in_flight"]) for backend, state in scheduler.stats().items()])
+    metrics.add_gauge("tutor_llm_queued", "LLM calls waiting for a slot per Ollama backend",
+                      lambda: [({"backend": backend}, state["queued"]) for backend, state in scheduler.stats().items()])
+    metrics.add_gauge("tutor_llm_circuit_open", "1 while an Ollama backend's circuit breaker is open",
+                      lambda: [({"backend": backend}, float(state["state"] == "open"))
+                               for backend, state in get_llm_pool().circuit_stats().items()])
+    if tutor_agent.response_cache is not None:
+        cache = tutor_agent.response_cache
+        metrics.add_gauge("tutor_response_cache_entries", "Entries in the response cache",
+                          lambda: [({}, cache.stats()["entries"])])
+    if tutor_agent.memory is not None:
+        memory = tutor_agent.memory
+        metrics.add_gauge("tutor_memory_sessions", "Conversations held by the session store",
+                          lambda: [({"backend": memory.store.name}, len(memory.store))])
+
+
+def create_api(tutor_agent, max_concurrent: int = API_MAX_CONCURRENT_REQUESTS,
+               max_batch_items: int = API_MAX_BATCH_ITEMS) -> FastAPI:
+    """Build the JSON API around a TutorAgent."""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        startup = get_startup_profile()
+        startup.mark("server_start")
+        startup.log()
+        yield
+
+    api = FastAPI(title="Multi-Agent Tutoring Bot API", lifespan=lifespan)
+    admission = AdmissionControl(max_concurrent)
+    api.state.admission = admission
+    register_gauges(tutor_agent, admission)
+
+    def request_timeout(timeout: Optional[float]) -> float:
+        # Callers may ask for less time than the server allows, never more
+        return min(timeout or LLM_REQUEST_TIMEOUT, LLM_REQUEST_TIMEOUT)
+
+    def check_query(query: str) -> None:
+        if not query.strip():
+            raise APIError(400, "query must not be empty")
+
+    @api.exception_handler(APIError)
+    async def api_error_handler(request: Request, error: APIError):
+        request_id = _request_id(request)
+        return JSONResponse({"request_id": request_id, "error": error.message},
+                            status_code=error.status_code, headers=_headers(request_id, error.status_code))
+
+    @api.get("/healthz")
+    def healthz():
+        return liveness()
+
+    @api.get("/readyz")
+    def readyz():
+        ready, report = readiness(tutor_agent)
+        report["in_flight"] = admission.in_flight
+        return JSONResponse(report, status_code=200 if ready else 503)
+
+    @api.get("/metrics")
+    def metrics():
+        return PlainTextResponse(get_metrics().prometheus(), media_type="text/plain; version=0.0.4")
+
+    @api.get("/v1/stats")
+    def stats():
+        return {**tutor_agent.get_stats(), "api": {"in_flight": admission.in_flight, "rejected": admission.rejected}}
+
+    @api.post("/v1/ask")
+    async def ask(body: AskRequest, request: Request):
+        request_id = _request_id(request)
+        check_query(body.query)
+        start = time.perf_counter()
+        with admission.admit():
+            try:
+                response = await tutor_agent.aanswer(body.query, body.session_id, request_timeout(body.timeout))
+            except Exception as e:
+                status_code, message = error_status(e)
+                # Unexpected errors get their traceback in the same record
+                logging.error(f"API: Request {request_id} failed ({status_code}): {str(e)}", exc_info=status_code == 500)
+                raise APIError(status_code, message) from e
+
+        logging.info(f"API: Request {request_id} answered in {_elapsed_ms(start)}ms")
+        return JSONResponse({"request_id": request_id, "response": response, "elapsed_ms": _elapsed_ms(start)},
+                            headers=_headers(request_id))
+
+    @api.post("/v1/ask/stream")
+    async def ask_stream(body: AskRequest, request: Request):
+        request_id = _request_id(request)
+        check_query(body.query)
+        release = admission.acquire()
+        start = time.perf_counter()
+
+        async def events():
+            try:
+                async for chunk in tutor_agent.astream_answer(body.query, body.session_id,
+                                                              request_timeout(body.timeout)):
+                    yield _sse("chunk", {"text": chunk})
+                yield _sse("done", {"request_id": request_id, "elapsed_ms": _elapsed_ms(start)})
+            except Exception as e:
+                # Headers are already sent, so the failure is reported as an event
+                status_code, message = error_status(e)
+                logging.error(f"API: Stream {request_id} failed ({status_code}): {str(e)}")
+                yield _sse("error", {"request_id": request_id, "status": status_code, "error": message})
+            finally:
+                release()
+
+        # The background task also releases the slot if the client leaves before streaming starts
+        return StreamingResponse(events(), media_type="text/event-stream", background=BackgroundTask(release),
+                                 headers={**_headers(request_id), "Cache-Control": "no-cache"})
+
+    @api.post("/v1/batch")
+    async def batch(body: BatchRequest, request: Request):
+        request_id = _request_id(request)
+        if len(body.items) > max_batch_items:
+            raise APIError(413, f"At most {max_batch_items} items per batch")
+
+        items = [BatchItem(item.id if item.id is not None else str(index), item.query)
+                 for index, item in enumerate(body.items, start=1)]
+        concurrency = min(body.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+        timeout = body.timeout or API_BATCH_TIMEOUT
+        results: List[Dict[str, Any]] = []
+        timed_out = False
+
+        with admission.admit():
+            runner = BatchRunner(tutor_agent, concurrency=concurrency)
+            try:
+                report = await asyncio.wait_for(
+                    runner.process([item for item in items if item.query.strip()], results.append), timeout
+                )
+            except asyncio.TimeoutError:
+                logging.warning(f"API: Batch {request_id} timed out after {timeout}s with "
+                                f"{len(results)}/{len(items)} items done")
+                report, timed_out = {"processed": len(results)}, True
+
+        # Report results in request order; anything unanswered gets an error
+        by_id = {record["id"]: record for record in results}
+        ordered = []
+        for item in items:
+            record = by_id.get(item.item_id)
+            if record is None:
+                error = "query must not be empty" if not item.query.strip() else "timed out"
+                record = {"id": item.item_id, "query": item.query, "route": None, "response": None, "error": error}
+            ordered.append(record)
+
+        return JSONResponse({"request_id": request_id, "timed_out": timed_out, "results": ordered, "report": report},
+                            headers=_headers(request_id))
+
+    return api
+
+
+def main():
+    """Run the JSON API on its own, without the Gradio interface."""
+    configure_logging()
+
+    startup = get_startup_profile()
+    startup.mark("imports")
+    server_name = os.environ.get("SERVER_NAME", "0.0.0.0")
+    server_port = int(os.environ.get("SERVER_PORT", "7860"))
+    tutor_agent = TutorAgent()
+    startup.mark("tutor_agent")
+    if WARM_UP_ON_START:
+        tutor_agent.start_warm_up()
+    api = create_api(tutor_agent)
+    startup.mark("server_setup")
+    logging.info(f"Worker {WORKER_ID}: Serving JSON API on http://{server_name}:{server_port}")
+    uvicorn.run(api, host=server_name, port=server_port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,48 @@
-import gradio as gr
+from core.startup import get_startup_profile  # first, so the boot clock covers every import
 from agents.tutor_agent import TutorAgent
-import time
+from api import create_api
+from config import LOG_FILE, WARM_UP_ON_START, WORKER_ID
+from core.logging_setup import configure_logging
+from fastapi import FastAPI
+import uvicorn
 import logging
-import traceback
 import os
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("tutoring_bot.log"),
-        logging.StreamHandler()
-    ]
-)
-
 class TutoringBotApp:
     """Main application class for the Multi-Agent Tutoring Bot."""
 
     def __init__(self):
         self.tutor_agent = TutorAgent()
-        self.conversation_history = []
 
-    def chat_response(self, message, history):
-        """Handle chat responses with conversation history."""
+    def chat_response(self, message, history, session_id=None):
+        """Handle chat responses with conversation history.
+
+        The tutor keeps its own bounded memory per session_id, so the
+        displayed history is only used for rendering.
+        """
         if not message.strip():
             return history, ""
 
         # Process the query
         try:
-            logging.info(f"Processing query: {message}")
-            response = self.tutor_agent.process_query(message)
-            logging.info(f"Query processed successfully. Response: {response[:100]}...")
+            logging.debug(f"App: Processing query: {message}")
+            response = self.tutor_agent.process_query(message, session_id)
 
             # Ensure response is a string
             if response is None:
                 response = "I apologize, but I couldn't generate a response. Please try again."
-                logging.warning("Response was None, using default message")
+                logging.warning("App: Response was None, using default message")
 
             # Add to history using the new messages format
             new_history = list(history)  # Create a copy to avoid modifying the original
             new_history.append({"role": "user", "content": message})
             new_history.append({"role": "assistant", "content": response})
-
-            # Log the history for debugging
-            logging.info(f"Updated history length: {len(new_history)}")
-            if len(new_history) > 0:
-                logging.info(f"Last history item: {new_history[-1]}")
-
-            # Store in conversation history
-            self.conversation_history.append({
-                "user": message,
-                "bot": response,
-                "timestamp": time.time()
-            })
+            logging.debug(f"App: Answered in {len(response)} characters")
 
             return new_history, ""
 
         except Exception as e:
-            error_details = traceback.format_exc()
-            logging.error(f"Error processing query: {str(e)}")
-            logging.error(f"Traceback: {error_details}")
+            logging.exception(f"App: Error processing query: {str(e)}")
 
             error_response = f"I apologize, but I encountered an error. Please make sure Ollama is running and try again. Error: {str(e)}"
 
@@ -70,17 +52,49 @@ class TutoringBotApp:
 
             return new_history, ""
 
+    async def stream_chat_response(self, message, history, session_id=None):
+        """Stream a chat response, yielding the partial history as tokens arrive.
+
+        Runs on the event loop via TutorAgent.astream_query, so concurrent
+        students share the LLM scheduler instead of tying up worker threads.
+        """
+        if not message.strip():
+            yield history, ""
+            return
+
+        logging.debug(f"App: Streaming query: {message}")
+        new_history = list(history)  # Create a copy to avoid modifying the original
+        new_history.append({"role": "user", "content": message})
+        new_history.append({"role": "assistant", "content": ""})
+
+        response = ""
+        async for chunk in self.tutor_agent.astream_query(message, session_id):
+            response += chunk
+            new_history[-1] = {"role": "assistant", "content": response}
+            yield new_history, ""
+
+        if not response:
+            response = "I apologize, but I couldn't generate a response. Please try again."
+            logging.warning("App: Streamed response was empty, using default message")
+            new_history[-1] = {"role": "assistant", "content": response}
+            yield new_history, ""
+
+        logging.debug(f"App: Streamed {len(response)} characters")
+
     def show_capabilities(self):
         """Display bot capabilities."""
         return self.tutor_agent.get_capabilities()
 
-    def clear_conversation(self):
+    def clear_conversation(self, session_id=None):
         """Clear the conversation history."""
-        self.conversation_history = []
+        if self.tutor_agent.memory is not None and session_id is not None:
+            self.tutor_agent.memory.clear(session_id)
         return []
 
     def create_interface(self):
         """Create and configure the Gradio interface."""
+        import gradio as gr  # deferred: gradio takes seconds to import and the JSON API doesn't need it
+
         with gr.Blocks(
             title="Multi-Agent Tutoring Bot",
             theme=gr.themes.Soft(),
@@ -159,23 +173,20 @@ class TutoringBotApp:
                     capabilities_output = gr.Markdown(visible=False)
 
             # Event handlers
-            def submit_message(message, history):
-                logging.info(f"Submit message called with message: '{message}'")
-                logging.info(f"Current history length: {len(history) if history else 0}")
-
+            async def submit_message(message, history, request: gr.Request):
                 # Ensure message is not empty
                 if not message or not message.strip():
-                    logging.warning("Empty message submitted, ignoring")
-                    return history, ""
-
-                # Process the message and get updated history
-                updated_history, _ = self.chat_response(message, history)
-                logging.info(f"Updated history returned with length: {len(updated_history)}")
+                    yield history, ""
+                    return
 
-                return updated_history, ""
+                # Stream the partial history so the chatbot renders tokens as they arrive
+                # Gradio's session hash keys the tutor's memory for this browser tab
+                session_id = request.session_hash if request is not None else None
+                async for update in self.stream_chat_response(message, history or [], session_id):
+                    yield update
 
-            def clear_chat():
-                return self.clear_conversation()
+            def clear_chat(request: gr.Request):
+                return self.clear_conversation(request.session_hash if request is not None else None)
 
             def toggle_capabilities():
                 capabilities_text = self.show_capabilities()
@@ -212,37 +223,49 @@ class TutoringBotApp:
 
         return demo
 
+    def create_server(self, demo) -> FastAPI:
+        """Serve the interface alongside the JSON API and its /healthz and /readyz."""
+        import gradio as gr
+
+        return gr.mount_gradio_app(create_api(self.tutor_agent), demo, path="", show_error=True)
+
 def main():
     """Main function to run the application."""
     print("Starting Multi-Agent Tutoring Bot...")
     print("Make sure Ollama is running with qwen3:0.6b model")
 
+    configure_logging()
     logging.info("Initializing Tutoring Bot application")
+    startup = get_startup_profile()
+    startup.mark("imports")
 
     try:
         app = TutoringBotApp()
+        startup.mark("tutor_agent")
+        if WARM_UP_ON_START:
+            # Loads the model while the interface is built and the server starts
+            app.tutor_agent.start_warm_up()
         demo = app.create_interface()
+        startup.mark("interface")
 
         logging.info("Application initialized successfully")
 
         # Launch the app
-        server_name = os.environ.get("SERVER_NAME", "127.0.0.1")
+        server_name = os.environ.get("SERVER_NAME", "0.0.0.0")
         server_port = int(os.environ.get("SERVER_PORT", "7860"))
-        logging.info(f"Launching web interface on http://{server_name}:{server_port}")
-        demo.launch(
-            server_name="0.0.0.0", 
-            server_port=7860,
-            share=False,
-            show_error=True,
-            quiet=False,
-            debug=True
-        )
+        # Handlers are async and LLM concurrency is capped by the scheduler,
+        # so Gradio itself can admit many events at once
+        concurrency_limit = int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", "64"))
+        demo.queue(default_concurrency_limit=concurrency_limit)
+        logging.info(f"Worker {WORKER_ID}: Launching web interface on http://{server_name}:{server_port}")
+        server = app.create_server(demo)
+        startup.mark("server_setup")
+        uvicorn.run(server, host=server_name, port=server_port)
     except Exception as e:
-        error_details = traceback.format_exc()
-        logging.error(f"Failed to start application: {str(e)}")
-        logging.error(f"Traceback: {error_details}")
+        logging.exception(f"Failed to start application: {str(e)}")
         print(f"Error starting application: {str(e)}")
-        print("Check tutoring_bot.log for details")
+        if LOG_FILE:
+            print(f"Check {LOG_FILE} for details")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,222 @@
+"""A fake Ollama server for benchmarks, with configurable latency and token rate.
+
+It answers /api/generate (streamed or not) and /api/tags like Ollama, and
+spends time the way a CPU-bound Ollama would: a fixed delay before the
+first token, prompt evaluation at prompt_tokens_per_second, then
+generation at tokens_per_second, with at most ``parallel`` requests
+generating at once. Classification prompts get a one-word label; other
+prompts get a filler answer of ``response_tokens`` tokens, preceded by a
+<think> block of ``think_tokens`` unless the request sets "think": false.
+
+Usage:
+    python -m benchmarks.mock_ollama --port 11435 --tokens-per-second 30
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+MATH_WORDS = re.compile(r"\b(solve|equation|derivative|integral|calculate|algebra|sum|product|fraction|\d+\s*[-+*/^x×]\s*\d+)")
+PHYSICS_WORDS = re.compile(r"\b(force|energy|velocity|momentum|mass|gravity|newton|joule|watt|circuit|voltage|light|wave)")
+
+
+class MockOllamaConfig:
+    """Timing and output shape of the fake model; defaults resemble a 0.6B model on a laptop CPU."""
+
+    def __init__(self, first_token_latency: float = 0.05, prompt_tokens_per_second: float = 400.0,
+                 tokens_per_second: float = 40.0, response_tokens: int = 60, think_tokens: int = 40,
+                 parallel: int = 2, model: str = "qwen3:0.6b"):
+        self.first_token_latency = first_token_latency
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.think_tokens = think_tokens
+        self.parallel = parallel
+        self.model = model
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def _count_tokens(text: str) -> int:
+    # Roughly four characters per token, like the memory budget in core.conversation_memory
+    return max(1, len(text) // 4)
+
+
+def _classify(query: str) -> str:
+    lowered = query.lower()
+    if MATH_WORDS.search(lowered):
+        return "MATH"
+    if PHYSICS_WORDS.search(lowered):
+        return "PHYSICS"
+    return "GENERAL"
+
+
+class MockOllama:
+    """Runs the fake server on a background thread; use as a context manager or call start/stop."""
+
+    def __init__(self, config: Optional[MockOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockOllamaConfig()
+        self._slots = threading.BoundedSemaphore(self.config.parallel)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.generated_tokens = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllama":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.generated_tokens = 0
+
+    def completion_tokens(self, body: Dict[str, Any]) -> Tuple[List[str], bool]:
+        """The tokens the fake model generates for a request, think block included.
+
+        Returns (tokens, truncated), where truncated means num_predict cut them short.
+        """
+        prompt, system = body.get("prompt", ""), body.get("system") or ""
+        if "Classify" in system:
+            answer = [_classify(prompt)]
+        elif not prompt:
+            return [], False  # a load request, as sent by the warm-up
+        else:
+            answer = ["Here", " is", " a", " worked", " answer", "."] + \
+                     [f" step{i}" for i in range(max(0, self.config.response_tokens - 6))]
+        thinking = []
+        if body.get("think", True) and self.config.think_tokens:
+            thinking = ["<think>"] + [" hmm"] * max(0, self.config.think_tokens - 2) + ["</think>"]
+        tokens = thinking + answer
+
+        limit = (body.get("options") or {}).get("num_predict")
+        if limit and 0 < limit < len(tokens):
+            return tokens[:limit], True
+        return tokens, False
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, payload: Dict[str, Any]) -> None:
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") == "/api/tags":
+                    self._send_json({"models": [{"name": mock.config.model, "model": mock.config.model}]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.rstrip("/") != "/api/generate":
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+
+                config = mock.config
+                tokens, truncated = mock.completion_tokens(body)
+                prompt_tokens = _count_tokens((body.get("system") or "") + body.get("prompt", ""))
+                stream = body.get("stream", True)
+                with mock._lock:
+                    mock.requests += 1
+                    mock.generated_tokens += len(tokens)
+
+                start = time.perf_counter()
+                with mock._slots:
+                    time.sleep(config.first_token_latency + prompt_tokens / config.prompt_tokens_per_second)
+                    prompt_done = time.perf_counter()
+                    header = {"model": body.get("model", config.model), "created_at": "2024-01-01T00:00:00Z"}
+                    if stream:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Transfer-Encoding", "chunked")
+                        self.end_headers()
+                        for token in tokens:
+                            time.sleep(1.0 / config.tokens_per_second)
+                            self._write_chunk({**header, "response": token, "done": False})
+                    else:
+                        time.sleep(len(tokens) / config.tokens_per_second)
+                    end = time.perf_counter()
+
+                final = {
+                    **header,
+                    "done": True,
+                    "done_reason": "length" if truncated else "stop",
+                    "total_duration": int((end - start) * 1e9),
+                    "load_duration": 0,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int((end - prompt_done) * 1e9),
+                }
+                if stream:
+                    self._write_chunk({**final, "response": ""})
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self._send_json({**final, "response": "".join(tokens)})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-latency", type=float, default=0.05, help="Seconds before prompt evaluation")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--think-tokens", type=int, default=40)
+    parser.add_argument("--parallel", type=int, default=2, help="Requests generated at once, like OLLAMA_NUM_PARALLEL")
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(args.first_token_latency, args.prompt_tokens_per_second, args.tokens_per_second,
+                              args.response_tokens, args.think_tokens, args.parallel)
+    server = MockOllama(config, args.host, args.port).start()
+    print(f"Mock Ollama listening on {server.base_url} ({config.as_dict()})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
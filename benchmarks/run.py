@@ -0,0 +1,419 @@
+"""Benchmark the tutoring bot against a fake Ollama server.
+
+Usage:
+    python -m benchmarks.run [--scenarios components,router,single,concurrent,cache]
+                             [--output report.json] [--compare baseline.json]
+
+Scenarios:
+    components  Calculator, PhysicsConstantsLookup and the two specialists, called directly
+    router      routing accuracy and time, offline (keywords + intent model) and with the LLM fallback
+    single      one query at a time through TutorAgent.process_query, cache off
+    concurrent  TutorAgent.aanswer at increasing concurrency: throughput and latency
+    cache       a Zipf-distributed repeat workload through the response cache
+
+The mock server (benchmarks.mock_ollama) stands in for Ollama with fixed
+latency and token rate, so runs are comparable across machines and
+commits; the random workloads are seeded. The JSON report can be compared
+with an earlier one: --compare prints the change in every latency,
+throughput and accuracy figure and flags those worse than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from benchmarks.mock_ollama import MockOllama, MockOllamaConfig
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.jsonl")
+SCENARIOS = ("components", "router", "single", "concurrent", "cache")
+
+# How --compare reads a metric, by the name of the metric or of the group it is in;
+# anything else (counts, settings) is reported but not judged
+HIGHER_IS_BETTER = ("accuracy", "hit_ratio", "queries_per_minute", "calls_per_second", "offline_share")
+LOWER_IS_BETTER = ("latency_ms", "us_per_call", "llm_calls_per_query", "generated_tokens_per_query")
+NOISY_FIGURES = ("max", "p99", "count")
+MIN_LATENCY_CHANGE_MS = 1.0  # smaller latency changes are timer noise, whatever their relative size
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Tuple[str, str]]:
+    """Read (query, expected route) pairs from a JSONL file."""
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                corpus.append((record["query"], record["label"]))
+    return corpus
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(seconds: Sequence[float]) -> Dict[str, float]:
+    """Latency figures in milliseconds."""
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50": round(_percentile(ordered, 0.5) * 1000, 3),
+        "p95": round(_percentile(ordered, 0.95) * 1000, 3),
+        "p99": round(_percentile(ordered, 0.99) * 1000, 3),
+        "max": round(_percentile(ordered, 1.0) * 1000, 3),
+    }
+
+
+def time_per_call(function: Callable[[Any], Any], inputs: Sequence[Any], min_seconds: float = 0.1,
+                  repeat: int = 5) -> Dict[str, float]:
+    """Time function over every input, like timeit: the best of several runs of at least min_seconds."""
+    for value in inputs:  # warm caches, lazy indexes and compiled expressions
+        function(value)
+    best = float("inf")
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for value in inputs:
+                function(value)
+            calls += len(inputs)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        best = min(best, elapsed / calls)
+    return {"us_per_call": round(best * 1e6, 3), "calls_per_second": round(1 / best, 1)}
+
+
+def timed(function: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+class Benchmark:
+    """Runs the scenarios against one TutorAgent wired to the mock server."""
+
+    def __init__(self, mock: MockOllama, corpus: List[Tuple[str, str]], seed: int = 0):
+        from agents.tutor_agent import TutorAgent  # after the environment points config.py at the mock
+
+        self.mock = mock
+        self.corpus = corpus
+        self.seed = seed
+        self.tutor = TutorAgent()
+        self.tutor.memory = None  # every scenario is single-turn
+        self.tutor.faq_enabled = False  # the corpus includes FAQ questions; measure generation instead
+
+    def _llm_usage(self, before: Tuple[int, int], queries: int) -> Dict[str, float]:
+        requests, tokens = self.mock.requests - before[0], self.mock.generated_tokens - before[1]
+        return {
+            "llm_calls_per_query": round(requests / queries, 3),
+            "generated_tokens_per_query": round(tokens / queries, 1),
+        }
+
+    def _mock_counters(self) -> Tuple[int, int]:
+        return self.mock.requests, self.mock.generated_tokens
+
+    def components(self) -> Dict[str, Any]:
+        from tools.calculator import Calculator
+        from tools.physics_constants import PhysicsConstantsLookup
+
+        calculator = Calculator()
+        lookup = PhysicsConstantsLookup()
+        expressions = ["15 * 23", "2^10 - 24", "sqrt(256) + 3*(4-1)", "sin(pi/6) * 2", "(1+2)*(3+4)/7", "144 / 12 + 7"]
+        physics_queries = [query for query, label in self.corpus if label == "PHYSICS"]
+        results: Dict[str, Any] = {
+            "calculator.evaluate_expression": time_per_call(calculator.evaluate_expression, expressions),
+            "calculator.evaluate_over_1000": time_per_call(
+                lambda expression: calculator.evaluate_over(expression, {"x": [float(i) for i in range(1000)]}),
+                ["x^2 + 3*x - 1"]
+            ),
+            "constants.get_constant": time_per_call(
+                lookup.get_constant, ["speed of light", "planck", "G", "electron mass", "boltzmann"]
+            ),
+            "constants.find_in_text": time_per_call(lookup.find_in_text, physics_queries),
+        }
+
+        # The specialists answer some queries offline (solver, unit-aware calculator)
+        # and hand the rest to the LLM; offline_share is the fraction that never reached it
+        for name, agent, label in (("math_agent", self.tutor.math_agent, "MATH"),
+                                   ("physics_agent", self.tutor.physics_agent, "PHYSICS")):
+            queries = [query for query, expected in self.corpus if expected == label]
+            latencies, offline = [], 0
+            before = self._mock_counters()
+            for query in queries:
+                requests = self.mock.requests
+                _, seconds = timed(lambda: agent.generate_response(query))
+                latencies.append(seconds)
+                offline += self.mock.requests == requests
+            results[name] = {
+                "latency_ms": summarize(latencies),
+                "offline_share": round(offline / len(queries), 3),
+                **self._llm_usage(before, len(queries)),
+            }
+        return results
+
+    def router(self) -> Dict[str, Any]:
+        def correct(route: str, label: str) -> bool:
+            return route == label or (route == "MULTI" and label in ("MATH", "PHYSICS"))
+
+        offline_correct, resolved = 0, 0
+        for query, label in self.corpus:
+            route = self.tutor._classify_by_keywords(query) or self.tutor._classify_with_model(query)
+            if route is not None:
+                resolved += 1
+                offline_correct += correct(route, label)
+
+        latencies, full_correct = [], 0
+        before = self._mock_counters()
+        for query, label in self.corpus:
+            route, seconds = timed(lambda: self.tutor._classify_query(query))
+            latencies.append(seconds)
+            full_correct += correct(route, label)
+
+        return {
+            "offline": {
+                "offline_share": round(resolved / len(self.corpus), 3),
+                "accuracy": round(offline_correct / resolved, 3) if resolved else 0.0,
+                **time_per_call(
+                    lambda query: self.tutor._classify_by_keywords(query) or self.tutor._classify_with_model(query),
+                    [query for query, _ in self.corpus]
+                ),
+            },
+            "with_llm_fallback": {
+                "accuracy": round(full_correct / len(self.corpus), 3),
+                "latency_ms": summarize(latencies),
+                **self._llm_usage(before, len(self.corpus)),
+            },
+        }
+
+    def single(self) -> Dict[str, Any]:
+        cache, self.tutor.response_cache = self.tutor.response_cache, None
+        try:
+            latencies: Dict[str, List[float]] = {}
+            before = self._mock_counters()
+            for query, label in self.corpus:
+                _, seconds = timed(lambda: self.tutor.process_query(query))
+                latencies.setdefault(label, []).append(seconds)
+            return {
+                "latency_ms": summarize([seconds for values in latencies.values() for seconds in values]),
+                "per_route": {label: {"latency_ms": summarize(values)} for label, values in latencies.items()},
+                **self._llm_usage(before, len(self.corpus)),
+            }
+        finally:
+            self.tutor.response_cache = cache
+
+    def concurrent(self, levels: Sequence[int], rounds: int) -> Dict[str, Any]:
+        queries = [query for query, _ in self.corpus] * rounds
+        random.Random(self.seed).shuffle(queries)
+
+        async def run_level(concurrency: int) -> Dict[str, Any]:
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies: List[float] = []
+            errors = 0
+
+            async def ask(query: str) -> None:
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        await self.tutor.aanswer(query)
+                    except Exception:
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(ask(query) for query in queries))
+            elapsed = time.perf_counter() - start
+            return {
+                "queries_per_minute": round(len(queries) / elapsed * 60, 1),
+                "latency_ms": summarize(latencies),
+                "errors": errors,
+            }
+
+        async def run_all() -> Dict[str, Any]:
+            # One event loop for every level: the LLM clients and scheduler are bound to it
+            return {f"concurrency_{level}": await run_level(level) for level in levels}
+
+        cache, self.tutor.response_cache = self.tutor.response_cache, None
+        try:
+            return asyncio.run(run_all())
+        finally:
+            self.tutor.response_cache = cache
+
+    def cache(self, requests: int, skew: float) -> Dict[str, Any]:
+        from core.response_cache import create_response_cache
+
+        cache = self.tutor.response_cache = create_response_cache()
+        if cache is None:
+            return {"skipped": "RESPONSE_CACHE_BACKEND is none"}
+        cache.clear()
+        cache.hits = cache.misses = 0
+
+        # Popular questions come up far more often than the rest, as in a class
+        rng = random.Random(self.seed)
+        weights = [1.0 / (rank ** skew) for rank in range(1, len(self.corpus) + 1)]
+        workload = rng.choices([query for query, _ in self.corpus], weights=weights, k=requests)
+
+        hits, misses = [], []
+        before = self._mock_counters()
+        for query in workload:
+            hits_before = cache.hits
+            _, seconds = timed(lambda: self.tutor.process_query(query))
+            (hits if cache.hits > hits_before else misses).append(seconds)
+        return {
+            "hit_ratio": round(cache.stats()["hit_ratio"], 3),
+            "latency_ms": summarize(hits + misses),
+            "hit_latency_ms": summarize(hits),
+            "miss_latency_ms": summarize(misses),
+            **self._llm_usage(before, len(workload)),
+        }
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def _direction(path: str) -> int:
+    """+1 if the metric improves upward, -1 if downward, 0 if it isn't judged."""
+    parts = path.split(".")
+    if parts[-1] in NOISY_FIGURES:
+        return 0
+    if any(part in HIGHER_IS_BETTER for part in parts):
+        return 1
+    if any(part in LOWER_IS_BETTER or part.endswith("latency_ms") for part in parts):
+        return -1
+    return 0
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Compare the results of two reports, marking changes worse than threshold as regressions."""
+    now, before = _flatten(current["results"]), _flatten(baseline["results"])
+    rows = []
+    for path in sorted(set(now) & set(before)):
+        direction = _direction(path)
+        if direction == 0:
+            continue
+        old, new = before[path], now[path]
+        change = (new - old) / abs(old) if old else 0.0
+        regression = change * direction < -threshold
+        if "latency_ms" in path and abs(new - old) < MIN_LATENCY_CHANGE_MS:
+            regression = False
+        rows.append({
+            "metric": path, "baseline": old, "current": new, "change": round(change, 4),
+            "regression": regression,
+        })
+    return rows
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tutoring bot against a fake Ollama server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="JSONL of {query, label} records")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Relative change counted as a regression")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", default="1,8,32", help="Concurrency levels for the concurrent scenario")
+    parser.add_argument("--rounds", type=int, default=1, help="Passes over the corpus per concurrency level")
+    parser.add_argument("--cache-requests", type=int, default=300)
+    parser.add_argument("--cache-skew", type=float, default=1.1, help="Zipf exponent of the cache workload")
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--think-tokens", type=int, default=40)
+    parser.add_argument("--parallel", type=int, default=2, help="Requests the mock generates at once")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    mock_config = MockOllamaConfig(args.first_token_latency, args.prompt_tokens_per_second, args.tokens_per_second,
+                                   args.response_tokens, args.think_tokens, args.parallel)
+    with MockOllama(mock_config) as mock:
+        # config.py reads the environment on import, so this must come before any project import
+        os.environ.update({
+            "OLLAMA_BASE_URL": mock.base_url,
+            "OLLAMA_BASE_URLS": mock.base_url,
+            "MEMORY_BACKEND": "none",
+            "RESPONSE_CACHE_BACKEND": os.environ.get("RESPONSE_CACHE_BACKEND", "memory"),
+            "TRACE_LOG_SAMPLE_RATE": "0",
+            "TRACE_SLOW_THRESHOLD": "1e9",
+        })
+        benchmark = Benchmark(mock, load_corpus(args.corpus), seed=args.seed)
+
+        results: Dict[str, Any] = {}
+        for name in scenarios:
+            print(f"Running {name}...", file=sys.stderr)
+            start = time.perf_counter()
+            if name == "concurrent":
+                levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+                results[name] = benchmark.concurrent(levels, args.rounds)
+            elif name == "cache":
+                results[name] = benchmark.cache(args.cache_requests, args.cache_skew)
+            else:
+                results[name] = getattr(benchmark, name)()
+            print(f"  {name} took {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "corpus": {"path": os.path.relpath(args.corpus), "queries": len(benchmark.corpus)},
+            "mock_ollama": mock_config.as_dict(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:<70} {row['baseline']:>12g} -> {row['current']:>12g} "
+                  f"({row['change']:+.1%}) {flag}", file=sys.stderr)
+        regressions = [row for row in rows if row["regression"]]
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} "
+              f"against {baseline['meta'].get('commit')}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
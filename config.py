@@ -1,18 +1,216 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 # Ollama configuration
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+# Comma-separated list of Ollama hosts to spread requests across; defaults to OLLAMA_BASE_URL
+OLLAMA_BASE_URLS = [
+    url.strip() for url in os.environ.get("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",") if url.strip()
+]
+LLM_BALANCING = os.environ.get("LLM_BALANCING", "round_robin")  # round_robin or least_loaded
 MODEL_NAME = os.environ.get("MODEL_NAME", "qwen3:0.6b")  # Using qwen3:0.6b as default
+# Keep the model (and its cached prompt prefixes) loaded between requests. A
+# duration like "30m", or seconds; -1 keeps it loaded indefinitely.
+_keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_KEEP_ALIVE = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+# Fixed context size for every call; a different num_ctx makes Ollama reload the model
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "4096"))
 
-# Physics constants for the physics agent tool
+# Model tiers chosen per call by core.generation: specialist questions that need a
+# long explanation go to the large tier, everything else to the small one. Both
+# default to MODEL_NAME, so one model serves everything unless configured.
+MODEL_TIER_SMALL = os.environ.get("MODEL_TIER_SMALL", MODEL_NAME)
+MODEL_TIER_LARGE = os.environ.get("MODEL_TIER_LARGE", MODEL_NAME)
+LARGE_TIER_AGENTS = ("math", "physics")
+# Ollama's "think" setting. Every agent strips Qwen3's <think> output before the
+# student sees it, so by default it isn't generated ("true", or "default" for the
+# model's own behaviour, to bring it back).
+LLM_REASONING = {"true": True, "false": False}.get(os.environ.get("LLM_REASONING", "false").lower())
+# Maximum tokens generated per call (num_predict), by agent and by how long an
+# answer the query needs. Not applied while thinking is on, since thinking
+# tokens count against it. GENERATION_BUDGET_SCALE scales them all.
+GENERATION_BUDGETS: Dict[str, Dict[str, int]] = {
+    "classification": {"brief": 8, "standard": 8, "extended": 8},
+    "general": {"brief": 128, "standard": 256, "extended": 384},
+    "math": {"brief": 256, "standard": 512, "extended": 1024},
+    "physics": {"brief": 256, "standard": 512, "extended": 1024},
+}
+GENERATION_BUDGET_SCALE = float(os.environ.get("GENERATION_BUDGET_SCALE", "1.0"))
+# Stop sequences per agent: a small model that runs past its answer starts writing
+# the next "Student:"/"Question:" turn of its prompt
+GENERATION_STOP: Dict[str, List[str]] = {
+    "general": ["\nStudent:"],
+    "math": ["\nQuestion:"],
+    "physics": ["\nQuestion:"],
+}
+
+# Bump when prompts change so cached responses from older prompts are not served
+PROMPT_VERSION = os.environ.get("PROMPT_VERSION", "6")
+
+# Response cache configuration
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")  # memory, sqlite or none
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "86400"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+# Identical questions (without conversation history) arriving while one is being
+# answered wait for that answer instead of starting another generation
+COALESCE_REQUESTS = os.environ.get("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+
+# Per-session conversation memory passed to the agents as context
+# "memory" is private to one worker process; run several workers with "sqlite"
+# (one host) or "kv" (a shared scripts.run_kv_server) so any worker can serve a session
+MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "memory")  # memory, sqlite, kv or none
+MEMORY_PATH = os.environ.get("MEMORY_PATH", "conversation_memory.sqlite3")
+MEMORY_KV_ADDRESS = os.environ.get("MEMORY_KV_ADDRESS", "127.0.0.1:6390")  # host:port of the KV server
+MEMORY_KV_TIMEOUT = float(os.environ.get("MEMORY_KV_TIMEOUT", "1.0"))  # seconds per KV request
+MEMORY_MAX_TURNS = int(os.environ.get("MEMORY_MAX_TURNS", "8"))  # recent turns kept verbatim per session
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", "600"))  # context tokens before older turns are summarized
+MEMORY_SUMMARY_MAX_CHARS = int(os.environ.get("MEMORY_SUMMARY_MAX_CHARS", "600"))
+MEMORY_TURN_MAX_CHARS = int(os.environ.get("MEMORY_TURN_MAX_CHARS", "800"))  # per message, in memory and in context
+MEMORY_MAX_SESSIONS = int(os.environ.get("MEMORY_MAX_SESSIONS", "1000"))  # sessions held by any backend
+MEMORY_IDLE_TTL = float(os.environ.get("MEMORY_IDLE_TTL", "3600"))  # seconds before an idle session expires
+MEMORY_PURGE_INTERVAL = float(os.environ.get("MEMORY_PURGE_INTERVAL", "300"))  # seconds between sweeps of expired sessions
+
+# Concurrency limits for LLM calls (per Ollama backend)
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "2"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "64"))  # waiting requests before new ones are rejected
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "30"))  # seconds a request may wait for a slot
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "120"))  # total seconds per request
+
+# Per LLM call: HTTP timeouts, a total deadline covering retries, and how often to retry
+# connection errors, stalls and 5xx responses (with jittered exponential backoff)
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "3"))  # seconds to connect to Ollama
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))  # seconds without a byte, incl. prompt evaluation
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT", "90"))  # total seconds per call, retries included
+LLM_RETRIES = int(os.environ.get("LLM_RETRIES", "2"))  # extra attempts; streams only before their first chunk
+LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", "0.25"))  # seconds, doubled per attempt
+LLM_RETRY_BACKOFF_MAX = float(os.environ.get("LLM_RETRY_BACKOFF_MAX", "2"))
+# Per-backend circuit breaker: after this many consecutive failures a backend gets no
+# calls for LLM_BREAKER_RESET seconds, then one probe call decides whether it is back
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.environ.get("LLM_BREAKER_RESET", "30"))
+
+# Local intent classifier used for routing before falling back to the LLM
+INTENT_MODEL_PATH = os.environ.get(
+    "INTENT_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "intent_classifier.json")
+)
+INTENT_CONFIDENCE_THRESHOLD = float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Curated FAQ answers served without an LLM call (build with scripts.build_faq_index)
+FAQ_QUESTIONS_PATH = os.environ.get(
+    "FAQ_QUESTIONS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "faq_questions.jsonl")
+)
+FAQ_INDEX_PATH = os.environ.get(
+    "FAQ_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "faq_index.bin")
+)
+FAQ_MATCH_THRESHOLD = float(os.environ.get("FAQ_MATCH_THRESHOLD", "0.6"))  # n-gram cosine similarity, 0 to 1
+
+# How to answer queries that match both math and physics keywords:
+# "off" routes to the higher-scoring specialist, "first" runs both at once and
+# returns the first good answer, "merge" runs both at once and combines them.
+# "first" saves LLM work only on the async path, where the losing call is
+# cancelled; on the sync path it only saves time, and the losing call keeps its
+# worker thread until it finishes (at most LLM_CALL_TIMEOUT)
+MULTI_DOMAIN_POLICY = os.environ.get("MULTI_DOMAIN_POLICY", "off")
+# Worker threads for sync fan-outs: two per concurrent fan-out, plus one for
+# each abandoned call still running under "first"
+MULTI_DOMAIN_MAX_WORKERS = int(os.environ.get("MULTI_DOMAIN_MAX_WORKERS", "16"))
+
+# Headless JSON API (api.py); requests beyond the limit get 429 instead of queueing
+API_MAX_CONCURRENT_REQUESTS = int(os.environ.get("API_MAX_CONCURRENT_REQUESTS", "64"))  # per worker
+API_MAX_BATCH_ITEMS = int(os.environ.get("API_MAX_BATCH_ITEMS", "100"))
+API_RETRY_AFTER = int(os.environ.get("API_RETRY_AFTER", "2"))  # seconds suggested to rejected clients
+API_BATCH_TIMEOUT = float(os.environ.get("API_BATCH_TIMEOUT", "600"))  # seconds per /v1/batch request
+
+# Load the model into Ollama and build the agents in the background at boot,
+# so the first student doesn't pay for it; /readyz fails until this is done
+WARM_UP_ON_START = os.environ.get("WARM_UP_ON_START", "true").lower() in ("1", "true", "yes")
+WARM_UP_TIMEOUT = float(os.environ.get("WARM_UP_TIMEOUT", "300"))  # seconds to wait for the model to load
+
+# Tracing: every request's stage timings feed the /metrics histograms; the
+# per-request breakdown is logged for this fraction of requests, plus every
+# failed request and any slower than TRACE_SLOW_THRESHOLD seconds
+TRACE_LOG_SAMPLE_RATE = float(os.environ.get("TRACE_LOG_SAMPLE_RATE", "0.05"))
+TRACE_SLOW_THRESHOLD = float(os.environ.get("TRACE_SLOW_THRESHOLD", "20"))
+
+# Logging: records are queued on the calling thread and written by a background
+# listener, so requests never wait on disk. The file is JSON lines ("text" for the
+# console format) and rotates at LOG_MAX_BYTES, or every LOG_ROTATE_WHEN interval
+# ("midnight", "h", ...) if set, keeping LOG_BACKUP_COUNT old files; an empty
+# LOG_FILE disables it. Below WARNING, each category (logger name, or a message's
+# "TutorAgent:"-style prefix) is sampled at LOG_SAMPLE_RATES ("API=0.1,LLMPool=0.5")
+# and limited to LOG_RATE_LIMIT records per second; warnings and errors are always kept.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.environ.get("LOG_FILE", "tutoring_bot.log")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.environ.get("LOG_ROTATE_WHEN", "")
+LOG_SAMPLE_RATES = {
+    category.strip(): float(rate)
+    for category, _, rate in (item.partition("=") for item in os.environ.get("LOG_SAMPLE_RATES", "").split(","))
+    if category.strip()
+}
+LOG_RATE_LIMIT = float(os.environ.get("LOG_RATE_LIMIT", "50"))  # per category; 0 disables
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped
+
+# Worker processes (see scripts.run_workers). Each worker reports its id in
+# /healthz; /readyz fails until the session store and an Ollama host answer.
+WORKER_ID = os.environ.get("WORKER_ID", str(os.getpid()))
+WORKER_COUNT = int(os.environ.get("WORKER_COUNT", str(os.cpu_count() or 1)))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", "2"))  # seconds per dependency check
+
+# Default number of queries processed at once by the batch runner
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+
+# Limits for the calculator's expression engine
+CALCULATOR_MAX_LENGTH = int(os.environ.get("CALCULATOR_MAX_LENGTH", "500"))  # characters
+CALCULATOR_MAX_NODES = int(os.environ.get("CALCULATOR_MAX_NODES", "500"))  # parsed operations and operands
+# Largest exact integer result; Python won't print ints over 4300 digits (about 14,000 bits)
+CALCULATOR_MAX_INT_BITS = int(os.environ.get("CALCULATOR_MAX_INT_BITS", "12000"))
+CALCULATOR_TIMEOUT = float(os.environ.get("CALCULATOR_TIMEOUT", "0.1"))  # seconds per evaluation
+
+# Bundled CODATA table loaded (lazily) by the physics constants tool
+PHYSICS_CONSTANTS_PATH = os.environ.get(
+    "PHYSICS_CONSTANTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "codata_2022.txt")
+)
+
+# Short names, symbols and everyday aliases for common constants, keyed by
+# the short name and pointing at the CODATA quantity they stand for
 PHYSICS_CONSTANTS: Dict[str, Dict[str, Any]] = {
-    "speed_of_light": {"value": 299792458, "unit": "m/s", "symbol": "c"},
-    "gravitational_constant": {"value": 6.67430e-11, "unit": "m³/kg⋅s²", "symbol": "G"},
-    "planck_constant": {"value": 6.62607015e-34, "unit": "J⋅s", "symbol": "h"},
-    "avogadro_number": {"value": 6.02214076e23, "unit": "mol⁻¹", "symbol": "Nₐ"},
-    "boltzmann_constant": {"value": 1.380649e-23, "unit": "J/K", "symbol": "k"},
-    "elementary_charge": {"value": 1.602176634e-19, "unit": "C", "symbol": "e"},
-    "electron_mass": {"value": 9.1093837015e-31, "unit": "kg", "symbol": "mₑ"},
-    "proton_mass": {"value": 1.67262192369e-27, "unit": "kg", "symbol": "mₚ"},
+    "speed_of_light": {"codata": "speed of light in vacuum", "symbol": "c",
+                       "aliases": ["speed of light", "light speed"]},
+    "gravitational_constant": {"codata": "Newtonian constant of gravitation", "symbol": "G",
+                               "aliases": ["gravitational constant", "gravity constant", "big g"]},
+    "planck_constant": {"codata": "Planck constant", "symbol": "h", "aliases": ["planck"]},
+    "reduced_planck_constant": {"codata": "reduced Planck constant", "symbol": "ħ",
+                                "aliases": ["h-bar", "h bar", "hbar"]},
+    "avogadro_number": {"codata": "Avogadro constant", "symbol": "Nₐ",
+                        "aliases": ["avogadro", "avogadro's number"]},
+    "boltzmann_constant": {"codata": "Boltzmann constant", "symbol": "k", "aliases": ["boltzmann"]},
+    "elementary_charge": {"codata": "elementary charge", "symbol": "e",
+                          "aliases": ["charge of an electron", "electron charge"]},
+    "electron_mass": {"codata": "electron mass", "symbol": "mₑ", "aliases": ["mass of an electron"]},
+    "proton_mass": {"codata": "proton mass", "symbol": "mₚ", "aliases": ["mass of a proton"]},
+    "neutron_mass": {"codata": "neutron mass", "symbol": "mₙ", "aliases": ["mass of a neutron"]},
+    "atomic_mass_unit": {"codata": "atomic mass constant", "symbol": "u",
+                         "aliases": ["atomic mass unit", "dalton"]},
+    "vacuum_permittivity": {"codata": "vacuum electric permittivity", "symbol": "ε₀",
+                            "aliases": ["permittivity of free space", "electric constant"]},
+    "vacuum_permeability": {"codata": "vacuum mag. permeability", "symbol": "μ₀",
+                            "aliases": ["permeability of free space", "magnetic constant"]},
+    "gas_constant": {"codata": "molar gas constant", "symbol": "R",
+                     "aliases": ["gas constant", "ideal gas constant"]},
+    "faraday_constant": {"codata": "Faraday constant", "symbol": "F", "aliases": ["faraday"]},
+    "stefan_boltzmann_constant": {"codata": "Stefan-Boltzmann constant", "symbol": "σ",
+                                  "aliases": ["stefan boltzmann constant"]},
+    "fine_structure_constant": {"codata": "fine-structure constant", "symbol": "α",
+                                "aliases": ["fine structure constant"]},
+    "rydberg_constant": {"codata": "Rydberg constant", "symbol": "R∞", "aliases": ["rydberg"]},
+    "bohr_radius": {"codata": "Bohr radius", "symbol": "a₀", "aliases": []},
+    "standard_gravity": {"codata": "standard acceleration of gravity", "symbol": "g",
+                         "aliases": ["acceleration due to gravity", "gravitational acceleration"]},
+    "standard_atmosphere": {"codata": "standard atmosphere", "symbol": "atm",
+                            "aliases": ["atmospheric pressure"]},
 }
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Set, Tuple
+from config import BATCH_CONCURRENCY
+from core.prompts import get_prompt_metrics
+
+# Groups run in this order so consecutive calls share a specialist prompt
+ROUTE_ORDER = ["MATH", "PHYSICS", "MULTI", "GENERAL"]
+
+
+class BatchItem(NamedTuple):
+    item_id: str
+    query: str
+
+
+def read_batch_items(path: str) -> List[BatchItem]:
+    """Read queries from a JSONL file of {"id": ..., "query": ...} records.
+
+    Records without an id are numbered by line; malformed lines are skipped.
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                query = record["query"]
+            except (ValueError, KeyError, TypeError):
+                logging.warning(f"Batch: Skipping malformed line {line_number} in {path}")
+                continue
+            items.append(BatchItem(str(record.get("id", line_number)), query))
+    return items
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """Return the ids already answered in an output file.
+
+    The file is compacted to one successful record per id first: failed
+    records (they are about to be redone), repeats and a torn last line
+    from a crash mid-write are dropped, so each id ends up in the output
+    once, with its final outcome.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, "rb") as f:
+        data = f.read()
+
+    completed = set()
+    kept = []
+    for line in data.splitlines(keepends=True):
+        try:
+            record = json.loads(line)
+            item_id = str(record["id"])
+        except (ValueError, KeyError, TypeError):
+            continue
+        if record.get("error") is None and item_id not in completed and line.endswith(b"\n"):
+            completed.add(item_id)
+            kept.append(line)
+
+    compacted = b"".join(kept)
+    if compacted != data:
+        # Written aside and renamed over, so a crash here leaves the old file intact
+        temporary_path = output_path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(compacted)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, output_path)
+        logging.info(f"Batch: Compacted {output_path} to {len(kept)} answered items")
+    return completed
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class BatchRunner:
+    """Runs many queries through a TutorAgent with bounded concurrency.
+
+    Queries are classified up front, grouped by specialist, and answered by
+    a fixed pool of workers. Each result is appended to the output JSONL as
+    soon as it finishes, which doubles as the checkpoint: rerunning with the
+    same output file skips every id that already succeeded and replaces the
+    records of those that failed.
+    """
+
+    def __init__(self, tutor_agent, concurrency: int = BATCH_CONCURRENCY):
+        self.tutor_agent = tutor_agent
+        self.concurrency = concurrency
+
+    async def _route(self, items: List[BatchItem]) -> Tuple[Dict[str, List[BatchItem]], Dict[str, str]]:
+        """Group items by route, returning the groups and the error of each item that couldn't be classified."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def classify(item: BatchItem) -> str:
+            async with semaphore:
+                return await self.tutor_agent.aclassify_query(item.query)
+
+        # One saturated or timed-out classification fails only its own item
+        routes = await asyncio.gather(*(classify(item) for item in items), return_exceptions=True)
+        groups: Dict[str, List[BatchItem]] = {}
+        failures: Dict[str, str] = {}
+        for item, route in zip(items, routes):
+            if isinstance(route, BaseException):
+                logging.warning(f"Batch: Item {item.item_id} could not be classified: {str(route)}")
+                failures[item.item_id] = str(route) or type(route).__name__
+            else:
+                groups.setdefault(route, []).append(item)
+        return groups, failures
+
+    async def process(self, items: List[BatchItem], emit: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Answer items, passing each result record to emit as soon as it finishes.
+
+        Returns throughput and latency figures for the run.
+        """
+        start = time.perf_counter()
+        groups, failures = await self._route(items)
+        routing_seconds = time.perf_counter() - start
+        # Recorded as failed, so a rerun retries them
+        for item in items:
+            if item.item_id in failures:
+                emit({"id": item.item_id, "query": item.query, "route": None,
+                      "response": None, "error": failures[item.item_id], "latency_ms": 0.0})
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for route in ROUTE_ORDER + sorted(set(groups) - set(ROUTE_ORDER)):
+            for item in groups.get(route, []):
+                queue.put_nowait((route, item))
+
+        latencies: Dict[str, List[float]] = {}
+        errors = len(failures)
+
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    route, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                item_start = time.perf_counter()
+                record = {"id": item.item_id, "query": item.query, "route": route,
+                          "response": None, "error": None}
+                try:
+                    record["response"] = await self.tutor_agent.agenerate_routed_response(item.query, route)
+                except Exception as e:
+                    errors += 1
+                    record["error"] = str(e)
+                    logging.warning(f"Batch: Item {item.item_id} failed: {str(e)}")
+                latency = time.perf_counter() - item_start
+                record["latency_ms"] = round(latency * 1000, 1)
+                latencies.setdefault(route, []).append(latency)
+                emit(record)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        elapsed = time.perf_counter() - start
+        all_latencies = sorted(latency for values in latencies.values() for latency in values)
+        processed = len(all_latencies)
+        return {
+            "processed": processed,
+            "errors": errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "routing_seconds": round(routing_seconds, 3),
+            "queries_per_minute": round(processed / elapsed * 60, 1) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(all_latencies, 0.5) * 1000, 1),
+                "p95": round(_percentile(all_latencies, 0.95) * 1000, 1),
+                "max": round(_percentile(all_latencies, 1.0) * 1000, 1),
+            },
+            "per_route": {
+                route: {
+                    "count": len(values),
+                    "mean_latency_ms": round(sum(values) / len(values) * 1000, 1),
+                }
+                for route, values in latencies.items()
+            },
+            # Prompt-eval vs generation time per prompt, as reported by Ollama
+            "prompt_timing": get_prompt_metrics().stats(),
+        }
+
+    async def run(self, items: Iterable[BatchItem], output_path: str) -> Dict[str, Any]:
+        """Answer every item not already in output_path and return a run report."""
+        items = list(items)
+        completed = load_checkpoint(output_path)
+        pending = [item for item in items if item.item_id not in completed and item.query.strip()]
+        logging.info(f"Batch: {len(items)} items, {len(items) - len(pending)} already done or empty")
+
+        with open(output_path, "a", encoding="utf-8") as output:
+            def write(record: Dict[str, Any]) -> None:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+            report = await self.process(pending, write)
+
+        return {"total_items": len(items), "skipped": len(items) - len(pending), **report}
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+from core.response_cache import normalize_query
+from core.tracing import annotate, get_metrics
+
+T = TypeVar("T")
+
+
+def coalescing_key(route: str, query: str) -> str:
+    """Requests with the same route and normalized query text share a generation."""
+    return f"{route}:{normalize_query(query)}"
+
+
+class _Flight:
+    """One in-flight generation and the number of requests waiting on it."""
+
+    def __init__(self):
+        self.waiters = 0
+        self.task: Optional[asyncio.Future] = None
+        # Streams only: chunks so far, replayed to every waiter, and a wake-up for new ones
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.updated = asyncio.Event()
+
+    def publish(self) -> None:
+        """Wake every waiter; each waits on the event that was current when it checked."""
+        event, self.updated = self.updated, asyncio.Event()
+        event.set()
+
+
+class _SyncFlight:
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Lets concurrent identical requests share one in-flight generation.
+
+    When a question is posted on the board, dozens of students send the
+    same text within seconds. The first request starts the generation;
+    later ones with the same key attach to it and get the same result,
+    the same exception, or (for streams) every chunk from the beginning.
+    A generation is cancelled once every request waiting on it has left,
+    e.g. timed out or disconnected. Async flights belong to the event loop
+    they started on; ``call`` is the thread-based equivalent.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Flight] = {}
+        self._sync_flights: Dict[str, _SyncFlight] = {}
+        self._sync_lock = threading.Lock()
+        self.coalesced = 0
+
+    def _joined(self, kind: str) -> None:
+        self.coalesced += 1
+        annotate(coalesced=True)
+        get_metrics().increment("tutor_coalesced_requests_total", kind=kind)
+
+    @staticmethod
+    def _forget(flights: Dict[str, Any], key: str, flight: Any) -> None:
+        if flights.get(key) is flight:
+            del flights[key]
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await factory() once for all concurrent callers with this key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(factory())
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+        else:
+            self._joined("answer")
+
+        flight.waiters += 1
+        try:
+            # shield: one caller being cancelled must not cancel the others' generation
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(self._flights, key, flight)
+                flight.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Iterate factory() once for all concurrent callers with this key, replaying it to each."""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = self._streams[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._produce(key, flight, factory))
+        else:
+            self._joined("stream")
+
+        flight.waiters += 1
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.updated.wait()
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.done:
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+
+    async def _produce(self, key: str, flight: _Flight, factory: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.publish()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(self._streams, key, flight)
+            flight.publish()
+
+    def call(self, key: str, function: Callable[[], T]) -> T:
+        """Run function() once for all threads calling with this key at the same time."""
+        with self._sync_lock:
+            flight = self._sync_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._sync_flights[key] = _SyncFlight()
+        if not leader:
+            self._joined("answer")
+            flight.finished.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._sync_lock:
+                self._forget(self._sync_flights, key, flight)
+            flight.finished.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights) + len(self._streams) + len(self._sync_flights),
+            "coalesced": self.coalesced,
+        }
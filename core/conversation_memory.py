@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from core.session_store import SessionState, create_session_store
+from config import (
+    MEMORY_BACKEND,
+    MEMORY_MAX_TURNS,
+    MEMORY_PURGE_INTERVAL,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_SUMMARY_MAX_CHARS,
+    MEMORY_TURN_MAX_CHARS,
+)
+
+
+class Turn(NamedTuple):
+    user: str
+    bot: str
+    timestamp: float
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def extractive_summary(summary: str, turns: List[Turn], max_chars: int) -> str:
+    """Fold turns into a running summary without an LLM call.
+
+    Keeps each question and the opening of its answer, and drops the oldest
+    text once the summary exceeds max_chars.
+    """
+    parts = [summary] if summary else []
+    for turn in turns:
+        answer = turn.bot.strip().split("\n", 1)[0]
+        parts.append(f"Student asked: {_clip(turn.user, 150)} Tutor answered: {_clip(answer, 100)}")
+    text = " ".join(parts)
+    if len(text) > max_chars:
+        text = "…" + text[-(max_chars - 1):]
+    return text
+
+
+class SessionMemory:
+    """Recent turns of one conversation plus a summary of everything older."""
+
+    __slots__ = ("turns", "summary", "summarized_turns")
+
+    def __init__(self, max_turns: int, summary: str = "", summarized_turns: int = 0):
+        self.turns: "deque[Turn]" = deque(maxlen=max_turns)
+        self.summary = summary
+        self.summarized_turns = summarized_turns
+
+    @classmethod
+    def from_state(cls, state: Optional[SessionState], max_turns: int) -> "SessionMemory":
+        if state is None:
+            return cls(max_turns)
+        session = cls(max_turns, state.get("summary", ""), state.get("summarized_turns", 0))
+        session.turns.extend(Turn(*turn) for turn in state.get("turns", []))
+        return session
+
+    def to_state(self) -> SessionState:
+        return {
+            "summary": self.summary,
+            "summarized_turns": self.summarized_turns,
+            "turns": [list(turn) for turn in self.turns],
+        }
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(t.user) + estimate_tokens(t.bot) for t in self.turns)
+
+
+class ConversationMemory:
+    """Bounded per-session conversation memory.
+
+    Each session keeps at most max_turns recent turns, with every message
+    clipped to turn_max_chars. Once the turns exceed the token budget, the
+    oldest are folded into a rolling summary of bounded length, so a
+    session's state and prompt context stay small however long it runs.
+
+    Session state lives in the session store, never in this object, so
+    with a shared store (sqlite or kv) any worker can serve any turn. The
+    store also bounds how many sessions are kept and for how long, and
+    updates each session atomically, so workers appending to the same
+    session at once don't lose each other's turns.
+    """
+
+    def __init__(self, store, max_turns: int = MEMORY_MAX_TURNS,
+                 token_budget: int = MEMORY_TOKEN_BUDGET, summary_max_chars: int = MEMORY_SUMMARY_MAX_CHARS,
+                 turn_max_chars: int = MEMORY_TURN_MAX_CHARS,
+                 summarizer: Callable[[str, List[Turn], int], str] = extractive_summary):
+        self.store = store
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.turn_max_chars = turn_max_chars
+        self.summarizer = summarizer
+        self._purger: Optional[threading.Thread] = None
+
+    def _fold_oldest(self, session: SessionMemory) -> None:
+        session.summary = self.summarizer(session.summary, [session.turns.popleft()], self.summary_max_chars)
+        session.summarized_turns += 1
+
+    def add_turn(self, session_id: str, user: str, bot: str) -> None:
+        """Record a completed exchange, summarizing older turns to stay within budget."""
+        turn = Turn(_clip(user, self.turn_max_chars), _clip(bot, self.turn_max_chars), time.time())
+
+        def append(state: Optional[SessionState]) -> SessionState:
+            session = SessionMemory.from_state(state, self.max_turns)
+            if len(session.turns) == self.max_turns:
+                self._fold_oldest(session)
+            session.turns.append(turn)
+            while session.tokens() > self.token_budget and len(session.turns) > 1:
+                self._fold_oldest(session)
+            return session.to_state()
+
+        self.store.update(session_id, append)
+
+    def context(self, session_id: str) -> str:
+        """Format the session's summary and recent turns as prompt context ("" if there are none)."""
+        session = SessionMemory.from_state(self.store.get(session_id), self.max_turns)
+        if not session.turns and not session.summary:
+            return ""
+        lines = ["Conversation so far (for context; answer the new question):"]
+        if session.summary:
+            lines.append(f"Summary of earlier turns: {session.summary}")
+        for turn in session.turns:
+            lines.append(f"Student: {turn.user}")
+            lines.append(f"Tutor: {turn.bot}")
+        return "\n".join(lines) + "\n\n"
+
+    def clear(self, session_id: str) -> None:
+        """Forget a session."""
+        self.store.delete(session_id)
+
+    def evict_idle(self) -> None:
+        """Drop sessions idle for longer than the store's TTL."""
+        self.store.purge_expired()
+
+    def start_purging(self, interval: float = MEMORY_PURGE_INTERVAL) -> threading.Thread:
+        """Call evict_idle every interval seconds in a daemon thread, so expired sessions don't pile up."""
+        def purge_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    logging.warning(f"ConversationMemory: Purging expired sessions failed: {e}")
+
+        if self._purger is None:
+            self._purger = threading.Thread(target=purge_forever, name="memory-purge", daemon=True)
+            self._purger.start()
+        return self._purger
+
+    def ping(self) -> bool:
+        """Return True if the session store is reachable."""
+        return self.store.ping()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"backend": self.store.name, "sessions": len(self.store)}
+        if hasattr(self.store, "evictions"):
+            stats["evictions"] = self.store.evictions
+        return stats
+
+
+def create_conversation_memory() -> Optional[ConversationMemory]:
+    """Build the conversation memory configured in config.py, or None if it is disabled."""
+    store = create_session_store()
+    if store is None:
+        return None
+    logging.info(f"ConversationMemory: Using {MEMORY_BACKEND.lower()} session store")
+    memory = ConversationMemory(store)
+    if MEMORY_PURGE_INTERVAL > 0:
+        memory.start_purging()
+    return memory
@@ -0,0 +1,114 @@
+import json
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from core.llm_pool import PooledLLM, get_llm_pool
+from core.tracing import current_trace
+from config import (
+    GENERATION_BUDGET_SCALE,
+    GENERATION_BUDGETS,
+    GENERATION_STOP,
+    LARGE_TIER_AGENTS,
+    LLM_REASONING,
+    MODEL_TIER_LARGE,
+    MODEL_TIER_SMALL,
+)
+
+# Queries asking for an explanation or derivation need room for a longer answer
+EXTENDED_MARKERS = re.compile(
+    r"\b(explain|derive|derivation|prove|proof|step[- ]by[- ]step|why|compare|difference between|"
+    r"in detail|how does|how do)\b",
+    re.IGNORECASE,
+)
+BRIEF_MAX_WORDS = 8
+EXTENDED_MIN_WORDS = 40
+
+
+def estimate_complexity(query: str) -> str:
+    """Rate how long an answer the query needs: "brief", "standard" or "extended"."""
+    words = len(query.split())
+    if EXTENDED_MARKERS.search(query) or words >= EXTENDED_MIN_WORDS or query.count("?") > 1:
+        return "extended"
+    if words <= BRIEF_MAX_WORDS:
+        return "brief"
+    return "standard"
+
+
+class GenerationProfile(NamedTuple):
+    """The model and limits one LLM call runs with."""
+    agent: str
+    complexity: str
+    tier: str
+    model: str
+    num_predict: Optional[int]
+    stop: Sequence[str]
+
+    def llm_params(self) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"model": self.model, "reasoning": LLM_REASONING}
+        if self.num_predict:
+            params["num_predict"] = self.num_predict
+        if self.stop:
+            params["stop"] = list(self.stop)
+        return params
+
+
+class GenerationPolicy:
+    """Chooses the model tier and generation budget for each LLM call.
+
+    On a CPU-only Ollama generated tokens are the dominant cost, so each
+    agent gets a num_predict budget sized to the query: a greeting gets a
+    short one, a request for a derivation a long one, and only the latter
+    go to the large tier (for the specialists). Thinking is switched off
+    by default because the agents strip it anyway; with thinking on, the
+    budgets are not applied, as thinking tokens would use them up.
+    """
+
+    def __init__(self, budgets: Dict[str, Dict[str, int]] = GENERATION_BUDGETS,
+                 stop: Dict[str, List[str]] = GENERATION_STOP, scale: float = GENERATION_BUDGET_SCALE,
+                 small_model: str = MODEL_TIER_SMALL, large_model: str = MODEL_TIER_LARGE,
+                 large_tier_agents: Sequence[str] = LARGE_TIER_AGENTS, reasoning: Optional[bool] = LLM_REASONING):
+        self.budgets = budgets
+        self.stop = stop
+        self.scale = scale
+        self.models = {"small": small_model, "large": large_model}
+        self.large_tier_agents = set(large_tier_agents)
+        self.reasoning = reasoning
+
+    def choose(self, agent: str, query: str) -> GenerationProfile:
+        complexity = estimate_complexity(query)
+        tier = "large" if complexity == "extended" and agent in self.large_tier_agents else "small"
+
+        num_predict = None
+        budget = self.budgets.get(agent, {}).get(complexity)
+        if budget and self.reasoning is False:
+            num_predict = max(1, int(budget * self.scale))
+        return GenerationProfile(agent, complexity, tier, self.models[tier], num_predict,
+                                 tuple(self.stop.get(agent, ())))
+
+    def llm(self, agent: str, query: str, temperature: float) -> PooledLLM:
+        """Return an LLM handle for this agent and query, noting the choice in the current trace."""
+        profile = self.choose(agent, query)
+        trace = current_trace()
+        if trace is not None:
+            trace.attributes.setdefault("generation", {})[agent] = \
+                f"{profile.complexity}/{profile.tier}/{profile.num_predict or 'unlimited'}"
+        return get_llm_pool().handle(temperature=temperature, **profile.llm_params())
+
+    def fingerprint(self) -> str:
+        """Everything that decides which model and budget answer a query, e.g. to key cached answers on."""
+        return json.dumps([self.models, sorted(self.large_tier_agents), self.budgets, self.scale,
+                           self.stop, self.reasoning], sort_keys=True)
+
+    def tier_models(self) -> List[str]:
+        """The distinct models in use, e.g. to load them all at startup."""
+        return sorted(set(self.models.values()))
+
+
+_policy: Optional[GenerationPolicy] = None
+
+
+def get_generation_policy() -> GenerationPolicy:
+    """Return the process-wide generation policy configured in config.py."""
+    global _policy
+    if _policy is None:
+        _policy = GenerationPolicy()
+    return _policy
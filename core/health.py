@@ -0,0 +1,51 @@
+import logging
+import os
+import time
+import urllib.request
+from typing import Any, Dict, Tuple
+from core.startup import get_startup_profile
+from config import HEALTH_CHECK_TIMEOUT, OLLAMA_BASE_URLS, WORKER_ID
+
+_started_at = time.time()
+
+
+def liveness() -> Dict[str, Any]:
+    """Report that this worker process is up; cheap enough to probe often."""
+    return {
+        "status": "ok",
+        "worker": WORKER_ID,
+        "pid": os.getpid(),
+        "uptime_s": round(time.time() - _started_at, 1),
+    }
+
+
+def _check_ollama(base_url: str, timeout: float) -> bool:
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/api/tags", timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def readiness(tutor_agent, timeout: float = HEALTH_CHECK_TIMEOUT) -> Tuple[bool, Dict[str, Any]]:
+    """Check the dependencies a worker needs to serve traffic.
+
+    Ready means the boot-time warm-up (if any) has finished, the session
+    store answers (when memory is enabled) and at least one Ollama host is
+    reachable. Returns (ready, report).
+    """
+    checks: Dict[str, Any] = {"warm_up": tutor_agent.warm_up_state}
+
+    memory = tutor_agent.memory
+    if memory is not None:
+        try:
+            checks["session_store"] = memory.ping()
+        except Exception as e:
+            logging.warning(f"Health: Session store check failed: {str(e)}")
+            checks["session_store"] = False
+
+    checks["ollama"] = {url: _check_ollama(url, timeout) for url in OLLAMA_BASE_URLS}
+
+    ready = checks["warm_up"] != "running" and checks.get("session_store", True) and any(checks["ollama"].values())
+    return ready, {**liveness(), "status": "ready" if ready else "unavailable", "checks": checks,
+                   "startup": get_startup_profile().report()}
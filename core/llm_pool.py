@@ -0,0 +1,304 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.request
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from langchain_core.runnables import Runnable, RunnableConfig
+from core.resilience import BackendUnavailableError, CircuitBreaker, LLMDeadlineError, RetryPolicy, is_backend_failure
+from core.scheduler import get_scheduler, iterate_with_deadline
+from core.tracing import get_metrics
+from config import (
+    OLLAMA_BASE_URLS,
+    MODEL_NAME,
+    LLM_BALANCING,
+    LLM_CALL_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_NUM_CTX,
+)
+
+if TYPE_CHECKING:
+    from langchain_ollama import OllamaLLM
+
+
+class LLMPool:
+    """Shared registry of Ollama clients spread across one or more backends.
+
+    One OllamaLLM (and so one pair of keep-alive HTTP clients) is built per
+    base URL. Per-call parameters such as temperature are applied to cheap
+    copies that share those clients, so agents never open their own
+    connections. Each backend has a circuit breaker; backends whose
+    circuit is open are skipped, and when all are, calls fail fast with
+    BackendUnavailableError instead of waiting on a dead host.
+    """
+
+    def __init__(self, base_urls: List[str] = OLLAMA_BASE_URLS, model: str = MODEL_NAME,
+                 balancing: str = LLM_BALANCING, call_timeout: float = LLM_CALL_TIMEOUT,
+                 retry: Optional[RetryPolicy] = None):
+        if not base_urls:
+            raise ValueError("At least one Ollama base URL is required")
+        if balancing not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown balancing strategy: {balancing}")
+        self.base_urls = list(base_urls)
+        self.model = model
+        self.balancing = balancing
+        self._clients: Dict[str, "OllamaLLM"] = {}
+        self._variants: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], "OllamaLLM"] = {}
+        self._in_flight = {url: 0 for url in self.base_urls}
+        self._round_robin = itertools.cycle(self.base_urls)
+        self._lock = threading.Lock()
+        self.call_timeout = call_timeout
+        self.retry = retry or RetryPolicy()
+        self.breakers = {url: CircuitBreaker() for url in self.base_urls}
+
+    def select_backend(self) -> str:
+        """Pick the backend for the next call, skipping those whose circuit is open."""
+        with self._lock:
+            if self.balancing == "least_loaded":
+                candidates = sorted(self.base_urls, key=lambda url: self._in_flight[url])
+            else:
+                candidates = [next(self._round_robin) for _ in self.base_urls]
+        for url in candidates:
+            if self.breakers[url].allow():
+                return url
+        retry_after = min(breaker.retry_after() for breaker in self.breakers.values())
+        raise BackendUnavailableError(f"No LLM backend is responding; trying again in {retry_after:.0f}s")
+
+    def _record_outcome(self, base_url: str, error: Optional[BaseException]) -> None:
+        breaker = self.breakers[base_url]
+        if error is None:
+            breaker.record_success()
+        elif is_backend_failure(error):
+            breaker.record_failure()
+            get_metrics().increment("tutor_llm_failures_total", backend=base_url)
+            logging.warning(f"LLMPool: Call to {base_url} failed ({type(error).__name__}: {str(error)}), "
+                            f"circuit {breaker.state}")
+        else:
+            breaker.record_neutral()
+
+    def get_llm(self, base_url: str, **params: Any) -> "OllamaLLM":
+        """Return an LLM for a backend with the given parameters, reusing its HTTP clients."""
+        # Lists (stop sequences) are made hashable for the key; the LLM still gets the list
+        key = (base_url, tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                                      for name, value in params.items())))
+        with self._lock:
+            llm = self._variants.get(key)
+            if llm is None:
+                client = self._clients.get(base_url)
+                if client is None:
+                    # deferred: langchain_ollama (and the ollama client) take ~0.5s to import
+                    import httpx
+                    from langchain_ollama import OllamaLLM
+                    client = self._clients[base_url] = OllamaLLM(
+                        base_url=base_url, model=self.model, keep_alive=OLLAMA_KEEP_ALIVE, num_ctx=OLLAMA_NUM_CTX,
+                        # The read timeout bounds a stall anywhere in a call, including prompt evaluation
+                        client_kwargs={"timeout": httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)},
+                    )
+                # model_copy skips validation, so the copy keeps the shared clients
+                llm = self._variants[key] = client.model_copy(update=params)
+            return llm
+
+    @contextmanager
+    def lease(self, **params: Any) -> Iterator["OllamaLLM"]:
+        """Select a backend, count the call against it and report its outcome to the breaker."""
+        base_url = self.select_backend()
+        with self._lock:
+            self._in_flight[base_url] += 1
+        try:
+            yield self.get_llm(base_url, **params)
+        except BaseException as e:
+            self._record_outcome(base_url, e)
+            raise
+        else:
+            self._record_outcome(base_url, None)
+        finally:
+            with self._lock:
+                self._in_flight[base_url] -= 1
+
+    @asynccontextmanager
+    async def alease(self, **params: Any) -> AsyncIterator["OllamaLLM"]:
+        """Async lease that also holds a scheduler slot on the selected backend."""
+        base_url = self.select_backend()
+        with self._lock:
+            self._in_flight[base_url] += 1
+        try:
+            async with get_scheduler().slot(base_url):
+                yield self.get_llm(base_url, **params)
+        except BaseException as e:
+            self._record_outcome(base_url, e)
+            raise
+        else:
+            self._record_outcome(base_url, None)
+        finally:
+            with self._lock:
+                self._in_flight[base_url] -= 1
+
+    def retry_delay(self, error: BaseException, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to back off before retrying a failed call, or None to give up (see RetryPolicy)."""
+        delay = self.retry.delay(error, attempt, deadline)
+        if delay is not None:
+            get_metrics().increment("tutor_llm_retries_total")
+            logging.info(f"LLMPool: Retrying after {type(error).__name__} in {delay:.2f}s")
+        return delay
+
+    def warm_up(self, timeout: float, models: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+        """Build each backend's client and have Ollama load the models into memory.
+
+        A generate request without a prompt only loads a model, with the
+        same keep_alive and num_ctx as real calls so it isn't reloaded for
+        the first student. Returns the seconds each backend and model took
+        (keyed "base_url model"), or None if it failed.
+        """
+        timings: Dict[str, Optional[float]] = {}
+        for base_url in self.base_urls:
+            self.get_llm(base_url)
+            for model in models or [self.model]:
+                key = f"{base_url} {model}"
+                payload = json.dumps({
+                    "model": model, "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE, "options": {"num_ctx": OLLAMA_NUM_CTX},
+                }).encode("utf-8")
+                request = urllib.request.Request(f"{base_url.rstrip('/')}/api/generate", data=payload,
+                                                 headers={"Content-Type": "application/json"})
+                start = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=timeout) as response:
+                        response.read()
+                    timings[key] = time.perf_counter() - start
+                    logging.info(f"LLMPool: Loaded {model} on {base_url} in {timings[key]:.2f}s")
+                except OSError as e:
+                    timings[key] = None
+                    logging.warning(f"LLMPool: Could not load {model} on {base_url}: {str(e)}")
+        return timings
+
+    def handle(self, **params: Any) -> "PooledLLM":
+        """Return a Runnable that leases an LLM from this pool on every call."""
+        return PooledLLM(self, params)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of in-flight calls per backend."""
+        with self._lock:
+            return dict(self._in_flight)
+
+    def circuit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return each backend's circuit breaker state."""
+        return {url: breaker.stats() for url, breaker in self.breakers.items()}
+
+
+def _until(deadline: float, chunks: Iterator[str]) -> Iterator[str]:
+    """Re-yield chunks, failing once the time.monotonic() deadline has passed.
+
+    Checked as chunks arrive; a backend that stops sending is cut off by
+    the HTTP read timeout instead.
+    """
+    try:
+        for chunk in chunks:
+            if time.monotonic() > deadline:
+                raise LLMDeadlineError("LLM call deadline exceeded")
+            yield chunk
+    finally:
+        chunks.close()
+
+
+class PooledLLM(Runnable):
+    """Runnable LLM handle that draws a backend from an LLMPool per call.
+
+    Drop-in replacement for an OllamaLLM in ``prompt | llm`` chains. Each
+    call has a total deadline of the pool's call_timeout, retries included.
+    Generation has no side effects, so failed calls are retried (on the
+    next backend, if there are several); a stream only until its first chunk.
+    """
+
+    def __init__(self, pool: LLMPool, params: Dict[str, Any]):
+        self.pool = pool
+        self.params = params
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        deadline = time.monotonic() + self.pool.call_timeout
+        attempt = 0
+        while True:
+            try:
+                with self.pool.lease(**self.params) as llm:
+                    # Streamed and joined so the deadline can be checked while tokens arrive
+                    return "".join(_until(deadline, llm.stream(input, config, **kwargs)))
+            except Exception as e:
+                delay = self.pool.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> str:
+        deadline = time.monotonic() + self.pool.call_timeout
+        attempt = 0
+        while True:
+            try:
+                async with self.pool.alease(**self.params) as llm:
+                    try:
+                        return await asyncio.wait_for(llm.ainvoke(input, config, **kwargs),
+                                                      deadline - time.monotonic())
+                    except asyncio.TimeoutError:
+                        raise LLMDeadlineError("LLM call deadline exceeded") from None
+            except Exception as e:
+                delay = self.pool.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[str]:
+        deadline = time.monotonic() + self.pool.call_timeout
+        attempt, started = 0, False
+        while True:
+            try:
+                with self.pool.lease(**self.params) as llm:
+                    for chunk in _until(deadline, llm.stream(input, config, **kwargs)):
+                        started = True
+                        yield chunk
+                    return
+            except Exception as e:
+                delay = None if started else self.pool.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs: Any) -> AsyncIterator[str]:
+        # The event loop's clock is time.monotonic(), so one deadline serves both
+        deadline = time.monotonic() + self.pool.call_timeout
+        attempt, started = 0, False
+        while True:
+            try:
+                async with self.pool.alease(**self.params) as llm:
+                    try:
+                        async for chunk in iterate_with_deadline(llm.astream(input, config, **kwargs), deadline):
+                            started = True
+                            yield chunk
+                    except asyncio.TimeoutError:
+                        raise LLMDeadlineError("LLM call deadline exceeded") from None
+                    return
+            except Exception as e:
+                delay = None if started else self.pool.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+_pool: Optional[LLMPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMPool:
+    """Return the process-wide LLM pool configured in config.py."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMPool()
+        return _pool
@@ -0,0 +1,177 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from typing import Dict, Optional
+from core.tracing import current_request_id, get_metrics
+from config import (
+    LOG_BACKUP_COUNT,
+    LOG_FILE,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_QUEUE_SIZE,
+    LOG_RATE_LIMIT,
+    LOG_ROTATE_WHEN,
+    LOG_SAMPLE_RATES,
+    WORKER_ID,
+)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Messages on the root logger name their component: "TutorAgent: Loaded ..."
+CATEGORY_PREFIX = re.compile(r"([A-Za-z]\w{0,39}):")
+
+
+def log_category(record: logging.LogRecord) -> str:
+    """The category a record is sampled and rate limited by: its logger, or its message prefix."""
+    if record.name != "root":
+        return record.name
+    match = CATEGORY_PREFIX.match(str(record.msg))
+    return match.group(1) if match else "root"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the request id and worker of each record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "category": getattr(record, "category", record.name),
+            "worker": WORKER_ID,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogSampler(logging.Filter):
+    """Samples and rate limits records below WARNING, per category.
+
+    Each category keeps ``sample_rates.get(category, 1)`` of its records,
+    then at most ``rate_limit`` per second (a token bucket as deep as one
+    second's worth). The next record let through after a drop says how
+    many were dropped. Also stamps records with their category and, unless
+    the caller passed one, the current request id, which only the
+    request's own context can see.
+    """
+
+    def __init__(self, sample_rates: Dict[str, float], rate_limit: float):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limit = rate_limit
+        self._buckets: Dict[str, list] = {}  # category -> [tokens, last refill, dropped]
+        self._lock = threading.Lock()
+
+    def _dropped(self, category: str, reason: str) -> bool:
+        get_metrics().increment("tutor_log_records_dropped_total", category=category, reason=reason)
+        return False
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = log_category(record)
+        record.category = category
+        if getattr(record, "request_id", None) is None:
+            record.request_id = current_request_id()
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self.sample_rates.get(category, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return self._dropped(category, "sampled")
+        if self.rate_limit <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(category, [self.rate_limit, now, 0])
+            bucket[0] = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return self._dropped(category, "rate_limited")
+            bucket[0] -= 1
+            dropped, bucket[2] = bucket[2], 0
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} earlier {category} records dropped by the rate limit)"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread, dropping them if its queue is full rather than blocking."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, leave the traceback out of the message
+        # so the file formatter can put it in its own field
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            get_metrics().increment("tutor_log_records_dropped_total",
+                                    category=getattr(record, "category", record.name), reason="queue_full")
+
+
+def _file_handler(path: str) -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN,
+                                                         backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    return logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES,
+                                                backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(log_file: Optional[str] = LOG_FILE, level: str = LOG_LEVEL) -> None:
+    """Send the root logger's records through a queue to the console and a rotating log file.
+
+    Callers only filter the record and put it on the queue; a listener
+    thread formats and writes it. Safe to call more than once: later
+    calls do nothing. The queue is flushed when the process exits.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers = [console]
+        if log_file:
+            file_handler = _file_handler(log_file)
+            file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+            handlers.append(file_handler)
+
+        records: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(records)
+        queue_handler.addFilter(LogSampler(LOG_SAMPLE_RATES, LOG_RATE_LIMIT))
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
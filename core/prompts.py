@@ -0,0 +1,124 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from langchain_core.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import Runnable
+from core.tracing import get_metrics
+from config import MODEL_NAME
+
+PROMPT_TAG_PREFIX = "prompt:"
+
+
+class PromptMetrics:
+    """Per-prompt totals of Ollama's prompt-evaluation and generation timings.
+
+    Ollama reports how many prompt tokens it had to evaluate on each call;
+    tokens served from a cached prefix are not counted, so a falling
+    prompt_eval_count for a prompt shows its prefix is being reused. Each
+    call is also recorded in the token histograms of core.tracing, labelled
+    by agent (the prompt name) and model.
+    """
+
+    FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration",
+              "load_duration", "total_duration")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, name: str, info: Dict[str, Any]) -> None:
+        """Add one call's generation_info (durations in nanoseconds) to a prompt's totals."""
+        with self._lock:
+            totals = self._totals.setdefault(name, {"calls": 0, **{field: 0 for field in self.FIELDS}})
+            totals["calls"] += 1
+            for field in self.FIELDS:
+                totals[field] += info.get(field) or 0
+
+        labels = {"agent": name, "model": str(info.get("model") or MODEL_NAME)}
+        metrics = get_metrics()
+        eval_count = info.get("eval_count") or 0
+        eval_duration = info.get("eval_duration") or 0
+        metrics.observe("tutor_llm_prompt_tokens", info.get("prompt_eval_count") or 0, **labels)
+        metrics.observe("tutor_llm_generated_tokens", eval_count, **labels)
+        if eval_count and eval_duration:
+            metrics.observe("tutor_llm_tokens_per_second", eval_count / (eval_duration / 1e9), **labels)
+        logging.debug(
+            f"PromptMetrics: {name} prompt_eval={info.get('prompt_eval_count') or 0} tokens/"
+            f"{(info.get('prompt_eval_duration') or 0) / 1e6:.1f}ms "
+            f"eval={info.get('eval_count') or 0} tokens/{(info.get('eval_duration') or 0) / 1e6:.1f}ms"
+        )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return mean prompt-eval and generation figures per prompt."""
+        with self._lock:
+            stats = {}
+            for name, totals in self._totals.items():
+                calls = totals["calls"]
+                prompt_ms = totals["prompt_eval_duration"] / 1e6
+                eval_ms = totals["eval_duration"] / 1e6
+                stats[name] = {
+                    "calls": calls,
+                    "mean_prompt_eval_tokens": round(totals["prompt_eval_count"] / calls, 1),
+                    "mean_prompt_eval_ms": round(prompt_ms / calls, 1),
+                    "mean_eval_tokens": round(totals["eval_count"] / calls, 1),
+                    "mean_eval_ms": round(eval_ms / calls, 1),
+                    "mean_load_ms": round(totals["load_duration"] / 1e6 / calls, 1),
+                    "prompt_eval_share": round(prompt_ms / (prompt_ms + eval_ms), 3) if prompt_ms + eval_ms else 0.0,
+                }
+            return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+class PromptTimingHandler(BaseCallbackHandler):
+    """Feeds the timings Ollama returns with each completion into PromptMetrics."""
+
+    def __init__(self, metrics: PromptMetrics):
+        self.metrics = metrics
+
+    def on_llm_end(self, response: LLMResult, *, tags: Optional[List[str]] = None, **kwargs: Any) -> None:
+        name = next((tag[len(PROMPT_TAG_PREFIX):] for tag in tags or [] if tag.startswith(PROMPT_TAG_PREFIX)), None)
+        if name is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                if generation.generation_info:
+                    self.metrics.record(name, generation.generation_info)
+
+
+_metrics = PromptMetrics()
+_timing_handler = PromptTimingHandler(_metrics)
+
+
+def get_prompt_metrics() -> PromptMetrics:
+    """Return the process-wide prompt timing metrics."""
+    return _metrics
+
+
+class PromptSpec:
+    """A prompt split into static instructions and a per-request template.
+
+    The instructions are sent as Ollama's system message, which the model's
+    chat template places first, so every request for this prompt starts
+    with the same tokens and Ollama can reuse the evaluated prefix. Only
+    the short per-request part after it has to be evaluated again.
+    """
+
+    def __init__(self, name: str, system: str, template: str):
+        self.name = name
+        self.system = system
+        self.template = PromptTemplate.from_template(template)
+
+    def format(self, **kwargs: Any) -> str:
+        """Return the per-request part of the prompt (without the system text)."""
+        return self.template.format(**kwargs)
+
+    def chain(self, llm: Runnable) -> Runnable:
+        """Return ``template | llm`` with the system prefix bound and timings recorded."""
+        return self.template | llm.bind(system=self.system).with_config(
+            tags=[f"{PROMPT_TAG_PREFIX}{self.name}"], callbacks=[_timing_handler]
+        )
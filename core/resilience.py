@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from core.scheduler import QueueTimeoutError, SchedulerSaturatedError
+from config import (
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET,
+    LLM_RETRIES,
+    LLM_RETRY_BACKOFF,
+    LLM_RETRY_BACKOFF_MAX,
+)
+
+
+class BackendUnavailableError(RuntimeError):
+    """Raised without calling Ollama when every backend's circuit breaker is open."""
+
+
+class LLMDeadlineError(TimeoutError):
+    """Raised when an LLM call (retries included) runs past its total deadline."""
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Whether an error means the backend is unhealthy, as opposed to a bad request or our own limits.
+
+    Connection errors, timeouts and 5xx responses count; the scheduler's
+    queueing errors, cancellations and 4xx responses do not.
+    """
+    if isinstance(error, (SchedulerSaturatedError, QueueTimeoutError, BackendUnavailableError)):
+        return False
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # deferred: only needed once something has gone wrong
+    import httpx
+    from ollama import ResponseError
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, ResponseError) and error.status_code >= 500
+
+
+def is_llm_unavailable(error: BaseException) -> bool:
+    """Whether a call failed because no backend could answer it, so a fallback answer should be tried."""
+    return isinstance(error, BackendUnavailableError) or is_backend_failure(error)
+
+
+class CircuitBreaker:
+    """Stops sending calls to a backend after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds; then one probe call is
+    let through (half-open), which closes the circuit on success or opens
+    it for another period on failure.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"  # closed, open or half_open
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the backend now; a half-open probe must be followed by a record_ call."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state, self.failures, self._probing = "closed", 0, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opened += 1
+                self.state, self._opened_at = "open", time.monotonic()
+
+    def record_neutral(self) -> None:
+        """The call ended without telling us anything about the backend (e.g. it was cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.opened}
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff, within a call's deadline."""
+
+    def __init__(self, retries: int = LLM_RETRIES, backoff: float = LLM_RETRY_BACKOFF,
+                 max_backoff: float = LLM_RETRY_BACKOFF_MAX):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, error: BaseException, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying after the given attempt (0-based) failed, or None to give up.
+
+        Only backend failures are retried, and not once the deadline (a
+        time.monotonic() value) would pass before the retry starts.
+        """
+        if attempt >= self.retries or isinstance(error, LLMDeadlineError) or not is_backend_failure(error):
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
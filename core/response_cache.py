@@ -0,0 +1,202 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from config import (
+    MODEL_NAME,
+    PROMPT_VERSION,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_ENTRIES,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different phrasings share a cache entry."""
+    return " ".join(query.casefold().split()).rstrip("?!. ")
+
+
+class MemoryCacheBackend:
+    """In-process LRU store of cached responses."""
+
+    blocking = False  # no I/O, so async callers needn't move calls off the event loop
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, expires_at) for a key and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk LRU store of cached responses that survives restarts."""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, expires_at) for a key and mark it as recently used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE response_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+            return row
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """TTL response cache keyed on normalized query, model name and prompt version.
+
+    ``generator`` identifies anything else that changes answers, such as
+    the model tiers and token budgets (see GenerationPolicy.fingerprint),
+    so changing them stops old answers being served.
+    """
+
+    def __init__(self, backend, ttl: float, model_name: str = MODEL_NAME,
+                 prompt_version: str = PROMPT_VERSION, generator: str = ""):
+        self.backend = backend
+        self.ttl = ttl
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.generator = generator
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def make_key(self, query: str, namespace: str = "") -> str:
+        """Build the cache key for a query."""
+        payload = json.dumps(
+            [namespace, self.model_name, self.prompt_version, self.generator, normalize_query(query)],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, namespace: str = "") -> Optional[str]:
+        """Return the cached response for a query, or None on a miss."""
+        key = self.make_key(query, namespace)
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                with self._counter_lock:
+                    self.hits += 1
+                return value
+            self.backend.delete(key)
+        with self._counter_lock:
+            self.misses += 1
+        return None
+
+    def set(self, query: str, response: str, namespace: str = "") -> None:
+        """Cache a response for a query."""
+        self.backend.set(self.make_key(query, namespace), response, time.time() + self.ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current number of entries."""
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the response cache configured in config.py, or None if caching is disabled."""
+    backend_name = RESPONSE_CACHE_BACKEND.lower()
+    if backend_name == "memory":
+        backend = MemoryCacheBackend(RESPONSE_CACHE_MAX_ENTRIES)
+    elif backend_name == "sqlite":
+        backend = SQLiteCacheBackend(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_ENTRIES)
+    elif backend_name == "none":
+        return None
+    else:
+        raise ValueError(f"Unknown response cache backend: {RESPONSE_CACHE_BACKEND}")
+    from core.generation import get_generation_policy  # deferred: pulls in the LLM pool
+    return ResponseCache(backend, RESPONSE_CACHE_TTL, generator=get_generation_policy().fingerprint())
@@ -0,0 +1,125 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, TypeVar
+from config import LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT
+
+T = TypeVar("T")
+
+
+class SchedulerSaturatedError(RuntimeError):
+    """Raised when a backend's queue is full and the request is rejected up front."""
+
+
+class QueueTimeoutError(TimeoutError):
+    """Raised when a request waits longer than its deadline for an LLM slot."""
+
+
+class _BackendState:
+    def __init__(self):
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+
+class LLMScheduler:
+    """Caps in-flight LLM calls per backend and queues the rest in FIFO order.
+
+    Requests beyond ``max_in_flight`` wait in a per-backend queue; once
+    ``max_queue`` requests are waiting, new ones are rejected immediately
+    with SchedulerSaturatedError rather than piling up behind a slow backend.
+    """
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._backends: Dict[str, _BackendState] = {}
+
+    def _state(self, backend: str) -> _BackendState:
+        state = self._backends.get(backend)
+        if state is None:
+            state = self._backends[backend] = _BackendState()
+        return state
+
+    async def _acquire(self, backend: str, timeout: Optional[float]) -> None:
+        state = self._state(backend)
+        if state.in_flight < self.max_in_flight and not state.waiters:
+            state.in_flight += 1
+            return
+
+        if len(state.waiters) >= self.max_queue:
+            raise SchedulerSaturatedError(
+                f"Too many requests queued for {backend}; please try again shortly"
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release(backend)
+            else:
+                waiter.cancel()
+                try:
+                    state.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise QueueTimeoutError(
+                    f"Timed out after {timeout}s waiting for an LLM slot on {backend}"
+                ) from None
+            raise
+
+    def _release(self, backend: str) -> None:
+        state = self._state(backend)
+        while state.waiters:
+            waiter = state.waiters.popleft()
+            if not waiter.done():
+                # Transfer the slot directly to the oldest waiter
+                waiter.set_result(None)
+                return
+        state.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, backend: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one in-flight slot on a backend for the duration of the block."""
+        await self._acquire(backend, self.queue_timeout if timeout is None else timeout)
+        try:
+            yield
+        finally:
+            self._release(backend)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return in-flight and queued request counts per backend."""
+        return {
+            backend: {"in_flight": state.in_flight, "queued": len(state.waiters)}
+            for backend, state in self._backends.items()
+        }
+
+
+async def iterate_with_deadline(iterator: AsyncIterator[T], deadline: float) -> AsyncIterator[T]:
+    """Re-yield items from an async iterator, failing once the loop-time deadline passes."""
+    loop = asyncio.get_running_loop()
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Request deadline exceeded")
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), remaining)
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import random
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import (
+    MEMORY_BACKEND,
+    MEMORY_PATH,
+    MEMORY_KV_ADDRESS,
+    MEMORY_KV_TIMEOUT,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_IDLE_TTL,
+)
+
+SessionState = Dict[str, Any]
+# Turns a session's current state (None if it has none) into its new state
+SessionUpdate = Callable[[Optional[SessionState]], SessionState]
+
+
+class MemorySessionStore:
+    """In-process LRU store of session state.
+
+    Only correct with a single worker: other processes can't see it.
+    """
+
+    name = "memory"
+    blocking = False  # no I/O, so async callers needn't move calls off the event loop
+
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Tuple[SessionState, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            session_id, (_, expires_at) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and expires_at > now:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """Return a session's state, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return entry[0]
+
+    def set(self, session_id: str, state: SessionState) -> None:
+        """Store a session's state, evicting expired and least recently used sessions."""
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (state, now + self.ttl)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def update(self, session_id: str, function: SessionUpdate) -> None:
+        """Replace a session's state with function(state) atomically."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            now = time.time()
+            state = entry[0] if entry is not None and entry[1] > now else None
+            self._sessions[session_id] = (function(state), now + self.ttl)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge_expired(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+
+    def ping(self) -> bool:
+        return True
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Session state in a SQLite file, shared by all worker processes on one host.
+
+    Holds at most max_sessions; writes beyond that drop the sessions
+    written least recently.
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, max_sessions: int, ttl: float):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Other workers may hold the write lock briefly; wait rather than fail
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at)")
+        self._conn.commit()
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _write(self, session_id: str, state: SessionState) -> None:
+        # Expiry is last write + ttl, so the earliest to expire were written least recently
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, state, expires_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(state, ensure_ascii=False), time.time() + self.ttl),
+        )
+        evicted = self._conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        ).rowcount
+        self.evictions += max(evicted, 0)
+
+    def set(self, session_id: str, state: SessionState) -> None:
+        with self._lock:
+            self._write(session_id, state)
+            self._conn.commit()
+
+    def update(self, session_id: str, function: SessionUpdate) -> None:
+        """Replace a session's state with function(state) in one transaction.
+
+        BEGIN IMMEDIATE takes the write lock before reading, so workers
+        appending to the same session at once queue up instead of
+        overwriting each other's turns.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT state FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+                ).fetchone()
+                self._write(session_id, function(json.loads(row[0]) if row is not None else None))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def purge_expired(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def ping(self) -> bool:
+        with self._lock:
+            self._conn.execute("SELECT 1").fetchone()
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+
+class KVServer:
+    """Minimal networked key-value store with per-key TTLs.
+
+    A local stand-in for a shared store such as Redis, so workers on
+    several hosts can share sessions. The protocol is one JSON object per
+    line in each direction: {"op": "get"|"set"|"cas"|"delete"|"ping"|"size",
+    "key": ..., "value": ..., "expected": ..., "ttl": ...}. "cas" sets the
+    value only if the current one (None if missing) equals "expected".
+    Holds at most max_keys, dropping the least recently written first.
+    """
+
+    def __init__(self, max_keys: int = MEMORY_MAX_SESSIONS, sweep_interval: float = 60.0):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.evictions = 0
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._data[key]
+            entry = None
+        return entry[0] if entry is not None else None
+
+    def _set(self, key: str, value: str, expires_at: float) -> None:
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op, key, now = request.get("op"), request.get("key"), time.time()
+        if op == "get":
+            return {"ok": True, "value": self._get(key, now)}
+        if op == "set":
+            self._set(key, request["value"], now + float(request.get("ttl", 3600)))
+            return {"ok": True}
+        if op == "cas":
+            if self._get(key, now) != request.get("expected"):
+                return {"ok": True, "value": False}
+            self._set(key, request["value"], now + float(request.get("ttl", 3600)))
+            return {"ok": True, "value": True}
+        if op == "delete":
+            self._data.pop(key, None)
+            return {"ok": True}
+        if op == "ping":
+            return {"ok": True}
+        if op == "size":
+            return {"ok": True, "value": len(self._data)}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    def sweep(self) -> None:
+        now = time.time()
+        for key in [key for key, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self._serve_client, host, port)
+        logging.info(f"KVServer: Listening on {host}:{port}")
+        async with server:
+            while True:
+                await asyncio.sleep(self.sweep_interval)
+                self.sweep()
+
+
+class KVSessionStore:
+    """Session state in a KVServer, shared by workers on any host that can reach it.
+
+    Each thread keeps its own connection and reconnects once if it drops.
+    """
+
+    name = "kv"
+    blocking = True
+    update_attempts = 10
+
+    def __init__(self, address: str, ttl: float, timeout: float = 1.0, key_prefix: str = "session:"):
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.ttl = ttl
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            conn = self._local.conn = (sock, sock.makefile("rwb"))
+        return conn
+
+    def _close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def _call(self, request: Dict[str, Any]) -> Any:
+        payload = json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n"
+        for attempt in range(2):
+            try:
+                _, stream = self._connection()
+                stream.write(payload)
+                stream.flush()
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("KV server closed the connection")
+                break
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(f"KV server error: {response.get('error')}")
+        return response.get("value")
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        value = self._call({"op": "get", "key": self.key_prefix + session_id})
+        return json.loads(value) if value is not None else None
+
+    def set(self, session_id: str, state: SessionState) -> None:
+        self._call({"op": "set", "key": self.key_prefix + session_id,
+                    "value": json.dumps(state, ensure_ascii=False), "ttl": self.ttl})
+
+    def update(self, session_id: str, function: SessionUpdate) -> None:
+        """Replace a session's state with function(state), retrying if another worker wrote it meanwhile."""
+        key = self.key_prefix + session_id
+        for attempt in range(self.update_attempts):
+            current = self._call({"op": "get", "key": key})
+            state = function(json.loads(current) if current is not None else None)
+            if self._call({"op": "cas", "key": key, "expected": current,
+                           "value": json.dumps(state, ensure_ascii=False), "ttl": self.ttl}):
+                return
+            # Jittered, so competing writers stop colliding
+            time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+        raise RuntimeError(f"KV session {session_id!r} kept changing; gave up after {self.update_attempts} attempts")
+
+    def delete(self, session_id: str) -> None:
+        self._call({"op": "delete", "key": self.key_prefix + session_id})
+
+    def purge_expired(self) -> None:
+        # The server expires keys itself and caps how many it holds
+        pass
+
+    def ping(self) -> bool:
+        self._call({"op": "ping"})
+        return True
+
+    def __len__(self) -> int:
+        return self._call({"op": "size"})
+
+
+def create_session_store():
+    """Build the session store configured in config.py, or None if memory is disabled."""
+    backend_name = MEMORY_BACKEND.lower()
+    if backend_name == "memory":
+        return MemorySessionStore(MEMORY_MAX_SESSIONS, MEMORY_IDLE_TTL)
+    if backend_name == "sqlite":
+        return SQLiteSessionStore(MEMORY_PATH, MEMORY_MAX_SESSIONS, MEMORY_IDLE_TTL)
+    if backend_name == "kv":
+        return KVSessionStore(MEMORY_KV_ADDRESS, MEMORY_IDLE_TTL, timeout=MEMORY_KV_TIMEOUT)
+    if backend_name == "none":
+        return None
+    raise ValueError(f"Unknown conversation memory backend: {MEMORY_BACKEND}")
@@ -0,0 +1,65 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class StartupProfile:
+    """Where boot time goes, phase by phase.
+
+    The clock starts when this module is first imported, so entry points
+    import it before anything heavy. ``mark`` closes a sequential phase
+    (time since the previous mark); ``phase`` times a block that may run
+    alongside the others, such as the background warm-up.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+        self.background: Dict[str, float] = {}
+        self._background_ends: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        """Record the time since the previous mark as this phase."""
+        with self._lock:
+            now = time.perf_counter()
+            self.phases[phase] = now - self._last
+            self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block without affecting the sequential phases."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                end = time.perf_counter()
+                self.background[name] = end - start
+                self._background_ends[name] = end
+
+    def report(self) -> Dict[str, Any]:
+        """Phase durations, plus when the process was done with all of them."""
+        with self._lock:
+            done = max([self._last, *self._background_ends.values()])
+            return {
+                "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+                "background_ms": {name: round(seconds * 1000, 1) for name, seconds in self.background.items()},
+                "total_ms": round((done - self.started) * 1000, 1),
+            }
+
+    def log(self) -> None:
+        report = self.report()
+        phases = ", ".join(f"{name} {ms:.0f}ms" for name, ms in {**report["phases_ms"], **report["background_ms"]}.items())
+        logging.info(f"Startup: {phases}; {report['total_ms']:.0f}ms in total")
+
+
+_profile = StartupProfile()
+
+
+def get_startup_profile() -> StartupProfile:
+    """Return the process-wide startup profile."""
+    return _profile
@@ -0,0 +1,103 @@
+import time
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+from core.tracing import record_stage
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ThinkFilter:
+    """Incrementally removes <think>...</think> blocks from streamed model output.
+
+    Chunks are fed as they arrive from the LLM; text inside think blocks is
+    suppressed, including tags split across chunk boundaries. Leading
+    whitespace before the first visible text is dropped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_think = False
+        self._started = False
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        """Length of the longest suffix of text that is a proper prefix of tag."""
+        for length in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:length]):
+                return length
+        return 0
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the visible text that can be emitted now."""
+        self._buffer += chunk
+        output = []
+        while self._buffer:
+            if self._in_think:
+                end = self._buffer.find(THINK_CLOSE)
+                if end == -1:
+                    keep = self._partial_tag_length(self._buffer, THINK_CLOSE)
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                self._buffer = self._buffer[end + len(THINK_CLOSE):]
+                self._in_think = False
+            else:
+                start = self._buffer.find(THINK_OPEN)
+                if start == -1:
+                    keep = self._partial_tag_length(self._buffer, THINK_OPEN)
+                    output.append(self._buffer[:len(self._buffer) - keep])
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                output.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(THINK_OPEN):]
+                self._in_think = True
+        return self._emit("".join(output))
+
+    def flush(self) -> str:
+        """Return any buffered visible text once the stream has ended."""
+        remaining = "" if self._in_think else self._buffer
+        self._buffer = ""
+        return self._emit(remaining)
+
+
+def filter_think_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield the visible text of a stream of chunks with think blocks removed."""
+    think_filter = ThinkFilter()
+    # Only the filter's own work is timed, not the wait for the next chunk
+    seconds = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        text = think_filter.feed(chunk)
+        seconds += time.perf_counter() - start
+        if text:
+            yield text
+    text = think_filter.flush()
+    record_stage("think_strip", seconds)
+    if text:
+        yield text
+
+
+async def afilter_think_stream(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async counterpart of filter_think_stream."""
+    think_filter = ThinkFilter()
+    seconds = 0.0
+    async for chunk in chunks:
+        start = time.perf_counter()
+        text = think_filter.feed(chunk)
+        seconds += time.perf_counter() - start
+        if text:
+            yield text
+    text = think_filter.flush()
+    record_stage("think_strip", seconds)
+    if text:
+        yield text
+
+
+def strip_think(text: str) -> str:
+    """Remove all think blocks from a complete response."""
+    return "".join(filter_think_stream([text]))
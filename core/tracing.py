@@ -0,0 +1,317 @@
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from config import TRACE_LOG_SAMPLE_RATE, TRACE_SLOW_THRESHOLD
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000, 4000)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, as Prometheus expects."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower  # beyond the largest bucket
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Process-wide counters and histograms, labelled like Prometheus metrics.
+
+    Observations only take a lock and bump a few integers, so they are
+    cheap enough for every request. ``stats`` summarizes them for the
+    in-process API and ``prometheus`` renders the text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._histogram_buckets: Dict[str, Tuple[float, ...]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._collectors: Dict[str, Callable[[], List[Tuple[Dict[str, str], float]]]] = {}
+
+    def describe_histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self._help[name] = help_text
+        self._histogram_buckets[name] = buckets
+
+    def describe_counter(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def add_gauge(self, name: str, help_text: str, collect: Callable[[], List[Tuple[Dict[str, str], float]]]) -> None:
+        """Register a gauge read at scrape time from a function returning (labels, value) samples.
+
+        Registering the same name again replaces the previous function.
+        """
+        with self._lock:
+            self._help[name] = help_text
+            self._collectors[name] = collect
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._histogram_buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def stats(self) -> Dict[str, Any]:
+        """Summaries per metric and label set: count, mean and estimated p50/p95/p99."""
+        with self._lock:
+            stats: Dict[str, Any] = {}
+            for name, series in self._histograms.items():
+                stats[name] = {
+                    _label_text(key) or "all": {
+                        "count": histogram.count,
+                        "mean": round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                        "p50": round(histogram.quantile(0.5), 6),
+                        "p95": round(histogram.quantile(0.95), 6),
+                        "p99": round(histogram.quantile(0.99), 6),
+                    }
+                    for key, histogram in series.items()
+                }
+            for name, series in self._counters.items():
+                stats[name] = {_label_text(key) or "all": value for key, value in series.items()}
+            return stats
+
+    def prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in self._histograms.items():
+                lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} histogram"]
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_label_block(key + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_label_block(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_label_block(key)} {histogram.count}")
+            for name, series in self._counters.items():
+                lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_label_block(key)} {value}" for key, value in series.items()]
+            collectors = dict(self._collectors)
+
+        # Gauges read other components' state, so they are collected outside the lock
+        for name, collect in collectors.items():
+            try:
+                samples = collect()
+            except Exception as e:
+                logging.warning(f"Metrics: Could not collect {name}: {str(e)}")
+                continue
+            lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{_label_block(tuple(sorted(labels.items())))} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_block(key: LabelKey) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in key) + "}" if key else ""
+
+
+def _label_text(key: LabelKey) -> str:
+    return ",".join(f"{name}={value}" for name, value in key)
+
+
+_metrics = Metrics()
+_metrics.describe_histogram("tutor_stage_duration_seconds", "Time spent in each stage of answering a query")
+_metrics.describe_histogram("tutor_request_duration_seconds", "Time to answer a query end to end, by route")
+_metrics.describe_counter("tutor_requests_total", "Queries answered, by route and outcome")
+_metrics.describe_counter("tutor_coalesced_requests_total", "Queries that joined an identical in-flight generation")
+_metrics.describe_counter("tutor_llm_failures_total", "LLM calls that failed with a backend error, by backend")
+_metrics.describe_counter("tutor_llm_retries_total", "LLM calls retried after a backend error")
+_metrics.describe_counter("tutor_fallback_responses_total", "Answers served without the LLM because no backend was available")
+_metrics.describe_counter("tutor_log_records_dropped_total", "Log records dropped by sampling, rate limits or a full queue")
+_metrics.describe_histogram("tutor_llm_prompt_tokens", "Prompt tokens Ollama evaluated per call", TOKEN_BUCKETS)
+_metrics.describe_histogram("tutor_llm_generated_tokens", "Tokens generated per call", TOKEN_BUCKETS)
+_metrics.describe_histogram("tutor_llm_tokens_per_second", "Generation speed per call", TOKEN_RATE_BUCKETS)
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry."""
+    return _metrics
+
+
+class Span:
+    """One timed stage of a request, with attributes such as the route chosen."""
+
+    __slots__ = ("name", "attributes", "start", "duration")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+
+class Trace:
+    """The spans recorded while answering one request."""
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self.attributes: Dict[str, Any] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 1),
+            **self.attributes,
+            "spans": [
+                {"stage": span.name, "ms": round(span.duration * 1000, 2), **span.attributes}
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("tutor_trace", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("tutor_request_id", default=None)
+
+
+def set_request_id(request_id: str) -> None:
+    """Use the caller's request id (e.g. X-Request-ID) for traces started in this context."""
+    _request_id.set(request_id)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    """The id of the request being handled in this context, if any."""
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else _request_id.get()
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes, such as the route, to the current trace if there is one."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Span]:
+    """Time a stage, recording it in the stage histogram and the current trace.
+
+    Attributes may be added to the yielded span inside the block; an
+    exception marks the span as failed and propagates.
+    """
+    current = Span(stage, attributes)
+    try:
+        yield current
+    except BaseException:
+        current.attributes["error"] = True
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _metrics.observe("tutor_stage_duration_seconds", current.duration, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(current)
+
+
+def record_stage(stage: str, seconds: float, **attributes: Any) -> None:
+    """Record a stage timed by the caller, e.g. work spread across stream chunks."""
+    _metrics.observe("tutor_stage_duration_seconds", seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        recorded = Span(stage, attributes)
+        recorded.duration = seconds
+        trace.spans.append(recorded)
+
+
+@contextmanager
+def trace_request(kind: str, request_id: Optional[str] = None) -> Iterator[Trace]:
+    """Trace one query end to end.
+
+    Set ``trace.attributes["route"]`` (and "outcome" for anything but
+    "ok") inside the block; on exit the request is counted, its latency is
+    recorded per route and its span breakdown is logged if sampled.
+    Nested calls join the enclosing trace instead of starting their own.
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        yield outer
+        return
+
+    trace = Trace(request_id or _request_id.get())
+    trace.attributes["kind"] = kind
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.attributes["outcome"] = "error"
+        trace.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # An async generator was closed from another context (e.g. by the
+            # event loop after the client left); the trace is finished anyway
+            pass
+        elapsed = time.perf_counter() - trace.start
+        route = str(trace.attributes.get("route", "NONE"))
+        outcome = str(trace.attributes.setdefault("outcome", "ok"))
+        _metrics.observe("tutor_request_duration_seconds", elapsed, route=route)
+        _metrics.increment("tutor_requests_total", route=route, outcome=outcome)
+        if outcome != "ok" or elapsed >= TRACE_SLOW_THRESHOLD or random.random() < TRACE_LOG_SAMPLE_RATE:
+            get_trace_logger().info("Trace: %s", trace.summary(), extra={"request_id": trace.request_id})
+
+
+def get_trace_logger() -> logging.Logger:
+    """Return the "tutor.trace" logger.
+
+    Its records go through the root logger's queue (see
+    core.logging_setup), so request handlers never wait on disk.
+    """
+    return logging.getLogger("tutor.trace")
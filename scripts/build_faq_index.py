@@ -0,0 +1,121 @@
+"""Build the FAQ answer index that TutorAgent serves curated answers from.
+
+Entries in the question bank with an "answer" are teacher-reviewed and
+used as written; the others are answered by the tutor (Ollama must be
+running). Rebuilds are incremental: a generated answer is reused while
+its question, route, model and PROMPT_VERSION are unchanged, so adding
+questions only generates the new ones.
+
+Usage:
+    python -m scripts.build_faq_index [--questions data/faq_questions.jsonl]
+                                      [--output models/faq_index.bin] [--reviewed-only] [--force]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from agents.faq_index import answer_fingerprint, load_faq_index, write_faq_index
+from config import FAQ_INDEX_PATH, FAQ_QUESTIONS_PATH, PROMPT_VERSION
+
+ROUTES = {"MATH", "PHYSICS", "GENERAL"}
+
+
+def load_questions(path: str) -> list:
+    """Read question bank entries from a JSONL file, checking ids are unique."""
+    questions, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry["id"] in seen:
+                raise ValueError(f"{path}:{number}: duplicate id {entry['id']!r}")
+            if entry["route"] not in ROUTES:
+                raise ValueError(f"{path}:{number}: route must be one of {sorted(ROUTES)}")
+            seen.add(entry["id"])
+            questions.append(entry)
+    return questions
+
+
+def load_existing(path: str) -> dict:
+    """Records of a previous build by id, or {} if there is none."""
+    index = load_faq_index(path, threshold=1.0) if os.path.exists(path) else None
+    if index is None:
+        return {}
+    try:
+        return {record["id"]: record for record in index.records()}
+    except (ValueError, KeyError):
+        print(f"Ignoring unreadable index at {path}")
+        return {}
+
+
+async def generate_answer(tutor, question: dict) -> str:
+    from agents.tutor_agent import RESPONSE_HEADERS
+    response = await tutor.agenerate_routed_response(question["question"], question["route"])
+    return response[len(RESPONSE_HEADERS[question["route"]]):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FAQ answer index")
+    parser.add_argument("--questions", default=FAQ_QUESTIONS_PATH, help="Question bank JSONL")
+    parser.add_argument("--output", default=FAQ_INDEX_PATH, help="Where to write the index")
+    parser.add_argument("--reviewed-only", action="store_true",
+                        help="Don't call the LLM; skip questions without a reviewed answer unless already built")
+    parser.add_argument("--force", action="store_true", help="Regenerate answers even if unchanged")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    existing = {} if args.force else load_existing(args.output)
+    print(f"Loaded {len(questions)} questions from {args.questions} ({len(existing)} entries already built)")
+
+    tutor, generator = None, None
+    records, counts = [], {"reviewed": 0, "reused": 0, "generated": 0, "skipped": 0}
+    start = time.perf_counter()
+    for question in questions:
+        if not question.get("answer") and generator is None:
+            from core.generation import get_generation_policy
+            generator = f"{','.join(get_generation_policy().tier_models())}/prompt-v{PROMPT_VERSION}"
+        fingerprint = answer_fingerprint(question, generator or "")
+        record = {key: question[key] for key in ("id", "route", "question")}
+        record["aliases"] = question.get("aliases", [])
+        record["fingerprint"] = fingerprint
+
+        previous = existing.get(question["id"])
+        if question.get("answer"):
+            record.update(answer=question["answer"], source="reviewed")
+            counts["reviewed"] += 1
+        elif previous is not None and previous.get("fingerprint") == fingerprint:
+            record.update(answer=previous["answer"], source="generated")
+            counts["reused"] += 1
+        elif args.reviewed_only:
+            print(f"  skipped {question['id']}: no reviewed answer")
+            counts["skipped"] += 1
+            continue
+        else:
+            if tutor is None:
+                from agents.tutor_agent import TutorAgent  # deferred: only needed to generate answers
+                tutor = TutorAgent()
+                # Answer from the model, not from an earlier build or the response cache
+                tutor.faq_enabled = False
+                tutor.response_cache = None
+            try:
+                answer = asyncio.run(generate_answer(tutor, question))
+            except Exception as e:
+                print(f"  skipped {question['id']}: generation failed: {e}")
+                counts["skipped"] += 1
+                continue
+            record.update(answer=answer, source="generated")
+            counts["generated"] += 1
+            print(f"  generated {question['id']} ({len(answer)} chars)")
+        records.append(record)
+
+    write_faq_index(args.output, records)
+    summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+    print(f"Wrote {len(records)} entries to {args.output} in {time.perf_counter() - start:.1f}s ({summary}, "
+          f"{os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
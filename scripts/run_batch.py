@@ -0,0 +1,41 @@
+"""Answer a JSONL file of questions offline, e.g. to pre-generate worked solutions.
+
+Usage:
+    python -m scripts.run_batch questions.jsonl answers.jsonl [--concurrency 8] [--report report.json]
+
+Each input line is {"id": ..., "query": ...}. Results are appended to the
+output file as they finish; rerun the same command to resume after a crash
+or retry failed items (their old records are replaced).
+"""
+import argparse
+import asyncio
+import json
+import logging
+from agents.tutor_agent import TutorAgent
+from core.batch import BatchRunner, read_batch_items
+from config import BATCH_CONCURRENCY
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a batch of tutoring queries")
+    parser.add_argument("input", help="JSONL file of queries")
+    parser.add_argument("output", help="JSONL file to append results to (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="Maximum queries processed at once")
+    parser.add_argument("--report", help="Optional path to write the run report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    items = read_batch_items(args.input)
+    runner = BatchRunner(TutorAgent(), concurrency=args.concurrency)
+    report = asyncio.run(runner.run(items, args.output))
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Run the shared key-value store used by MEMORY_BACKEND=kv.
+
+Usage:
+    python -m scripts.run_kv_server [--host 0.0.0.0] [--port 6390] [--max-keys 1000]
+
+Point every worker's MEMORY_KV_ADDRESS at it so a conversation can move
+between workers and hosts. State is held in memory only; expired keys
+are swept every minute and at most --max-keys are kept (MEMORY_MAX_SESSIONS
+by default), dropping the least recently written.
+"""
+import argparse
+import asyncio
+import logging
+from core.session_store import KVServer
+from config import MEMORY_KV_ADDRESS, MEMORY_MAX_SESSIONS
+
+
+def main():
+    default_host, _, default_port = MEMORY_KV_ADDRESS.rpartition(":")
+    parser = argparse.ArgumentParser(description="Run the session key-value store")
+    parser.add_argument("--host", default=default_host or "127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=int(default_port), help="Port to listen on")
+    parser.add_argument("--max-keys", type=int, default=MEMORY_MAX_SESSIONS, help="Most keys held at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        asyncio.run(KVServer(max_keys=args.max_keys).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Run several tutoring bot workers on one host, one per port.
+
+Usage:
+    python -m scripts.run_workers [--workers N] [--base-port 7860] [--headless]
+
+Worker i listens on base-port + i; put a load balancer in front of them
+and probe /readyz. Conversation state lives in the session store, so any
+worker can answer any turn as long as MEMORY_BACKEND is shared ("sqlite"
+on one host, "kv" across hosts). Workers that exit are restarted.
+Each worker logs to its own file (tutoring_bot.0.log, tutoring_bot.1.log,
+... for the default LOG_FILE).
+With --headless the workers serve only the JSON API (api.py), without Gradio.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from config import LOG_FILE, MEMORY_BACKEND, WORKER_COUNT
+
+RESTART_DELAY = 2.0  # seconds before restarting a worker that exited
+
+
+def start_worker(index: int, base_port: int, env: dict, script: str = "app.py") -> subprocess.Popen:
+    worker_env = {**env, "WORKER_ID": str(index), "SERVER_PORT": str(base_port + index)}
+    if LOG_FILE:
+        # Rotation isn't safe with several processes writing one file
+        root, ext = os.path.splitext(LOG_FILE)
+        worker_env["LOG_FILE"] = f"{root}.{index}{ext}"
+    logging.info(f"Starting worker {index} ({script}) on port {base_port + index}")
+    return subprocess.Popen([sys.executable, script], env=worker_env,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run tutoring bot worker processes")
+    parser.add_argument("--workers", type=int, default=WORKER_COUNT, help="Number of worker processes")
+    parser.add_argument("--base-port", type=int, default=int(os.environ.get("SERVER_PORT", "7860")),
+                        help="Port of the first worker; the rest use the following ports")
+    parser.add_argument("--headless", action="store_true", help="Serve only the JSON API, without Gradio")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    env = dict(os.environ)
+    if args.workers > 1 and MEMORY_BACKEND.lower() == "memory":
+        if "MEMORY_BACKEND" in os.environ:
+            logging.warning("MEMORY_BACKEND=memory is private to each worker; "
+                            "conversations will lose context when they move between workers")
+        else:
+            # Share sessions between the workers on this host by default
+            env["MEMORY_BACKEND"] = "sqlite"
+
+    script = "api.py" if args.headless else "app.py"
+    workers = {index: start_worker(index, args.base_port, env, script) for index in range(args.workers)}
+    try:
+        while True:
+            time.sleep(1.0)
+            for index, process in list(workers.items()):
+                if process.poll() is not None:
+                    logging.warning(f"Worker {index} exited with code {process.returncode}, restarting")
+                    time.sleep(RESTART_DELAY)
+                    workers[index] = start_worker(index, args.base_port, env, script)
+    except KeyboardInterrupt:
+        logging.info("Stopping workers")
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
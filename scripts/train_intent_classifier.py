@@ -0,0 +1,81 @@
+"""Train the local intent classifier used by TutorAgent for query routing.
+
+Usage:
+    python -m scripts.train_intent_classifier [--data data/intent_examples.jsonl]
+                                              [--output models/intent_classifier.json]
+"""
+import argparse
+import json
+import random
+import time
+from agents.intent_classifier import IntentClassifier
+from config import INTENT_CONFIDENCE_THRESHOLD, INTENT_MODEL_PATH
+
+LABELS = ["MATH", "PHYSICS", "GENERAL"]
+
+
+def load_examples(path: str) -> list:
+    """Read (text, label) pairs from a JSONL file."""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                examples.append((record["text"], record["label"]))
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the intent classifier")
+    parser.add_argument("--data", default="data/intent_examples.jsonl", help="Labelled JSONL examples")
+    parser.add_argument("--output", default=INTENT_MODEL_PATH, help="Where to write the model")
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds (0 to skip)")
+    parser.add_argument("--threshold", type=float, default=INTENT_CONFIDENCE_THRESHOLD,
+                        help="Confidence above which the model's label is used instead of the LLM's")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    print(f"Loaded {len(examples)} examples from {args.data}")
+
+    # Cross-validate before fitting on everything, so every example is scored
+    # once by a model that didn't see it. What matters for routing is the
+    # accuracy of the predictions confident enough to skip the LLM.
+    shuffled = list(examples)
+    random.Random(args.seed).shuffle(shuffled)
+    held_out = []  # (confidence, correct)
+    for fold in range(args.folds):
+        probe = IntentClassifier(LABELS)
+        probe.train([example for i, example in enumerate(shuffled) if i % args.folds != fold],
+                    epochs=args.epochs, seed=args.seed)
+        for text, label in shuffled[fold::args.folds]:
+            predicted, confidence = probe.predict(text)
+            held_out.append((confidence, predicted == label))
+    if held_out:
+        print(f"Held-out accuracy: {sum(correct for _, correct in held_out) / len(held_out):.3f} "
+              f"on {len(held_out)} examples ({args.folds}-fold)")
+        confident = [correct for confidence, correct in held_out if confidence >= args.threshold]
+        if confident:
+            print(f"Held-out accuracy at confidence >= {args.threshold}: {sum(confident) / len(confident):.3f} "
+                  f"on {len(confident) / len(held_out):.0%} of examples (the rest go to the LLM)")
+
+    classifier = IntentClassifier(LABELS)
+    start = time.perf_counter()
+    classifier.train(examples, epochs=args.epochs, seed=args.seed)
+    print(f"Trained on {len(examples)} examples in {time.perf_counter() - start:.2f}s")
+    print(f"Training accuracy: {classifier.evaluate(examples):.3f}")
+
+    start = time.perf_counter()
+    for text, _ in examples:
+        classifier.predict(text)
+    per_query = (time.perf_counter() - start) / len(examples)
+    print(f"Average prediction time: {per_query * 1e6:.1f} µs")
+
+    classifier.save(args.output)
+    print(f"Model written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+import json
+from core.batch import BatchItem, BatchRunner
+from core.scheduler import SchedulerSaturatedError
+
+
+class FlakyTutor:
+    """Fails each query the first time it is asked."""
+
+    def __init__(self):
+        self.asked = set()
+
+    async def aclassify_query(self, query):
+        return "GENERAL"
+
+    async def agenerate_routed_response(self, query, route):
+        if query not in self.asked:
+            self.asked.add(query)
+            raise RuntimeError("model unavailable")
+        return query.upper()
+
+
+def test_resume_keeps_one_record_per_id(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    output.write_text('{"id": "0", "query": "done", "response": "DONE", "error": null}\n'
+                      '{"id": "1", "query": "torn", "resp', encoding="utf-8")
+    items = [BatchItem("0", "done"), BatchItem("1", "a"), BatchItem("2", "b")]
+    runner = BatchRunner(FlakyTutor(), concurrency=2)
+
+    first = asyncio.run(runner.run(items, str(output)))
+    second = asyncio.run(runner.run(items, str(output)))
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert (first["errors"], second["skipped"], second["errors"]) == (2, 1, 0)
+    assert sorted((record["id"], record["error"]) for record in records) == [("0", None), ("1", None), ("2", None)]
+
+
+class SaturatedClassifier(FlakyTutor):
+    """Can't classify the query "busy"; answers everything else."""
+
+    async def aclassify_query(self, query):
+        if query == "busy":
+            raise SchedulerSaturatedError("LLM queue is full")
+        return "GENERAL"
+
+    async def agenerate_routed_response(self, query, route):
+        return query.upper()
+
+
+def test_failed_classification_fails_only_its_item(tmp_path):
+    output = tmp_path / "answers.jsonl"
+    items = [BatchItem("0", "busy"), BatchItem("1", "a"), BatchItem("2", "b")]
+
+    report = asyncio.run(BatchRunner(SaturatedClassifier(), concurrency=2).run(items, str(output)))
+
+    records = {record["id"]: record for record in map(json.loads, output.read_text(encoding="utf-8").splitlines())}
+    assert (report["processed"], report["errors"]) == (2, 1)
+    assert records["0"]["error"] == "LLM queue is full"
+    assert (records["1"]["response"], records["2"]["response"]) == ("A", "B")
@@ -0,0 +1,13 @@
+from agents.faq_index import load_faq_index
+from config import FAQ_INDEX_PATH, FAQ_MATCH_THRESHOLD
+
+
+def test_curated_equation_is_answered():
+    index = load_faq_index(FAQ_INDEX_PATH, FAQ_MATCH_THRESHOLD)
+    assert index.match("Solve the equation 2x + 5 = 11") is not None
+
+
+def test_permuted_equations_are_not_answered():
+    index = load_faq_index(FAQ_INDEX_PATH, FAQ_MATCH_THRESHOLD)
+    assert index.match("Solve the equation 2x + 11 = 5") is None
+    assert index.match("2x = 11 + 5") is None
@@ -0,0 +1,20 @@
+import sys
+from agents.math_agent import MathAgent
+from tools.expression_engine import format_result
+
+
+def test_huge_power_does_not_break_the_answer():
+    answer = MathAgent().fallback_answer("Calculate 9^9999")
+    assert "9^9999" in answer
+
+
+def test_result_past_the_int_str_limit_uses_scientific_notation():
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(640)
+    try:
+        assert format_result(9 ** 9999) == "≈ 2.957003808 × 10^9541 (9542 digits)"
+        assert format_result(10 ** 700 - 1) == "≈ 9.999999999 × 10^699 (700 digits)"
+        assert format_result(-(10 ** 700)) == "≈ -1.000000000 × 10^700 (701 digits)"
+        assert format_result(12345) == "12345"
+    finally:
+        sys.set_int_max_str_digits(limit)
@@ -0,0 +1,47 @@
+from tools.math_solver import MathSolver
+
+
+def answer(query):
+    solution = MathSolver().solve(query)
+    return solution.answer if solution is not None else None
+
+
+def test_odd_root_of_negative_number_is_real():
+    assert answer("calculate (-8)^(1/3)") == "(-8)^(1/3) = -2"
+
+
+def test_complex_result_is_left_to_the_llm():
+    assert answer("calculate (-2)^0.5") is None
+
+
+def test_quadratic_roots_are_simplified():
+    assert answer("solve x^2 = 2").startswith("x = ±√2, so")
+    assert answer("solve x^2 - 2x - 1 = 0").startswith("x = 1 ± √2, so")
+    assert answer("solve x^2 + 1 = 0") == "x = ±i (no real solutions)"
+    assert answer("solve x^2 + x + 1 = 0") == "x = (-1 ± i√3) / 2 (no real solutions)"
+
+
+def confident_answer(query):
+    solution = MathSolver().solve(query)
+    return solution.answer if solution is not None and solution.confident else None
+
+
+def test_equations_and_variables_are_not_arithmetic():
+    assert answer("solve y = 2x + 3") is None
+    assert answer("what is a + 3") is None
+
+
+def test_arithmetic_does_not_start_or_end_with_an_operator():
+    assert answer("what is 5 +") is None
+    assert answer("what is 5!") == "5! = 120"
+
+
+def test_thousands_separators():
+    assert answer("what is 1,000 + 2,000") == "1000 + 2000 = 3000"
+    assert answer("what is 1,000,000 / 4") == "1000000 / 4 = 250000"
+
+
+def test_systems_of_equations_are_not_bare():
+    assert confident_answer("solve 2x=4 and x+y=3") is None
+    assert confident_answer("find x if 3x - 4 = 11") == "x = 5"
+    assert confident_answer("differentiate x^3 with respect to x") == "f'(x) = 3x^2"
@@ -0,0 +1,37 @@
+from tools.physics_calculator import PhysicsCalculator
+
+
+def worked(query):
+    calculation = PhysicsCalculator().calculate(query)
+    return calculation.worked if calculation is not None else None
+
+
+def test_mass_energy_equivalence():
+    assert worked("energy equivalent of 1 g of mass").endswith("= 8.9876e+13 J")
+
+
+def test_electrical_power_from_current_and_resistance():
+    assert worked("5 A current through 10 ohm, power?") == "P = (5 A)² × 10 Ω = 250 W"
+
+
+def test_free_fall():
+    assert worked("ball dropped from 20 m, how long").endswith("= 2.01962 s")
+    assert worked("how long to travel 20 m") is None
+
+
+def test_velocity_updated_from_its_given_value():
+    query = "A car starts at 2 m/s and accelerates at 4 m/s^2 for 3 s. How fast is it going?"
+    assert worked(query) == "v = 2 m/s + 4 m/s² × 3 s = 14 m/s"
+
+
+def test_signed_values():
+    assert worked("v = -3 m/s, m = 2 kg, momentum?") == "p = 2 kg × -3 m/s = -6 kg·m/s"
+    assert worked("v = −3 m/s, m = 2 kg, momentum?") == "p = 2 kg × -3 m/s = -6 kg·m/s"
+
+
+def test_unread_context_is_left_to_the_llm():
+    calculator = PhysicsCalculator()
+    for query in ("weight of a 70 kg person on the Moon", "Two 2 kg masses at 3 m/s, total momentum"):
+        calculation = calculator.calculate(query)
+        assert calculation is not None and not calculation.confident
+    assert calculator.calculate("What is the weight of a 70 kg person?").confident
@@ -0,0 +1,11 @@
+from tools.physics_constants import PhysicsConstantsLookup
+
+
+def test_misspelled_constant_is_found_in_text():
+    assert PhysicsConstantsLookup().find_in_text("what is avagadro number") == ["avogadro_number"]
+
+
+def test_search_matches_word_prefixes():
+    matches = PhysicsConstantsLookup().search_constants("neutron mag")
+    assert "neutron_mag_mom" in matches
+    assert all("neutron" in data["name"].lower() for data in matches.values())
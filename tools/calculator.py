@@ -1,5 +1,5 @@
-from typing import Union
-import re
+from typing import Dict, List, Sequence, Union
+from tools.expression_engine import ArrayResult, EvaluationResult, compile_expression, evaluate, evaluate_many
 import math
 
 class Calculator:
@@ -41,26 +41,24 @@ class Calculator:
     
     @staticmethod
     def evaluate_expression(expression: str) -> float:
-        """Safely evaluate a mathematical expression."""
-        # Remove spaces and validate expression
-        expression = expression.replace(" ", "")
-        
-        # Only allow digits, operators, parentheses, and decimal points
-        if not re.match(r'^[0-9+\-*/().^√]+$', expression):
-            raise ValueError("Invalid characters in expression")
-        
-        # Replace ^ with ** for power operations
-        expression = expression.replace("^", "**")
-        
-        # Handle square root symbol
-        expression = re.sub(r'√(\d+(?:\.\d+)?)', r'math.sqrt(\1)', expression)
-        
-        try:
-            # Use eval with restricted globals for safety
-            allowed_names = {
-                "__builtins__": {},
-                "math": math,
-            }
-            return eval(expression, allowed_names)
-        except Exception as e:
-            raise ValueError(f"Error evaluating expression: {str(e)}")
+        """Safely evaluate a mathematical expression.
+
+        Expressions are parsed by tools.expression_engine into a cached AST
+        and evaluated with whitelisted functions and size limits; eval is
+        never used. Raises ValueError for invalid or unsafe expressions.
+        """
+        return evaluate(expression)
+
+    @staticmethod
+    def evaluate_many(expressions: List[str]) -> List[EvaluationResult]:
+        """Evaluate a list of expressions, returning a value or error message for each."""
+        return evaluate_many(expressions)
+
+    @staticmethod
+    def evaluate_over(expression: str, bindings: Dict[str, Sequence[float]]) -> ArrayResult:
+        """Evaluate one expression over arrays of variable values, e.g. a table of f(x).
+
+        Raises ValueError only if the expression itself is invalid; undefined
+        points are reported per element in the result.
+        """
+        return compile_expression(expression).evaluate_array(bindings)
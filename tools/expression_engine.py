@@ -0,0 +1,507 @@
+import math
+import re
+import sys
+import time
+from fractions import Fraction
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from config import CALCULATOR_MAX_LENGTH, CALCULATOR_MAX_NODES, CALCULATOR_MAX_INT_BITS, CALCULATOR_TIMEOUT
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be parsed or safely evaluated."""
+
+
+# Unicode operators students paste in, normalized before tokenizing
+_REPLACEMENTS = str.maketrans({"×": "*", "·": "*", "⋅": "*", "÷": "/", "−": "-"})
+
+_TOKEN_PATTERN = re.compile(
+    r"\s*(?:"
+    r"(?P<number>\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<op>\*\*|[-+*/^()!,√²³])"
+    r")"
+)
+
+CONSTANTS: Dict[str, float] = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+MAX_FACTORIAL = 1000
+
+
+def _check_deadline(context: "_Context") -> None:
+    if time.perf_counter() > context.deadline:
+        raise ExpressionError("Expression took too long to evaluate")
+
+
+def _sqrt(x):
+    if x < 0:
+        raise ExpressionError("Cannot calculate square root of negative number")
+    return math.sqrt(x)
+
+
+def _log(x, base=None):
+    if x <= 0 or (base is not None and (base <= 0 or base == 1)):
+        raise ExpressionError("Logarithm is undefined for this input")
+    return math.log(x) if base is None else math.log(x, base)
+
+
+def _factorial(n):
+    if n != int(n) or n < 0:
+        raise ExpressionError("Factorial is only defined for non-negative integers")
+    if n > MAX_FACTORIAL:
+        raise ExpressionError(f"Factorial argument exceeds {MAX_FACTORIAL}")
+    return math.factorial(int(n))
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "sqrt": _sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "exp": math.exp,
+    "log": _log,
+    "ln": _log,
+    "log10": lambda x: _log(x, 10),
+    "log2": lambda x: _log(x, 2),
+    "abs": abs,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "round": round,
+    "factorial": _factorial,
+}
+
+
+class _Context:
+    __slots__ = ("deadline",)
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+
+def _power(base, exponent, context: _Context):
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        # Estimate the result size before computing it, so 9**9**9 fails fast
+        if abs(base) > 1 and abs(base).bit_length() * exponent > CALCULATOR_MAX_INT_BITS:
+            raise ExpressionError("Result of exponentiation is too large")
+    _check_deadline(context)
+    if base < 0 and exponent != int(exponent):
+        return _real_root_power(base, exponent)
+    try:
+        return base ** exponent
+    except OverflowError:
+        raise ExpressionError("Result of exponentiation is too large") from None
+    except ZeroDivisionError:
+        raise ExpressionError("Cannot divide by zero") from None
+
+
+def _real_root_power(base, exponent):
+    """A negative base to a fractional power, e.g. (-8)^(1/3) = -2, when the result is real.
+
+    Python would return the complex principal root instead. Only powers
+    p/q with an odd q have a real value.
+    """
+    fraction = Fraction(exponent).limit_denominator(1000)
+    if fraction.denominator % 2 == 0 or not math.isclose(fraction, exponent, rel_tol=1e-12, abs_tol=1e-12):
+        raise ExpressionError("Result is not a real number")
+    try:
+        magnitude = (-base) ** (fraction.numerator / fraction.denominator)
+    except (OverflowError, ZeroDivisionError):
+        raise ExpressionError("Result of exponentiation is too large") from None
+    return -magnitude if fraction.numerator % 2 else magnitude
+
+
+def _multiply(left, right, context: _Context):
+    if isinstance(left, int) and isinstance(right, int):
+        if left.bit_length() + right.bit_length() > CALCULATOR_MAX_INT_BITS:
+            raise ExpressionError("Result of multiplication is too large")
+    return left * right
+
+
+def _divide(left, right, context: _Context):
+    if right == 0:
+        raise ExpressionError("Cannot divide by zero")
+    return left / right
+
+
+BINARY_OPERATORS: Dict[str, Callable[[Any, Any, _Context], Any]] = {
+    "+": lambda left, right, context: left + right,
+    "-": lambda left, right, context: left - right,
+    "*": _multiply,
+    "/": _divide,
+    "^": _power,
+}
+
+
+# AST nodes are plain tuples:
+#   ("num", value) | ("var", name) | ("neg", operand)
+#   ("bin", op, left, right) | ("call", name, (args...))
+Node = Tuple
+
+
+class _Parser:
+    """Recursive-descent parser producing a tuple AST.
+
+    Precedence, lowest first: + -, * / (including implicit multiplication
+    such as 2x or 3(x + 1)), unary minus, ^ (right-associative), postfix
+    ! ² ³, then numbers, names, calls, parentheses and √.
+    """
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+        self.nodes = 0
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise ExpressionError("Unexpected end of expression")
+        self.position += 1
+        return token
+
+    def _expect(self, value: str) -> None:
+        token = self._next()
+        if token != ("op", value):
+            raise ExpressionError(f"Expected '{value}' but found '{token[1]}'")
+
+    def _node(self, *node) -> Node:
+        self.nodes += 1
+        if self.nodes > CALCULATOR_MAX_NODES:
+            raise ExpressionError("Expression is too complex")
+        return node
+
+    def parse(self) -> Node:
+        node = self._expression()
+        if self._peek() is not None:
+            raise ExpressionError(f"Unexpected token '{self._peek()[1]}'")
+        return node
+
+    def _expression(self) -> Node:
+        node = self._term()
+        while self._peek() in (("op", "+"), ("op", "-")):
+            op = self._next()[1]
+            node = self._node("bin", op, node, self._term())
+        return node
+
+    def _term(self) -> Node:
+        node = self._unary()
+        while True:
+            token = self._peek()
+            if token in (("op", "*"), ("op", "/")):
+                op = self._next()[1]
+                node = self._node("bin", op, node, self._unary())
+            elif token is not None and (token[0] == "name" or token[1] in ("(", "√")):
+                # Implicit multiplication: 2x, 2pi, 3(x + 1)
+                node = self._node("bin", "*", node, self._power())
+            else:
+                return node
+
+    def _unary(self) -> Node:
+        token = self._peek()
+        if token == ("op", "-"):
+            self._next()
+            return self._node("neg", self._unary())
+        if token == ("op", "+"):
+            self._next()
+            return self._unary()
+        return self._power()
+
+    def _power(self) -> Node:
+        node = self._postfix()
+        if self._peek() in (("op", "^"), ("op", "**")):
+            self._next()
+            return self._node("bin", "^", node, self._unary())
+        return node
+
+    def _postfix(self) -> Node:
+        node = self._primary()
+        while True:
+            token = self._peek()
+            if token == ("op", "!"):
+                self._next()
+                node = self._node("call", "factorial", (node,))
+            elif token == ("op", "²"):
+                self._next()
+                node = self._node("bin", "^", node, ("num", 2))
+            elif token == ("op", "³"):
+                self._next()
+                node = self._node("bin", "^", node, ("num", 3))
+            else:
+                return node
+
+    def _primary(self) -> Node:
+        kind, value = self._next()
+        if kind == "number":
+            number = float(value) if any(ch in value for ch in ".eE") else int(value)
+            return self._node("num", number)
+        if kind == "name":
+            if self._peek() == ("op", "(") and value in FUNCTIONS:
+                self._next()
+                args = [self._expression()]
+                while self._peek() == ("op", ","):
+                    self._next()
+                    args.append(self._expression())
+                self._expect(")")
+                return self._node("call", value, tuple(args))
+            if value in CONSTANTS:
+                return self._node("num", CONSTANTS[value])
+            if value in FUNCTIONS:
+                raise ExpressionError(f"Function '{value}' must be called with parentheses")
+            return self._node("var", value)
+        if value == "(":
+            node = self._expression()
+            self._expect(")")
+            return node
+        if value == "√":
+            return self._node("call", "sqrt", (self._postfix(),))
+        raise ExpressionError(f"Unexpected token '{value}'")
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """Split an expression into (kind, text) tokens."""
+    text = text.translate(_REPLACEMENTS).replace("π", " pi ")
+    tokens = []
+    position = 0
+    length = len(text.rstrip())
+    while position < length:
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ExpressionError(f"Invalid character in expression: '{text[position:].strip()[:1]}'")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _collect_variables(node: Node, found: set) -> None:
+    kind = node[0]
+    if kind == "var":
+        found.add(node[1])
+    elif kind == "neg":
+        _collect_variables(node[1], found)
+    elif kind == "bin":
+        _collect_variables(node[2], found)
+        _collect_variables(node[3], found)
+    elif kind == "call":
+        for arg in node[2]:
+            _collect_variables(arg, found)
+
+
+def _compile_node(node: Node) -> Callable[[Dict[str, Any], _Context], Any]:
+    """Turn an AST node into a closure, so evaluation does no tree dispatch."""
+    kind = node[0]
+    if kind == "num":
+        value = node[1]
+        return lambda env, context: value
+    if kind == "var":
+        name = node[1]
+
+        def variable(env, context):
+            try:
+                return env[name]
+            except KeyError:
+                raise ExpressionError(f"No value given for variable '{name}'") from None
+        return variable
+    if kind == "neg":
+        operand = _compile_node(node[1])
+        return lambda env, context: -operand(env, context)
+    if kind == "bin":
+        operator = BINARY_OPERATORS[node[1]]
+        left = _compile_node(node[2])
+        right = _compile_node(node[3])
+        return lambda env, context: operator(left(env, context), right(env, context), context)
+    if kind == "call":
+        function = FUNCTIONS[node[1]]
+        args = [_compile_node(arg) for arg in node[2]]
+        if len(args) == 1:
+            arg = args[0]
+            return lambda env, context: function(arg(env, context))
+        return lambda env, context: function(*(arg(env, context) for arg in args))
+    raise ExpressionError(f"Unknown node type '{kind}'")
+
+
+def _array_functions(np) -> Dict[str, Callable[..., Any]]:
+    """NumPy equivalents of FUNCTIONS; invalid inputs give NaN/inf instead of raising."""
+    def log(x, base=None):
+        return np.log(x) if base is None else np.log(x) / np.log(base)
+
+    def factorial(n):
+        valid = (n == np.floor(n)) & (n >= 0) & (n <= 170)
+        safe = np.where(valid, n, 0)
+        return np.where(valid, np.vectorize(lambda k: float(math.factorial(int(k))), otypes=[float])(safe), np.nan)
+
+    return {
+        "sqrt": np.sqrt, "sin": np.sin, "cos": np.cos, "tan": np.tan,
+        "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+        "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+        "exp": np.exp, "log": log, "ln": np.log, "log10": np.log10, "log2": np.log2,
+        "abs": np.abs, "floor": np.floor, "ceil": np.ceil, "round": np.round,
+        "factorial": factorial,
+    }
+
+
+def _compile_array_node(node: Node, np, functions: Dict[str, Callable[..., Any]]) -> Callable[[Dict[str, Any]], Any]:
+    """Like _compile_node, but over float64 arrays with element-wise operations."""
+    kind = node[0]
+    if kind == "num":
+        value = float(node[1])
+        return lambda env: value
+    if kind == "var":
+        name = node[1]
+        return lambda env: env[name]
+    if kind == "neg":
+        operand = _compile_array_node(node[1], np, functions)
+        return lambda env: -operand(env)
+    if kind == "bin":
+        operator = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.true_divide, "^": np.power}[node[1]]
+        left = _compile_array_node(node[2], np, functions)
+        right = _compile_array_node(node[3], np, functions)
+        return lambda env: operator(left(env), right(env))
+    if kind == "call":
+        function = functions[node[1]]
+        args = [_compile_array_node(arg, np, functions) for arg in node[2]]
+        return lambda env: function(*(arg(env) for arg in args))
+    raise ExpressionError(f"Unknown node type '{kind}'")
+
+
+class EvaluationResult(NamedTuple):
+    """Outcome of evaluating one expression: a value, or an error message."""
+    value: Any
+    error: Optional[str]
+
+
+class ArrayResult(NamedTuple):
+    """Outcome of evaluating an expression over arrays of bindings.
+
+    ``values`` holds NaN wherever ``errors`` has a message.
+    """
+    values: Any
+    errors: List[Optional[str]]
+
+
+class Expression:
+    """A parsed expression that can be evaluated repeatedly."""
+
+    __slots__ = ("source", "ast", "variables", "_evaluate", "_evaluate_array")
+
+    def __init__(self, source: str, ast: Node):
+        self.source = source
+        self.ast = ast
+        found: set = set()
+        _collect_variables(ast, found)
+        self.variables: FrozenSet[str] = frozenset(found)
+        self._evaluate = _compile_node(ast)
+        self._evaluate_array = None
+
+    def evaluate_array(self, bindings: Dict[str, Sequence[float]]) -> ArrayResult:
+        """Evaluate element-wise over arrays of variable values using NumPy.
+
+        All binding arrays are broadcast together; e.g. {"x": range(10000)}
+        tabulates a function in one vectorized pass. Elements that are
+        undefined (division by zero, sqrt of a negative, overflow) come back
+        as NaN with an error message instead of raising.
+        """
+        import numpy as np  # deferred: only needed for vectorized evaluation
+
+        missing = self.variables - set(bindings)
+        if missing:
+            raise ExpressionError(f"No values given for variables: {', '.join(sorted(missing))}")
+        if self._evaluate_array is None:
+            self._evaluate_array = _compile_array_node(self.ast, np, _array_functions(np))
+
+        env = {name: np.asarray(values, dtype=float) for name, values in bindings.items()}
+        shape = np.broadcast(*env.values()).shape if env else ()
+        with np.errstate(all="ignore"):
+            values = np.broadcast_to(np.asarray(self._evaluate_array(env), dtype=float), shape).copy()
+
+        errors: List[Optional[str]] = [None] * values.size
+        for index in np.flatnonzero(~np.isfinite(values)):
+            errors[index] = ("Result is undefined for this input" if np.isnan(values.flat[index])
+                             else "Result is infinite (division by zero or overflow)")
+            values.flat[index] = np.nan
+        return ArrayResult(values, errors)
+
+    def evaluate(self, variables: Optional[Dict[str, Any]] = None, timeout: float = CALCULATOR_TIMEOUT):
+        """Evaluate with optional variable bindings, raising ExpressionError on failure."""
+        context = _Context(time.perf_counter() + timeout)
+        try:
+            result = self._evaluate(variables or {}, context)
+        except ExpressionError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(f"Error evaluating expression: {str(e)}") from None
+        except RecursionError:
+            raise ExpressionError("Expression is nested too deeply") from None
+        if isinstance(result, complex):
+            raise ExpressionError("Result is not a real number")
+        return result
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+
+@lru_cache(maxsize=2048)
+def compile_expression(text: str) -> Expression:
+    """Parse an expression, memoized so repeated expressions are parsed once."""
+    if len(text) > CALCULATOR_MAX_LENGTH:
+        raise ExpressionError(f"Expression is longer than {CALCULATOR_MAX_LENGTH} characters")
+    tokens = tokenize(text)
+    if not tokens:
+        raise ExpressionError("Empty expression")
+    try:
+        return Expression(text, _Parser(tokens).parse())
+    except RecursionError:
+        raise ExpressionError("Expression is nested too deeply") from None
+
+
+def format_result(value: Any) -> str:
+    """Render a result for display.
+
+    Python refuses to convert integers longer than sys.get_int_max_str_digits()
+    digits to text, so those are shown in scientific notation instead.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        limit = sys.get_int_max_str_digits()
+        if limit and value.bit_length() * math.log10(2) + 1 >= limit:
+            magnitude = abs(value)
+            exponent = int(math.log10(magnitude))
+            leading = str(magnitude // 10 ** (exponent - 9))[:10]
+            if len(leading) < 10:  # log10 rounded up past a power of ten
+                exponent -= 1
+                leading = str(magnitude // 10 ** (exponent - 9))[:10]
+            sign = "-" if value < 0 else ""
+            return f"≈ {sign}{leading[0]}.{leading[1:]} × 10^{exponent} ({exponent + 1} digits)"
+    return str(value)
+
+
+def evaluate(text: str, variables: Optional[Dict[str, Any]] = None):
+    """Compile (with caching) and evaluate an expression."""
+    return compile_expression(text).evaluate(variables)
+
+
+def evaluate_many(texts: Iterable[str], variables: Optional[Dict[str, Any]] = None) -> List[EvaluationResult]:
+    """Evaluate several expressions, reporting errors per item instead of raising.
+
+    Each distinct expression is compiled and evaluated once, however many
+    times it appears in the input.
+    """
+    outcomes: Dict[str, EvaluationResult] = {}
+    results = []
+    for text in texts:
+        outcome = outcomes.get(text)
+        if outcome is None:
+            try:
+                outcome = EvaluationResult(compile_expression(text).evaluate(variables), None)
+            except ExpressionError as e:
+                outcome = EvaluationResult(None, str(e))
+            outcomes[text] = outcome
+        results.append(outcome)
+    return results
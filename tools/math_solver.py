@@ -0,0 +1,424 @@
+import math
+import re
+from fractions import Fraction
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from tools.calculator import Calculator
+from tools.expression_engine import ExpressionError, Node, compile_expression, format_result
+
+Polynomial = Dict[int, Fraction]
+
+MAX_DEGREE = 10
+
+# A run of arithmetic: digits, operators, parentheses and single-letter variables
+_MATH_RUN = r"(?:[\d.\s+\-*/^()²³√×÷·−!]|(?<![A-Za-z])[A-Za-z](?![A-Za-z]))+"
+
+EQUATION_PATTERN = re.compile(rf"(?P<lhs>{_MATH_RUN})=(?P<rhs>{_MATH_RUN})")
+DERIVATIVE_PATTERN = re.compile(
+    rf"(?:derivative\s+of|differentiate|d/d[a-z])\s*(?P<expr>{_MATH_RUN})", re.IGNORECASE
+)
+INTEGRAL_PATTERN = re.compile(
+    rf"(?:integral\s+of|integrate|antiderivative\s+of)\s*(?P<expr>{_MATH_RUN})"
+    r"(?:\s*d[a-z])?(?:\s*\bfrom\s+(?P<lower>-?[\d.]+)\s+to\s+(?P<upper>-?[\d.]+))?",
+    re.IGNORECASE,
+)
+ARITHMETIC_PATTERN = re.compile(r"[\d.\s+\-*/^()²³√×÷·−!]*\d[\d.\s+\-*/^()²³√×÷·−!]*")
+# Operators that need a left or right operand, so arithmetic can't start or end with them
+LEADING_OPERATORS = "+*/^×÷·!"
+TRAILING_OPERATORS = "+-*/^×÷·−√"
+# A single-letter variable name, on its own or after a coefficient ("2x")
+VARIABLE_PATTERN = re.compile(r"(?<![A-Za-z])(?!a\b|I\b)[A-Za-z](?![A-Za-z])")
+# "1,000,000" -> "1000000"
+THOUSANDS_SEPARATOR = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+
+# Words that may surround a problem without changing what is being asked.
+# If a query contains anything else, the solver's answer is passed to the
+# LLM as a verified result instead of being returned on its own.
+FILLER_WORDS = {
+    "a", "an", "the", "of", "for", "if", "is", "what", "whats", "what's", "find", "solve",
+    "calculate", "compute", "evaluate", "simplify", "work", "out", "please", "value",
+    "equation", "derivative", "differentiate", "integral", "integrate", "antiderivative",
+    "with", "respect", "to", "from", "answer", "result", "get", "can", "you", "me",
+    "tell", "how", "much", "dx", "dt", "dy",
+}
+
+WORD_OPERATORS = [
+    (re.compile(r"\bdivided\s+by\b", re.IGNORECASE), "/"),
+    (re.compile(r"\b(?:times|multiplied\s+by)\b", re.IGNORECASE), "*"),
+    (re.compile(r"\bplus\b", re.IGNORECASE), "+"),
+    (re.compile(r"\bminus\b", re.IGNORECASE), "-"),
+    (re.compile(r"\bsquared\b", re.IGNORECASE), "^2"),
+    (re.compile(r"\bcubed\b", re.IGNORECASE), "^3"),
+]
+
+
+class Solution(NamedTuple):
+    """A deterministic answer with the steps that produced it.
+
+    ``confident`` is True when the query asks for nothing beyond this
+    answer, so it can be returned without calling the LLM.
+    """
+    kind: str
+    answer: str
+    steps: List[str]
+    confident: bool
+
+    def format(self) -> str:
+        """Render the solution as a step-by-step answer."""
+        lines = ["**Step-by-step solution:**"]
+        lines.extend(f"{i}. {step}" for i, step in enumerate(self.steps, start=1))
+        lines.append("")
+        lines.append(f"**Answer:** {self.answer}")
+        return "\n".join(lines)
+
+
+def _fraction(value) -> Fraction:
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError("Non-finite coefficient")
+        return Fraction(repr(value))
+    return Fraction(value)
+
+
+def _add(left: Polynomial, right: Polynomial, sign: int = 1) -> Polynomial:
+    result = dict(left)
+    for power, coefficient in right.items():
+        result[power] = result.get(power, Fraction(0)) + sign * coefficient
+    return {power: c for power, c in result.items() if c != 0}
+
+
+def _multiply(left: Polynomial, right: Polynomial) -> Optional[Polynomial]:
+    result: Polynomial = {}
+    for p1, c1 in left.items():
+        for p2, c2 in right.items():
+            if p1 + p2 > MAX_DEGREE:
+                return None
+            result[p1 + p2] = result.get(p1 + p2, Fraction(0)) + c1 * c2
+    return {power: c for power, c in result.items() if c != 0}
+
+
+def to_polynomial(node: Node, variable: Optional[str]) -> Optional[Polynomial]:
+    """Convert an expression AST to {power: coefficient}, or None if it isn't a polynomial."""
+    kind = node[0]
+    if kind == "num":
+        value = _fraction(node[1])
+        return {0: value} if value != 0 else {}
+    if kind == "var":
+        return {1: Fraction(1)} if node[1] == variable else None
+    if kind == "neg":
+        operand = to_polynomial(node[1], variable)
+        return None if operand is None else {power: -c for power, c in operand.items()}
+    if kind == "bin":
+        op = node[1]
+        left = to_polynomial(node[2], variable)
+        right = to_polynomial(node[3], variable)
+        if left is None or right is None:
+            return None
+        if op == "+":
+            return _add(left, right)
+        if op == "-":
+            return _add(left, right, -1)
+        if op == "*":
+            return _multiply(left, right)
+        if op == "/":
+            if set(right) != {0}:
+                return None
+            return {power: c / right[0] for power, c in left.items()}
+        if op == "^":
+            if set(right) - {0}:
+                return None
+            exponent = right.get(0, Fraction(0))
+            if exponent.denominator != 1 or not 0 <= exponent <= MAX_DEGREE:
+                return None
+            result: Optional[Polynomial] = {0: Fraction(1)}
+            for _ in range(int(exponent)):
+                result = _multiply(result, left)
+                if result is None:
+                    return None
+            return result
+    return None
+
+
+def format_number(value: Fraction) -> str:
+    return str(value.numerator) if value.denominator == 1 else f"{value.numerator}/{value.denominator}"
+
+
+def _parenthesize(value: Fraction) -> str:
+    return f"({format_number(value)})" if value < 0 else format_number(value)
+
+
+def format_polynomial(poly: Polynomial, variable: str) -> str:
+    """Format a polynomial in descending powers, e.g. 3x^2 - x + 1/2."""
+    if not poly:
+        return "0"
+    parts = []
+    for power in sorted(poly, reverse=True):
+        coefficient = poly[power]
+        sign = "-" if coefficient < 0 else "+"
+        magnitude = abs(coefficient)
+        if power == 0:
+            body = format_number(magnitude)
+        else:
+            term = variable if power == 1 else f"{variable}^{power}"
+            if magnitude == 1:
+                body = term
+            elif magnitude.denominator == 1:
+                body = f"{format_number(magnitude)}{term}"
+            else:
+                body = f"({format_number(magnitude)}){term}"
+        parts.append((sign, body))
+
+    first_sign, first_body = parts[0]
+    text = ("-" if first_sign == "-" else "") + first_body
+    for sign, body in parts[1:]:
+        text += f" {sign} {body}"
+    return text
+
+
+def _evaluate_polynomial(poly: Polynomial, value: Fraction) -> Fraction:
+    return sum((c * value ** power for power, c in poly.items()), Fraction(0))
+
+
+def _exact_sqrt(value: Fraction) -> Optional[Fraction]:
+    if value < 0:
+        return None
+    numerator, denominator = math.isqrt(value.numerator), math.isqrt(value.denominator)
+    if numerator * numerator == value.numerator and denominator * denominator == value.denominator:
+        return Fraction(numerator, denominator)
+    return None
+
+
+def _split_square(n: int) -> Tuple[int, int]:
+    """Write a positive integer as k²·r with r as small as trial division finds, returning (k, r)."""
+    k, factor = 1, 2
+    while factor <= 1000 and factor * factor <= n:
+        while n % (factor * factor) == 0:
+            n //= factor * factor
+            k *= factor
+        factor += 1
+    return k, n
+
+
+def format_quadratic_roots(center: Fraction, spread_squared: Fraction, imaginary: bool) -> str:
+    """Format center ± √spread_squared (times i if imaginary) in simplest radical form.
+
+    E.g. 1 ± √2, ±i, (-3 ± √17) / 4 or -1/2 ± i.
+    """
+    # √(p/q) = √(p·q) / q, then pull square factors out of the radicand
+    root_coefficient, radicand = _split_square(spread_squared.numerator * spread_squared.denominator)
+    spread = Fraction(root_coefficient, spread_squared.denominator)
+    denominator = center.denominator * spread.denominator // math.gcd(center.denominator, spread.denominator)
+    offset, multiple = center * denominator, spread * denominator  # both whole numbers now
+    term = ("" if multiple == 1 else format_number(multiple)) + ("i" if imaginary else "") \
+        + ("" if radicand == 1 else f"√{radicand}")
+    term = term or "1"
+    if denominator == 1:
+        return f"±{term}" if offset == 0 else f"{format_number(offset)} ± {term}"
+    if offset == 0:
+        return f"±{term}/{denominator}"
+    if radicand == 1:
+        # No radical: -1/2 ± (3/2)i reads better than (-1 ± 3i) / 2
+        spread_text = format_number(spread) if spread.denominator == 1 else f"({format_number(spread)})"
+        if imaginary:
+            spread_text = "i" if spread == 1 else f"{spread_text}i"
+        return f"{format_number(center)} ± {spread_text}"
+    return f"({format_number(offset)} ± {term}) / {denominator}"
+
+
+class MathSolver:
+    """Answers common math queries exactly, without the LLM.
+
+    Handles linear and quadratic equations in one variable, polynomial
+    derivatives and (definite) integrals, and plain arithmetic. Every
+    result is computed with exact fractions or the calculator tool.
+    """
+
+    def __init__(self, calculator: Optional[Calculator] = None):
+        self.calculator = calculator or Calculator()
+
+    def _normalize(self, query: str) -> str:
+        text = THOUSANDS_SEPARATOR.sub("", query.replace("**", "^"))
+        for pattern, replacement in WORD_OPERATORS:
+            text = pattern.sub(replacement, text)
+        return text
+
+    @staticmethod
+    def _is_bare(query: str, span: Tuple[int, int], variable: Optional[str] = None) -> bool:
+        """True if everything outside the matched span is filler or the variable solved for."""
+        rest = query[:span[0]] + " " + query[span[1]:]
+        words = re.findall(r"[A-Za-z']+", rest.lower())
+        return all(word in FILLER_WORDS or word == variable for word in words)
+
+    @staticmethod
+    def _parse_polynomial(text: str) -> Optional[Tuple[Polynomial, str]]:
+        try:
+            expression = compile_expression(text.strip())
+        except ExpressionError:
+            return None
+        if len(expression.variables) > 1:
+            return None
+        variable = next(iter(expression.variables), "x")
+        poly = to_polynomial(expression.ast, variable)
+        return None if poly is None else (poly, variable)
+
+    def solve(self, query: str) -> Optional[Solution]:
+        """Return a deterministic solution for the query, or None if it can't be solved here."""
+        text = self._normalize(query)
+        for method in (self._solve_equation, self._differentiate, self._integrate, self._arithmetic):
+            try:
+                solution = method(text)
+            except (ExpressionError, ValueError, ZeroDivisionError, OverflowError):
+                solution = None
+            if solution is not None:
+                return solution
+        return None
+
+    def _solve_equation(self, text: str) -> Optional[Solution]:
+        match = EQUATION_PATTERN.search(text)
+        if not match or "=" in match.group("rhs"):
+            return None
+        lhs_text, rhs_text = match.group("lhs").strip(), match.group("rhs").strip()
+        try:
+            lhs, rhs = compile_expression(lhs_text), compile_expression(rhs_text)
+        except ExpressionError:
+            return None
+        variables = lhs.variables | rhs.variables
+        if len(variables) != 1:
+            return None
+        if lhs.ast[0] == "var" and not rhs.variables:
+            # "x = 4" assigns a value rather than posing an equation
+            return None
+        variable = next(iter(variables))
+        left, right = to_polynomial(lhs.ast, variable), to_polynomial(rhs.ast, variable)
+        if left is None or right is None:
+            return None
+
+        poly = _add(left, right, -1)
+        degree = max(poly, default=0)
+        confident = self._is_bare(text, match.span(), variable)
+        standard = f"{format_polynomial(poly, variable)} = 0"
+        steps = [f"Move every term to one side: {standard}"]
+
+        if degree == 0:
+            if poly:
+                return Solution("equation", "No solution (the equation is never true)", steps, confident)
+            return Solution("equation", f"Every value of {variable} is a solution", steps, confident)
+
+        if degree == 1:
+            a, b = poly.get(1, Fraction(0)), poly.get(0, Fraction(0))
+            root = -b / a
+            steps.append(f"Isolate the {variable} term: {format_polynomial({1: a}, variable)} = {format_number(-b)}")
+            if a != 1:
+                steps.append(f"Divide both sides by {format_number(a)}: {variable} = {format_number(root)}")
+            steps.append(self._check(lhs_text, rhs_text, variable, root))
+            return Solution("equation", f"{variable} = {format_number(root)}", steps, confident)
+
+        if degree == 2:
+            a, b, c = (poly.get(power, Fraction(0)) for power in (2, 1, 0))
+            discriminant = b * b - 4 * a * c
+            steps.append(f"Identify coefficients: a = {format_number(a)}, b = {format_number(b)}, c = {format_number(c)}")
+            steps.append(
+                f"Discriminant: b² - 4ac = {format_number(b * b)} - {_parenthesize(4 * a * c)} = {format_number(discriminant)}"
+            )
+            steps.append(f"Quadratic formula: {variable} = (-b ± √(b² - 4ac)) / 2a")
+            root_of_discriminant = _exact_sqrt(discriminant)
+            center, spread_squared = -b / (2 * a), abs(discriminant) / (4 * a * a)
+            if discriminant < 0:
+                answer = f"{variable} = {format_quadratic_roots(center, spread_squared, True)} (no real solutions)"
+                return Solution("equation", answer, steps, confident)
+            if root_of_discriminant is not None:
+                roots = sorted({(-b - root_of_discriminant) / (2 * a), (-b + root_of_discriminant) / (2 * a)})
+                for root in roots:
+                    steps.append(self._check(lhs_text, rhs_text, variable, root))
+                answer = " or ".join(f"{variable} = {format_number(root)}" for root in roots)
+                return Solution("equation", answer, steps, confident)
+            sqrt_discriminant = math.sqrt(discriminant)
+            roots = sorted((float(-b) + sign * sqrt_discriminant) / float(2 * a) for sign in (-1, 1))
+            exact = format_quadratic_roots(center, spread_squared, False)
+            answer = f"{variable} = {exact}, so " + " or ".join(f"{variable} ≈ {root:.6g}" for root in roots)
+            return Solution("equation", answer, steps, confident)
+
+        return None
+
+    def _check(self, lhs_text: str, rhs_text: str, variable: str, root: Fraction) -> str:
+        """Substitute a root back into the original equation with the calculator."""
+        value = float(root)
+        # Adding 0.0 turns -0.0 into 0.0 for display
+        left = compile_expression(lhs_text).evaluate({variable: value}) + 0.0
+        right = compile_expression(rhs_text).evaluate({variable: value}) + 0.0
+        mark = "✓" if math.isclose(left, right, rel_tol=1e-9, abs_tol=1e-9) else "✗"
+        return f"Check {variable} = {format_number(root)}: left side = {left:g}, right side = {right:g} {mark}"
+
+    def _differentiate(self, text: str) -> Optional[Solution]:
+        match = DERIVATIVE_PATTERN.search(text)
+        if not match:
+            return None
+        parsed = self._parse_polynomial(match.group("expr"))
+        if parsed is None:
+            return None
+        poly, variable = parsed
+
+        derivative = {power - 1: c * power for power, c in poly.items() if power > 0}
+        steps = [f"Write the function as a sum of terms: f({variable}) = {format_polynomial(poly, variable)}",
+                 f"Apply the power rule d/d{variable}(a{variable}^n) = n·a{variable}^(n-1) to each term"]
+        for power in sorted(poly, reverse=True):
+            term = format_polynomial({power: poly[power]}, variable)
+            result = format_polynomial({power - 1: poly[power] * power} if power > 0 else {}, variable)
+            steps.append(f"d/d{variable}({term}) = {result}")
+        answer = f"f'({variable}) = {format_polynomial(derivative, variable)}"
+        return Solution("derivative", answer, steps, self._is_bare(text, match.span(), variable))
+
+    def _integrate(self, text: str) -> Optional[Solution]:
+        match = INTEGRAL_PATTERN.search(text)
+        if not match or not match.group("expr").strip():
+            return None
+        parsed = self._parse_polynomial(match.group("expr"))
+        if parsed is None:
+            return None
+        poly, variable = parsed
+
+        antiderivative = {power + 1: c / (power + 1) for power, c in poly.items()}
+        steps = [f"Write the integrand as a sum of terms: {format_polynomial(poly, variable)}",
+                 f"Apply the power rule ∫a{variable}^n d{variable} = a{variable}^(n+1)/(n+1) to each term"]
+        for power in sorted(poly, reverse=True):
+            term = format_polynomial({power: poly[power]}, variable)
+            steps.append(f"∫{term} d{variable} = {format_polynomial({power + 1: poly[power] / (power + 1)}, variable)}")
+        confident = self._is_bare(text, match.span(), variable)
+
+        if match.group("lower") is None:
+            answer = f"∫({format_polynomial(poly, variable)}) d{variable} = {format_polynomial(antiderivative, variable)} + C"
+            return Solution("integral", answer, steps, confident)
+
+        lower, upper = Fraction(match.group("lower")), Fraction(match.group("upper"))
+        upper_value = _evaluate_polynomial(antiderivative, upper)
+        lower_value = _evaluate_polynomial(antiderivative, lower)
+        steps.append(f"Antiderivative: F({variable}) = {format_polynomial(antiderivative, variable)}")
+        steps.append(
+            f"Evaluate F({format_number(upper)}) - F({format_number(lower)}) = "
+            f"{format_number(upper_value)} - {_parenthesize(lower_value)}"
+        )
+        value = upper_value - lower_value
+        answer = f"{format_number(value)}" + ("" if value.denominator == 1 else f" ≈ {float(value):.6g}")
+        return Solution("integral", answer, steps, confident)
+
+    def _arithmetic(self, text: str) -> Optional[Solution]:
+        # An equation or variable the other methods couldn't handle isn't plain arithmetic
+        if "=" in text:
+            return None
+        candidates = [
+            match for match in ARITHMETIC_PATTERN.finditer(text)
+            if re.search(r"[+\-*/^²³√×÷·−!]", match.group().strip().lstrip("-"))
+            and not match.group().strip().startswith(tuple(LEADING_OPERATORS))
+            and not match.group().strip().endswith(tuple(TRAILING_OPERATORS))
+        ]
+        if len(candidates) != 1:
+            return None
+        match = candidates[0]
+        if VARIABLE_PATTERN.search(text[:match.start()] + " " + text[match.end():]):
+            return None
+        expression = match.group().strip()
+        result = self.calculator.evaluate_expression(expression)
+        if isinstance(result, float) and result.is_integer() and abs(result) < 1e15:
+            result = int(result)
+        formatted = f"{result:.10g}" if isinstance(result, float) else format_result(result)
+        steps = [f"Evaluate {expression} with the calculator, following the order of operations"]
+        return Solution("arithmetic", f"{expression} = {formatted}", steps, self._is_bare(text, match.span()))
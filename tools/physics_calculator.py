@@ -0,0 +1,401 @@
+import math
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from tools.physics_constants import ConstantsStore, get_constants_store
+from tools.units import Dimension, UnitError, parse_unit
+
+
+class Quantity(NamedTuple):
+    """A value in SI units with its dimension, so formulas check their own units."""
+    value: float
+    dimension: Dimension
+
+    def __mul__(self, other):
+        if isinstance(other, Quantity):
+            return Quantity(self.value * other.value, tuple(a + b for a, b in zip(self.dimension, other.dimension)))
+        return Quantity(self.value * other, self.dimension)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Quantity):
+            return Quantity(self.value / other.value, tuple(a - b for a, b in zip(self.dimension, other.dimension)))
+        return Quantity(self.value / other, self.dimension)
+
+    def __add__(self, other: "Quantity") -> "Quantity":
+        if self.dimension != other.dimension:
+            raise UnitError("Can't add quantities with different dimensions")
+        return Quantity(self.value + other.value, self.dimension)
+
+    def __pow__(self, exponent: float) -> "Quantity":
+        return Quantity(self.value ** exponent, tuple(d * exponent for d in self.dimension))
+
+
+# The physical role of a quantity follows from its dimension
+ROLES: Dict[str, Tuple[str, str]] = {
+    # role: (SI unit used for display, unit string giving its dimension)
+    "mass": ("kg", "kg"),
+    "distance": ("m", "m"),
+    "time": ("s", "s"),
+    "velocity": ("m/s", "m/s"),
+    "acceleration": ("m/s²", "m/s^2"),
+    "force": ("N", "N"),
+    "energy": ("J", "J"),
+    "power": ("W", "W"),
+    "momentum": ("kg·m/s", "kg*m/s"),
+    "voltage": ("V", "V"),
+    "current": ("A", "A"),
+    "resistance": ("Ω", "ohm"),
+}
+ROLE_BY_DIMENSION: Dict[Dimension, str] = {parse_unit(unit).dimension: role for role, (_, unit) in ROLES.items()}
+
+# Unit words converted to symbols when they follow a number
+UNIT_WORDS = {
+    "meters per second squared": "m/s^2", "metres per second squared": "m/s^2",
+    "meters per second": "m/s", "metres per second": "m/s",
+    "kilometers per hour": "km/h", "kilometres per hour": "km/h",
+    "kilogram": "kg", "gram": "g", "kilometer": "km", "kilometre": "km", "centimeter": "cm",
+    "centimetre": "cm", "meter": "m", "metre": "m", "second": "s", "minute": "min", "hour": "h",
+    "newton": "N", "kilojoule": "kJ", "joule": "J", "kilowatt": "kW", "watt": "W", "volt": "V",
+    "ohm": "Ω", "milliamp": "mA", "ampere": "A", "amp": "A", "coulomb": "C",
+    "electron volt": "eV", "electronvolt": "eV",
+}
+UNIT_WORD_PATTERN = re.compile(
+    r"(?<=\d)\s*\b(" + "|".join(re.escape(word) for word in sorted(UNIT_WORDS, key=len, reverse=True)) + r")s?\b",
+    re.IGNORECASE,
+)
+
+_UNIT_FACTOR = r"[A-Za-zµμΩ]+(?:\^-?\d+|[⁻¹²³]+)?"
+QUANTITY_PATTERN = re.compile(
+    r"(?<![\w.])(?P<number>[-+−]?\d+(?:\.\d+)?(?:[eE][-+−]?\d+|\s*[×x*]\s*10\s*\^\s*[-+−]?\d+)?)"
+    rf"\s*(?P<unit>{_UNIT_FACTOR}(?:\s*[/·⋅*]\s*{_UNIT_FACTOR})*)"
+)
+
+# Phrases naming the quantity a question asks for, and its role
+TARGET_PHRASES = {
+    "kinetic energy": "kinetic_energy",
+    "gravitational potential energy": "potential_energy",
+    "potential energy": "potential_energy",
+    "rest energy": "rest_energy",
+    "energy equivalent": "rest_energy",
+    "equivalent energy": "rest_energy",
+    "mass-energy": "rest_energy",
+    "mass energy": "rest_energy",
+    "momentum": "momentum",
+    "weight": "weight",
+    "net force": "force",
+    "force": "force",
+    "acceleration": "acceleration",
+    "how fast": "velocity",
+    "final velocity": "velocity",
+    "final speed": "velocity",
+    "velocity": "velocity",
+    "speed": "velocity",
+    "how far": "distance",
+    "distance": "distance",
+    "displacement": "distance",
+    "how long": "time",
+    "time": "time",
+    "potential difference": "voltage",
+    "voltage": "voltage",
+    "current": "current",
+    "resistance": "resistance",
+    "power": "power",
+    "mass": "mass",
+}
+TARGET_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(phrase) for phrase in sorted(TARGET_PHRASES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+# Targets that are a kind of another role, for checking the result's units
+TARGET_ROLES = {
+    "kinetic_energy": "energy", "potential_energy": "energy", "rest_energy": "energy", "weight": "force",
+}
+TARGET_SYMBOLS = {
+    "kinetic_energy": "KE", "potential_energy": "PE", "rest_energy": "E", "weight": "W", "force": "F",
+    "acceleration": "a", "velocity": "v", "distance": "d", "time": "t", "voltage": "V", "current": "I",
+    "resistance": "R", "power": "P", "mass": "m", "momentum": "p", "energy": "E",
+}
+
+# Questions asking for more than a number still go to the LLM, with the result attached
+EXPLANATION_CUES = re.compile(
+    r"\b(why|explain|describe|derive|derivation|compare|concept|intuition|prove|what happens|how does|how do)\b",
+    re.IGNORECASE,
+)
+
+
+# Words that may surround a plug-in question without changing it. If a query
+# has any other word ("on the Moon", "two masses"), the result is passed to
+# the LLM as a verified result instead of being returned on its own.
+FILLER_WORDS = {
+    "a", "an", "the", "of", "is", "are", "was", "what", "whats", "what's", "how", "much", "find", "calculate",
+    "compute", "determine", "work", "out", "please", "value", "its", "it", "if", "when", "after", "with",
+    "at", "from", "to", "for", "in", "on", "by", "through", "across", "and", "then", "does", "do", "will",
+    "be", "has", "have", "needed", "required", "need", "get", "can", "you", "me", "tell", "give", "new",
+    "ball", "car", "cart", "block", "object", "stone", "rock", "box", "book", "train", "bike", "bicycle",
+    "person", "particle", "bullet", "truck", "shelf", "battery", "resistor", "wire", "bulb", "lamp",
+    "circuit", "heater", "motor", "device",
+    "moving", "move", "moves", "travel", "travelling", "traveling", "travels", "going", "accelerate", "accelerates",
+    "accelerated", "accelerating", "starts", "started", "starting", "rest", "constant", "uniform",
+    "uniformly", "average", "initial", "final", "dropped", "drop", "falls", "fall", "falling", "fell", "free",
+    "lifted", "raised", "high", "height", "above", "ground", "hit", "hits", "reach", "reaches", "take",
+    "takes", "push", "pushed", "pull", "pulled", "applied", "acting", "acts", "drives", "flows", "flowing",
+    "connected", "energy", "equivalent", "according", "mc", "long", "far", "fast",
+    "e", "m", "v", "u", "a", "f", "p", "i", "r", "t", "d", "h", "g", "c",
+}
+
+# Formulas that only apply to a falling object
+FREE_FALL = re.compile(r"\b(dropp(?:ed|ing)|falls?|falling|fell|free[- ]fall)\b", re.IGNORECASE)
+
+
+class Formula(NamedTuple):
+    target: str
+    name: str
+    equation: str
+    inputs: Tuple[str, ...]
+    compute: Callable[..., Quantity]
+    substitution: str  # str.format template over the input values
+    cue: Optional[re.Pattern] = None  # the query must match this for the formula to apply
+
+
+def _formulas(g: Quantity, c: Quantity) -> List[Formula]:
+    return [
+        Formula("force", "Newton's second law", "F = m·a", ("mass", "acceleration"),
+                lambda m, a: m * a, "{mass} × {acceleration}"),
+        Formula("acceleration", "Newton's second law", "a = F/m", ("force", "mass"),
+                lambda F, m: F / m, "{force} / {mass}"),
+        Formula("mass", "Newton's second law", "m = F/a", ("force", "acceleration"),
+                lambda F, a: F / a, "{force} / {acceleration}"),
+        Formula("kinetic_energy", "kinetic energy", "KE = ½·m·v²", ("mass", "velocity"),
+                lambda m, v: 0.5 * m * v ** 2, "½ × {mass} × ({velocity})²"),
+        Formula("potential_energy", "gravitational potential energy", "PE = m·g·h", ("mass", "distance"),
+                lambda m, h: m * g * h, "{mass} × " + f"{_format_value(g.value)} m/s²" + " × {distance}"),
+        Formula("weight", "weight", "W = m·g", ("mass",),
+                lambda m: m * g, "{mass} × " + f"{_format_value(g.value)} m/s²"),
+        Formula("momentum", "momentum", "p = m·v", ("mass", "velocity"),
+                lambda m, v: m * v, "{mass} × {velocity}"),
+        Formula("rest_energy", "mass-energy equivalence", "E = m·c²", ("mass",),
+                lambda m: m * c ** 2, "{mass} × " + f"({_format_value(c.value)} m/s)²"),
+        Formula("voltage", "Ohm's law", "V = I·R", ("current", "resistance"),
+                lambda I, R: I * R, "{current} × {resistance}"),
+        Formula("current", "Ohm's law", "I = V/R", ("voltage", "resistance"),
+                lambda V, R: V / R, "{voltage} / {resistance}"),
+        Formula("resistance", "Ohm's law", "R = V/I", ("voltage", "current"),
+                lambda V, I: V / I, "{voltage} / {current}"),
+        Formula("power", "electrical power", "P = V·I", ("voltage", "current"),
+                lambda V, I: V * I, "{voltage} × {current}"),
+        Formula("power", "electrical power", "P = I²·R", ("current", "resistance"),
+                lambda I, R: I ** 2 * R, "({current})² × {resistance}"),
+        Formula("power", "electrical power", "P = V²/R", ("voltage", "resistance"),
+                lambda V, R: V ** 2 / R, "({voltage})² / {resistance}"),
+        Formula("power", "power", "P = E/t", ("energy", "time"),
+                lambda E, t: E / t, "{energy} / {time}"),
+        Formula("velocity", "average speed", "v = d/t", ("distance", "time"),
+                lambda d, t: d / t, "{distance} / {time}"),
+        Formula("velocity", "uniform acceleration from rest", "v = a·t", ("acceleration", "time"),
+                lambda a, t: a * t, "{acceleration} × {time}"),
+        Formula("velocity", "uniform acceleration", "v = u + a·t", ("velocity", "acceleration", "time"),
+                lambda u, a, t: u + a * t, "{velocity} + {acceleration} × {time}"),
+        Formula("velocity", "free fall", "v = √(2·g·h)", ("distance",),
+                lambda h: (2 * g * h) ** 0.5, "√(2 × " + f"{_format_value(g.value)} m/s²" + " × {distance})",
+                FREE_FALL),
+        Formula("velocity", "free fall", "v = g·t", ("time",),
+                lambda t: g * t, f"{_format_value(g.value)} m/s²" + " × {time}", FREE_FALL),
+        Formula("distance", "uniform acceleration", "d = v·t + ½·a·t²", ("velocity", "acceleration", "time"),
+                lambda v, a, t: v * t + 0.5 * a * t ** 2, "{velocity} × {time} + ½ × {acceleration} × ({time})²"),
+        Formula("distance", "uniform acceleration from rest", "d = ½·a·t²", ("acceleration", "time"),
+                lambda a, t: 0.5 * a * t ** 2, "½ × {acceleration} × ({time})²"),
+        Formula("distance", "constant speed", "d = v·t", ("velocity", "time"),
+                lambda v, t: v * t, "{velocity} × {time}"),
+        Formula("time", "constant speed", "t = d/v", ("distance", "velocity"),
+                lambda d, v: d / v, "{distance} / {velocity}"),
+        Formula("time", "free fall", "t = √(2·h/g)", ("distance",),
+                lambda h: (2 * h / g) ** 0.5, "√(2 × {distance} / " + f"{_format_value(g.value)} m/s²)",
+                FREE_FALL),
+        Formula("distance", "free fall", "d = ½·g·t²", ("time",),
+                lambda t: 0.5 * g * t ** 2, f"½ × {_format_value(g.value)} m/s²" + " × ({time})²", FREE_FALL),
+        Formula("acceleration", "uniform acceleration from rest", "a = v/t", ("velocity", "time"),
+                lambda v, t: v / t, "{velocity} / {time}"),
+    ]
+
+
+class GivenQuantity(NamedTuple):
+    text: str  # as written in the query, e.g. "36 km/h"
+    role: str
+    quantity: Quantity
+    unit: str
+    span: Tuple[int, int]  # in the query with unit words written as symbols
+
+
+class PhysicsCalculation(NamedTuple):
+    """A formula evaluated on quantities from the query."""
+    formula: Formula
+    given: Dict[str, GivenQuantity]
+    result: Quantity
+    confident: bool
+
+    @property
+    def symbol(self) -> str:
+        return TARGET_SYMBOLS.get(self.formula.target, self.formula.target)
+
+    @property
+    def answer(self) -> str:
+        role = TARGET_ROLES.get(self.formula.target, self.formula.target)
+        return f"{self.symbol} = {_format_value(self.result.value)} {ROLES[role][0]}"
+
+    @property
+    def substitution(self) -> str:
+        """The formula with the given values (in SI units) plugged in."""
+        values = {role: f"{_format_value(given.quantity.value)} {ROLES[role][0]}" for role, given in self.given.items()}
+        return f"{self.symbol} = {self.formula.substitution.format(**values)}"
+
+    @property
+    def worked(self) -> str:
+        """One-line form, e.g. "KE = ½ × 2 kg × (3 m/s)² = 9 J"."""
+        return f"{self.substitution} = {self.answer.split(' = ', 1)[1]}"
+
+    def format(self) -> str:
+        """Render the calculation as a worked solution."""
+        lines = ["**Given:**"]
+        conversions = []
+        for given in self.given.values():
+            lines.append(f"• {TARGET_SYMBOLS[given.role]} = {given.text}")
+            si_text = f"{_format_value(given.quantity.value)} {ROLES[given.role][0]}"
+            if given.unit != ROLES[given.role][0] and given.unit != ROLES[given.role][1]:
+                conversions.append(f"• {given.text} = {si_text}")
+        if conversions:
+            lines.append("")
+            lines.append("**Convert to SI units:**")
+            lines.extend(conversions)
+        lines.append("")
+        lines.append(f"**Formula ({self.formula.name}):** {self.formula.equation}")
+        lines.append(f"**Substitute:** {self.substitution}")
+        lines.append(f"**Answer:** {self.answer}")
+        return "\n".join(lines)
+
+
+def _format_value(value: float) -> str:
+    if value != 0 and not 1e-3 <= abs(value) < 1e6:
+        return f"{value:.4e}"
+    return f"{value:.6g}"
+
+
+def _parse_number(text: str) -> float:
+    text = re.sub(r"\s+", "", text).replace("−", "-").replace("×", "x").replace("*", "x")
+    mantissa, _, exponent = text.partition("x10^")
+    return float(mantissa) * 10 ** int(exponent) if exponent else float(mantissa)
+
+
+def _with_unit_symbols(query: str) -> str:
+    return UNIT_WORD_PATTERN.sub(lambda match: " " + UNIT_WORDS[match.group(1).lower()], query)
+
+
+def _is_bare(text: str, spans: List[Tuple[int, int]]) -> bool:
+    """True if every word of a query, outside its quantities and target phrases, is filler."""
+    rest, position = "", 0
+    for start, end in sorted(spans):
+        rest += text[position:start] + " "
+        position = end
+    rest = TARGET_PATTERN.sub(" ", rest + text[position:])
+    if re.search(r"\d", rest):
+        # A number the parser didn't read ("3 times", "x2") may change the answer
+        return False
+    return all(word in FILLER_WORDS for word in re.findall(r"[A-Za-z']+", rest.lower()))
+
+
+class PhysicsCalculator:
+    """Solves plug-in-the-numbers physics questions without the LLM.
+
+    Quantities with units are read from the query and converted to SI with
+    the unit tables in tools.units. Each quantity's dimension decides its
+    role (mass, velocity, ...). The question's target picks a formula, and
+    the result's dimension is checked before it is reported.
+    """
+
+    def __init__(self, store: Optional[ConstantsStore] = None):
+        store = store if store is not None else get_constants_store()
+        self._store = store
+        self._formulas: Optional[List[Formula]] = None
+
+    @property
+    def formulas(self) -> List[Formula]:
+        # Built on first use so the constants file is only read when needed
+        if self._formulas is None:
+            g, c = (self._store.get(name) for name in ("standard_gravity", "speed_of_light"))
+            self._formulas = _formulas(
+                Quantity(g.value, parse_unit(g.unit).dimension), Quantity(c.value, parse_unit(c.unit).dimension)
+            )
+        return self._formulas
+
+    @staticmethod
+    def extract_quantities(query: str) -> List[GivenQuantity]:
+        """Find every number-with-unit in the query whose unit has a known role."""
+        text = _with_unit_symbols(query)
+        quantities = []
+        for match in QUANTITY_PATTERN.finditer(text):
+            unit_text = match.group("unit")
+            # Try the whole unit, then drop trailing factors ("m/s for" -> "m/s")
+            factors = re.split(r"(\s*[/·⋅*]\s*)", unit_text)
+            for end in range(len(factors), 0, -2):
+                candidate = "".join(factors[:end])
+                try:
+                    unit = parse_unit(candidate)
+                except UnitError:
+                    continue
+                role = ROLE_BY_DIMENSION.get(unit.dimension)
+                if role is not None:
+                    number = _parse_number(match.group("number"))
+                    quantities.append(GivenQuantity(
+                        f"{match.group('number')} {candidate}", role,
+                        Quantity(number * unit.scale, unit.dimension), candidate,
+                        (match.start(), match.start("unit") + len(candidate)),
+                    ))
+                break
+        return quantities
+
+    @staticmethod
+    def find_targets(query: str) -> List[str]:
+        """Return the quantities the query names, in order of appearance."""
+        targets = []
+        for match in TARGET_PATTERN.finditer(query):
+            target = TARGET_PHRASES[match.group(1).lower()]
+            if target not in targets:
+                targets.append(target)
+        return targets
+
+    def calculate(self, query: str) -> Optional[PhysicsCalculation]:
+        """Evaluate the formula the query asks for, or return None if it isn't a plug-in question."""
+        given_list = self.extract_quantities(query)
+        if not given_list:
+            return None
+
+        by_role: Dict[str, List[GivenQuantity]] = {}
+        for given in given_list:
+            by_role.setdefault(given.role, []).append(given)
+
+        for target in self.find_targets(query):
+            # A target that is given ("a mass of 2 kg") is only asked for if a
+            # formula updates it from its given value ("starts at 2 m/s ... how fast")
+            candidates = [
+                formula for formula in self.formulas
+                if formula.target == target and all(len(by_role.get(role, [])) == 1 for role in formula.inputs)
+                and (target not in by_role or target in formula.inputs)
+                and (formula.cue is None or formula.cue.search(query))
+            ]
+            if not candidates:
+                continue
+            # Prefer the formula that uses the most of what the question gives
+            formula = max(candidates, key=lambda f: len(f.inputs))
+            given = {role: by_role[role][0] for role in formula.inputs}
+            try:
+                result = formula.compute(*(given[role].quantity for role in formula.inputs))
+            except (ZeroDivisionError, OverflowError, UnitError):
+                return None
+            expected = parse_unit(ROLES[TARGET_ROLES.get(target, target)][1]).dimension
+            if result.dimension != expected or not math.isfinite(result.value):
+                return None
+
+            confident = (not EXPLANATION_CUES.search(query) and len(given) == len(given_list)
+                         and _is_bare(_with_unit_symbols(query), [given.span for given in given_list]))
+            return PhysicsCalculation(formula, given, result, confident)
+        return None
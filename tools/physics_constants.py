@@ -1,49 +1,322 @@
-from typing import Dict, Any, Optional
-from config import PHYSICS_CONSTANTS
+import bisect
+import difflib
+import logging
+import re
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Union
+from config import PHYSICS_CONSTANTS, PHYSICS_CONSTANTS_PATH
+from tools.units import Dimension, UnitError, format_dimension, parse_unit
+
+# Abbreviations used in CODATA quantity names, expanded into extra aliases
+CODATA_ABBREVIATIONS = {
+    "mag.": "magnetic",
+    "mom.": "moment",
+    "gyromag.": "gyromagnetic",
+}
+
+FUZZY_CUTOFF = 0.85
+# Shorter words aren't spell-corrected in free text: "what" is too close to "watt"
+FUZZY_MIN_WORD_LENGTH = 5
+MAX_CACHED_CORRECTIONS = 10000
+
+
+def normalize_alias(text: str) -> str:
+    """Lowercase and collapse punctuation, so "Stefan-Boltzmann" matches "stefan boltzmann"."""
+    return " ".join(re.findall(r"[a-z0-9'ħ]+", text.lower().replace("'s ", " ")))
+
+
+def _key_for(name: str) -> str:
+    return "_".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+def _parse_number(text: str) -> Union[int, float]:
+    value = float(text.replace(" ", "").replace("...", ""))
+    # Keep exact integers such as c = 299792458 as ints for display
+    return int(value) if value.is_integer() and abs(value) < 1e15 else value
+
+
+class PhysicalConstant:
+    """One row of the constants table."""
+
+    __slots__ = ("key", "name", "value", "uncertainty", "unit", "symbol", "dimension")
+
+    def __init__(self, key: str, name: str, value: float, uncertainty: float, unit: str,
+                 symbol: str, dimension: Optional[Dimension]):
+        self.key = key
+        self.name = name
+        self.value = value
+        self.uncertainty = uncertainty
+        self.unit = unit
+        self.symbol = symbol
+        self.dimension = dimension
+
+    @property
+    def exact(self) -> bool:
+        return self.uncertainty == 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "value": self.value,
+            "uncertainty": self.uncertainty,
+            "unit": self.unit,
+            "symbol": self.symbol,
+            "dimension": format_dimension(self.dimension) if self.dimension is not None else None,
+        }
+
+
+class ConstantsStore:
+    """The CODATA constants table with lookups by name, alias, symbol and dimension.
+
+    The bundled file is parsed on first use, not at import, and all indexes
+    are built in that one pass so every later lookup is a dict access.
+    Names that miss every index fall back to fuzzy matching over aliases,
+    and misspelled words in free text are corrected against the words
+    that aliases use.
+    """
+
+    def __init__(self, path: str = PHYSICS_CONSTANTS_PATH,
+                 curated: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.curated = PHYSICS_CONSTANTS if curated is None else curated
+        self._lock = threading.Lock()
+        self._records: Optional[List[PhysicalConstant]] = None
+        self._by_key: Dict[str, PhysicalConstant] = {}
+        self._by_alias: Dict[str, PhysicalConstant] = {}
+        self._by_symbol: Dict[str, List[PhysicalConstant]] = {}
+        self._by_dimension: Dict[Dimension, List[PhysicalConstant]] = {}
+        self._max_alias_words = 1
+        self._first_words: set = set()
+        self._position: Dict[str, int] = {}
+        # Sorted words used in aliases, and the constants each word appears in
+        self._vocabulary: List[str] = []
+        self._by_word: Dict[str, List[PhysicalConstant]] = {}
+        self._corrections: Dict[str, str] = {}
+
+    def _ensure_loaded(self) -> List[PhysicalConstant]:
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    self._load()
+        return self._records
+
+    @staticmethod
+    def display_name(name: str) -> str:
+        """Spell out the abbreviations in a CODATA name ("muon mag. mom." -> "muon magnetic moment")."""
+        for abbreviation, word in CODATA_ABBREVIATIONS.items():
+            name = name.replace(abbreviation, word)
+        return name
+
+    def _load(self) -> None:
+        curated_by_name = {entry["codata"]: (key, entry) for key, entry in self.curated.items()}
+        records = []
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                name = line[:60].rstrip()
+                value_text, uncertainty_text, unit = line[60:85], line[85:110], line[110:].strip()
+                try:
+                    value = _parse_number(value_text)
+                    uncertainty = 0.0 if "exact" in uncertainty_text else _parse_number(uncertainty_text)
+                except ValueError:
+                    logging.warning(f"ConstantsStore: Skipping unparseable row {name!r}")
+                    continue
+                try:
+                    dimension = parse_unit(unit).dimension
+                except UnitError:
+                    dimension = None
+
+                key, entry = curated_by_name.get(name, (_key_for(name), {}))
+                record = PhysicalConstant(key, name, value, uncertainty, unit, entry.get("symbol", ""), dimension)
+                records.append(record)
+
+                self._by_key[key] = record
+                aliases = [name, key, *entry.get("aliases", [])]
+                aliases.append(self.display_name(name))
+                for alias in aliases:
+                    # The first row to claim an alias keeps it
+                    self._by_alias.setdefault(normalize_alias(alias), record)
+                if record.symbol:
+                    self._by_symbol.setdefault(record.symbol, []).append(record)
+                if dimension is not None:
+                    self._by_dimension.setdefault(dimension, []).append(record)
+
+        self._max_alias_words = max(len(alias.split()) for alias in self._by_alias)
+        self._first_words = {alias.split()[0] for alias in self._by_alias}
+        self._position = {record.key: index for index, record in enumerate(records)}
+        for alias, record in self._by_alias.items():
+            for word in alias.split():
+                holders = self._by_word.setdefault(word, [])
+                if record not in holders:
+                    holders.append(record)
+        self._vocabulary = sorted(self._by_word)
+        missing = set(curated_by_name) - {record.name for record in records}
+        if missing:
+            logging.warning(f"ConstantsStore: Curated constants not in {self.path}: {sorted(missing)}")
+        logging.info(f"ConstantsStore: Loaded {len(records)} constants from {self.path}")
+        self._records = records
+
+    def get(self, name: str) -> Optional[PhysicalConstant]:
+        """Exact lookup by key ("speed_of_light"), CODATA name or alias, ignoring case."""
+        self._ensure_loaded()
+        return self._by_key.get(name) or self._by_alias.get(normalize_alias(name))
+
+    def find(self, name: str) -> Optional[PhysicalConstant]:
+        """Like get, but falls back to the closest alias for misspellings such as "avagadro"."""
+        record = self.get(name)
+        if record is not None:
+            return record
+        close = difflib.get_close_matches(normalize_alias(name), self._by_alias.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        return self._by_alias[close[0]] if close else None
+
+    def _correct(self, word: str) -> str:
+        """The alias word a misspelled word was meant to be ("avagadro" -> "avogadro"), or the word itself."""
+        if word in self._by_word or len(word) < FUZZY_MIN_WORD_LENGTH:
+            return word
+        corrected = self._corrections.get(word)
+        if corrected is None:
+            close = difflib.get_close_matches(word, self._vocabulary, n=1, cutoff=FUZZY_CUTOFF)
+            corrected = close[0] if close else word
+            if len(self._corrections) >= MAX_CACHED_CORRECTIONS:
+                self._corrections.clear()
+            self._corrections[word] = corrected
+        return corrected
+
+    def mentions(self, text: str) -> List[PhysicalConstant]:
+        """Return the constants named in free text, longest name first at each position.
+
+        Misspelled words are first corrected against the alias vocabulary.
+        Each word position then costs at most one dict lookup per alias
+        length, so the scan doesn't grow with the size of the table.
+        """
+        self._ensure_loaded()
+        words = [self._correct(word) for word in normalize_alias(text).split()]
+        found: List[PhysicalConstant] = []
+        i = 0
+        while i < len(words):
+            if words[i] not in self._first_words:
+                i += 1
+                continue
+            for length in range(min(self._max_alias_words, len(words) - i), 0, -1):
+                record = self._by_alias.get(" ".join(words[i:i + length]))
+                if record is not None:
+                    if record not in found:
+                        found.append(record)
+                    i += length
+                    break
+            else:
+                i += 1
+        return found
+
+    def search(self, keyword: str) -> List[PhysicalConstant]:
+        """Constants with an alias that has, for each word of the keyword, a word starting with it.
+
+        E.g. "neutron mag" finds "neutron magnetic moment". Each keyword word
+        is a binary search in the sorted alias vocabulary; results are in
+        table order.
+        """
+        self._ensure_loaded()
+        matches: Optional[set] = None
+        for word in normalize_alias(keyword).split():
+            found = set()
+            index = bisect.bisect_left(self._vocabulary, word)
+            while index < len(self._vocabulary) and self._vocabulary[index].startswith(word):
+                found.update(record.key for record in self._by_word[self._vocabulary[index]])
+                index += 1
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        return [self._by_key[key] for key in sorted(matches or (), key=self._position.__getitem__)]
+
+    def by_symbol(self, symbol: str) -> List[PhysicalConstant]:
+        """Constants with this exact symbol (case-sensitive: "g" and "G" differ)."""
+        self._ensure_loaded()
+        return list(self._by_symbol.get(symbol, []))
+
+    def by_dimension(self, unit_or_dimension: Union[str, Dimension]) -> List[PhysicalConstant]:
+        """Constants whose unit has the same dimension, e.g. "J" also finds values in eV."""
+        self._ensure_loaded()
+        dimension = parse_unit(unit_or_dimension).dimension if isinstance(unit_or_dimension, str) \
+            else unit_or_dimension
+        return list(self._by_dimension.get(dimension, []))
+
+    def aliases(self) -> Dict[str, str]:
+        """Map every normalized alias to its constant's key."""
+        self._ensure_loaded()
+        return {alias: record.key for alias, record in self._by_alias.items()}
+
+    def __iter__(self) -> Iterator[PhysicalConstant]:
+        return iter(self._ensure_loaded())
+
+    def __len__(self) -> int:
+        return len(self._ensure_loaded())
+
+
+_store: Optional[ConstantsStore] = None
+
+
+def get_constants_store() -> ConstantsStore:
+    """Return the process-wide constants store (the file is read on first lookup)."""
+    global _store
+    if _store is None:
+        _store = ConstantsStore()
+    return _store
+
 
 class PhysicsConstantsLookup:
     """A tool for looking up physical constants."""
-    
-    def __init__(self):
-        self.constants = PHYSICS_CONSTANTS
-    
+
+    def __init__(self, store: Optional[ConstantsStore] = None):
+        self.store = store if store is not None else get_constants_store()
+
     def get_constant(self, name: str) -> Optional[Dict[str, Any]]:
         """
         Look up a physical constant by name.
-        
+
         Args:
-            name: The name of the constant (case-insensitive)
-            
+            name: A short name, CODATA name or alias (case-insensitive, tolerates small misspellings)
+
         Returns:
             Dictionary with value, unit, and symbol, or None if not found
         """
-        name_lower = name.lower().replace(" ", "_")
-        return self.constants.get(name_lower)
-    
+        record = self.store.find(name)
+        return record.as_dict() if record is not None else None
+
     def search_constants(self, keyword: str) -> Dict[str, Dict[str, Any]]:
         """
         Search for constants containing a keyword.
-        
+
         Args:
-            keyword: The keyword to search for
-            
+            keyword: The keyword to search for in names, aliases and symbols
+
         Returns:
             Dictionary of matching constants
         """
-        keyword_lower = keyword.lower()
-        matches = {}
-        
-        for const_name, const_data in self.constants.items():
-            if (keyword_lower in const_name.lower() or 
-                keyword_lower in const_data.get("symbol", "").lower()):
-                matches[const_name] = const_data
-                
+        matches = {record.key: record.as_dict() for record in self.store.by_symbol(keyword)}
+        for record in self.store.search(keyword):
+            matches.setdefault(record.key, record.as_dict())
         return matches
-    
+
+    def find_in_text(self, text: str) -> List[str]:
+        """Return the names of constants mentioned in free text."""
+        return [record.key for record in self.store.mentions(text)]
+
+    def find_by_unit(self, unit: str) -> Dict[str, Dict[str, Any]]:
+        """Return constants with the same dimension as the given unit."""
+        return {record.key: record.as_dict() for record in self.store.by_dimension(unit)}
+
     def list_all_constants(self) -> Dict[str, Dict[str, Any]]:
         """Return all available constants."""
-        return self.constants
-    
+        return {record.key: record.as_dict() for record in self.store}
+
     def format_constant(self, name: str, data: Dict[str, Any]) -> str:
         """Format a constant for display."""
-        return f"{name.replace('_', ' ').title()}: {data['value']} {data['unit']} (Symbol: {data['symbol']})"
+        if name in self.store.curated or "name" not in data:
+            label = name.replace('_', ' ').title()
+        else:
+            label = ConstantsStore.display_name(data["name"]).capitalize()
+        unit = f" {data['unit']}" if data.get("unit") else ""
+        symbol = f" (Symbol: {data['symbol']})" if data.get("symbol") else ""
+        return f"{label}: {data['value']}{unit}{symbol}"
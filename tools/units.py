@@ -0,0 +1,129 @@
+import re
+from functools import lru_cache
+from typing import Dict, NamedTuple, Tuple
+
+# Exponents of the SI base dimensions, in this order
+BASE_DIMENSIONS = ("M", "L", "T", "I", "Θ", "N", "J")
+
+Dimension = Tuple[int, int, int, int, int, int, int]
+
+DIMENSIONLESS: Dimension = (0, 0, 0, 0, 0, 0, 0)
+
+
+class UnitError(ValueError):
+    """Raised when a unit string can't be parsed."""
+
+
+class Unit(NamedTuple):
+    """A unit as a scale factor to SI and a dimension."""
+    scale: float
+    dimension: Dimension
+
+    def __mul__(self, other: "Unit") -> "Unit":
+        return Unit(self.scale * other.scale, tuple(a + b for a, b in zip(self.dimension, other.dimension)))
+
+    def __pow__(self, exponent: int) -> "Unit":
+        return Unit(self.scale ** exponent, tuple(d * exponent for d in self.dimension))
+
+
+def _dim(M=0, L=0, T=0, I=0, Θ=0, N=0, J=0) -> Dimension:
+    return (M, L, T, I, Θ, N, J)
+
+
+UNITS: Dict[str, Unit] = {
+    # SI base units
+    "kg": Unit(1.0, _dim(M=1)),
+    "g": Unit(1e-3, _dim(M=1)),
+    "m": Unit(1.0, _dim(L=1)),
+    "s": Unit(1.0, _dim(T=1)),
+    "A": Unit(1.0, _dim(I=1)),
+    "K": Unit(1.0, _dim(Θ=1)),
+    "mol": Unit(1.0, _dim(N=1)),
+    "cd": Unit(1.0, _dim(J=1)),
+    # Derived SI units
+    "Hz": Unit(1.0, _dim(T=-1)),
+    "N": Unit(1.0, _dim(M=1, L=1, T=-2)),
+    "J": Unit(1.0, _dim(M=1, L=2, T=-2)),
+    "W": Unit(1.0, _dim(M=1, L=2, T=-3)),
+    "Pa": Unit(1.0, _dim(M=1, L=-1, T=-2)),
+    "C": Unit(1.0, _dim(T=1, I=1)),
+    "V": Unit(1.0, _dim(M=1, L=2, T=-3, I=-1)),
+    "ohm": Unit(1.0, _dim(M=1, L=2, T=-3, I=-2)),
+    "Ω": Unit(1.0, _dim(M=1, L=2, T=-3, I=-2)),
+    "S": Unit(1.0, _dim(M=-1, L=-2, T=3, I=2)),
+    "F": Unit(1.0, _dim(M=-1, L=-2, T=4, I=2)),
+    "H": Unit(1.0, _dim(M=1, L=2, T=-2, I=-2)),
+    "T": Unit(1.0, _dim(M=1, T=-2, I=-1)),
+    "Wb": Unit(1.0, _dim(M=1, L=2, T=-2, I=-1)),
+    "sr": Unit(1.0, DIMENSIONLESS),
+    "rad": Unit(1.0, DIMENSIONLESS),
+    "lm": Unit(1.0, _dim(J=1)),
+    # Common non-SI units
+    "eV": Unit(1.602176634e-19, _dim(M=1, L=2, T=-2)),
+    "u": Unit(1.66053906892e-27, _dim(M=1)),
+    "E_h": Unit(4.3597447222060e-18, _dim(M=1, L=2, T=-2)),
+    "min": Unit(60.0, _dim(T=1)),
+    "h": Unit(3600.0, _dim(T=1)),
+    "L": Unit(1e-3, _dim(L=3)),
+    "atm": Unit(101325.0, _dim(M=1, L=-1, T=-2)),
+    "bar": Unit(1e5, _dim(M=1, L=-1, T=-2)),
+    "cal": Unit(4.184, _dim(M=1, L=2, T=-2)),
+}
+
+# Units that take SI prefixes ("km", "MeV", "ns", ...)
+PREFIXABLE = {"g", "m", "s", "A", "K", "mol", "Hz", "N", "J", "W", "Pa", "C", "V", "ohm", "Ω",
+              "S", "F", "H", "T", "Wb", "eV", "L"}
+
+PREFIXES = {
+    "T": 1e12, "G": 1e9, "M": 1e6, "k": 1e3, "c": 1e-2, "m": 1e-3,
+    "µ": 1e-6, "μ": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15,
+}
+
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁻", "0123456789-")
+_FACTOR_PATTERN = re.compile(r"([A-Za-zµμΩ_]+)(?:\^?\(?(-?\d+)\)?)?")
+
+
+def _lookup_unit(symbol: str) -> Unit:
+    unit = UNITS.get(symbol)
+    if unit is not None:
+        return unit
+    prefix, rest = symbol[:1], symbol[1:]
+    if prefix in PREFIXES and rest in PREFIXABLE:
+        return Unit(PREFIXES[prefix] * UNITS[rest].scale, UNITS[rest].dimension)
+    raise UnitError(f"Unknown unit: {symbol}")
+
+
+@lru_cache(maxsize=1024)
+def parse_unit(text: str) -> Unit:
+    """Parse a unit such as "m s^-2", "J/K", "kg⋅m²/s²" or "mol⁻¹".
+
+    Factors are separated by spaces, "*", "·" or "⋅"; everything after a
+    single "/" is in the denominator. An empty string is dimensionless.
+    """
+    text = text.translate(_SUPERSCRIPTS).replace("**", "^")
+    numerator, _, denominator = text.partition("/")
+    if "/" in denominator:
+        raise UnitError(f"Ambiguous unit with more than one '/': {text}")
+
+    unit = Unit(1.0, DIMENSIONLESS)
+    for part, sign in ((numerator, 1), (denominator, -1)):
+        for factor in re.split(r"[\s*·⋅]+", part.strip()):
+            if not factor or factor == "1":
+                continue
+            match = _FACTOR_PATTERN.fullmatch(factor)
+            if not match:
+                raise UnitError(f"Can't parse unit factor: {factor}")
+            exponent = int(match.group(2)) if match.group(2) else 1
+            unit = unit * _lookup_unit(match.group(1)) ** (sign * exponent)
+    return unit
+
+
+def format_dimension(dimension: Dimension) -> str:
+    """Format a dimension like "M L^2 T^-2"; dimensionless quantities give "1"."""
+    parts = []
+    for symbol, exponent in zip(BASE_DIMENSIONS, dimension):
+        if exponent == 1:
+            parts.append(symbol)
+        elif exponent:
+            parts.append(f"{symbol}^{exponent}")
+    return " ".join(parts) or "1"